@@ -1,5 +1,6 @@
 #coding=utf-8
 from java.sql import SQLException
+from java.sql import Types
 import re
 import logger
 import netutils
@@ -7,52 +8,51 @@ import modeling
 import errormessages
 import sys
 import shellutils # added by Daniel La
+import Util
+import copy
+import md5
+import os
+import time
 
 from java.lang import Boolean
 from java.lang import Exception as JException
+from java.util.concurrent import Callable
+from java.util.concurrent import CountDownLatch
+from java.util.concurrent import Executors
+from java.util.concurrent import LinkedBlockingQueue
+from java.util.concurrent.locks import ReentrantLock
 
 from appilog.common.system.types.vectors import ObjectStateHolderVector
 from appilog.common.system.types import ObjectStateHolder
 from com.hp.ucmdb.discovery.library.clients.query import SqlClient
+from com.hp.ucmdb.discovery.library.common import CollectorsParameters
 
 from java.util import Properties # added by Daniel La
 from com.hp.ucmdb.discovery.library.clients.agents import BaseAgent # added by Daniel La
 
 protocolName = "SQL"
 
-## SRR - determine how the database was started
-
-dbPFileTableQuery = (
-    "SELECT DECODE(value, NULL, 'PFILE', 'SPFILE') \"Init File Type\" "
-    "FROM sys.v_$parameter "
-    "WHERE name = 'spfile'")
+## RAC topology - one GV$ query set describes the whole cluster, whichever
+## node runs it. Instance list, database identity and cluster flag
+dbRacNodeInfoTableQuery = (
+    "SELECT i.INSTANCE_NUMBER, i.INSTANCE_NAME, i.HOST_NAME, i.DATABASE_STATUS, "
+        "d.DBID, d.NAME, "
+        "(SELECT VALUE FROM V$PARAMETER WHERE NAME = 'cluster_database') "
+    "FROM GV$INSTANCE i, V$DATABASE d "
+    "order by i.HOST_NAME")
 
-## Use for SPFile started db
+## Parameters in effect on every instance, for both pfile and spfile started db
 dbRacInfoTableQuery = (
-    "SELECT NAME,VALUE,SID "
-    "from V$SPPARAMETER "
-    "WHERE NAME IN ('cluster_database','cluster_database_instances',"
-                   "'db_name','undo_tablespace') order by value")
-
-#dbRacPFileInfoTableQuery = (
-#    "SELECT NAME,VALUE "
-#    "from V$PARAMETER "
-#    "WHERE NAME IN ('cluster_database','cluster_database_instances',"
-#        "'db_name','undo_tablespace')")
-
-## Use for PFile started db
-dbRacPFileInfoTableQuery = (
-    "SELECT VP.NAME, VP.VALUE, VSP.SID "
-    "from V$SPPARAMETER VSP, V$PARAMETER VP "
-    "WHERE VSP.NAME = VP.NAME "
-        "and VP.NAME IN ('cluster_database',"
-                        "'cluster_database_instances','db_name',"
-                        "'undo_tablespace') order by VP.value")
+    "SELECT p.NAME, p.VALUE, i.INSTANCE_NAME "
+    "from GV$PARAMETER p, GV$INSTANCE i "
+    "WHERE p.INST_ID = i.INST_ID "
+        "and p.NAME IN ('cluster_database','cluster_database_instances',"
+                       "'db_name','undo_tablespace') order by p.VALUE")
 
-dbRacNodeInfoTableQuery = (
-    "SELECT INSTANCE_NUMBER,INSTANCE_NAME,HOST_NAME, DATABASE_STATUS "
-    "FROM GV$INSTANCE "
-    "order by HOST_NAME")
+dbRacInterconnectTableQuery = (
+    "SELECT i.INSTANCE_NAME, c.IP_ADDRESS, c.NAME, c.IS_PUBLIC "
+    "from GV$CLUSTER_INTERCONNECTS c, GV$INSTANCE i "
+    "WHERE c.INST_ID = i.INST_ID")
 
 #dbIsRACTableQuery = (
 #    "SELECT name,value "
@@ -179,6 +179,25 @@ dbLinkobjResourceDbsnapshotTableQuery = (
         "AND (dba_snapshots.owner = dba_db_links.owner "
             "OR dba_db_links.owner = 'PUBLIC')")
 
+dbaObjectsTableQuery = (
+    "SELECT owner,object_name,object_type, "
+        "nvl(to_char(created, 'YYYY.MM.DD_HH24:MI:SS'),'null'), "
+        "nvl(to_char(last_ddl_time, 'YYYY.MM.DD_HH24:MI:SS'),'null'), "
+        "TIMESTAMP,status "
+    "FROM DBA_OBJECTS "
+    "WHERE object_type in (")
+
+## Per owner count, object_id sum and last DDL time, and count and object_id
+## sum of the objects created after the watermark of the last run
+dbaObjectsSummaryQuery = (
+    "SELECT owner, count(*), sum(object_id), "
+        "nvl(to_char(max(last_ddl_time), 'YYYY.MM.DD_HH24:MI:SS'),'null'), "
+        "sum(decode(sign(created - to_date(?, 'YYYY.MM.DD_HH24:MI:SS')), 1, 1, 0)), "
+        "sum(decode(sign(created - to_date(?, 'YYYY.MM.DD_HH24:MI:SS')), 1, object_id, 0)) "
+    "FROM DBA_OBJECTS "
+    "WHERE object_type in (%s) "
+    "GROUP BY owner")
+
 #dbaobjectsOwnerDbUserPublicTableQuery = (
 #    "SELECT a.username,b.object_name,b.object_type "
 #    "FROM DBA_USERS a ,DBA_OBJECTS b "
@@ -198,6 +217,20 @@ dbTablespaceToUsersQuery = (
 
 MAX_TRANSFORM_COLS = 5
 
+## Probe-local cache of RAC topologies, shared by the triggers of all nodes
+## of a cluster that run within RAC_CACHE_MAX_AGE seconds
+RAC_CACHE_DIR = None
+RAC_CACHE_MAX_AGE = 3600
+
+## Incremental DBA_OBJECTS discovery (discoverObjectsIncrementally) keeps its
+## per database state here. All objects are read again once the last full read
+## is older than DBA_OBJECTS_FULL_REFRESH_AGE seconds, well within CI aging
+DBA_OBJECTS_STATE_DIR = None
+DBA_OBJECTS_FULL_REFRESH_AGE = 7 * 24 * 3600
+DBA_OBJECTS_NO_WATERMARK = '1900.01.01_00:00:00'
+## Oracle limit of expressions in an in-list
+MAX_IN_LIST_SIZE = 1000
+
 # added this method for creating a shell - Daniel La
 def getShellUtils(Framework, protocol, shellCredentialsId, protocolProperties):
     ''' Establish connection using specified credentials and get Shell
@@ -212,15 +245,290 @@ def getShellUtils(Framework, protocol, shellCredentialsId, protocolProperties):
     return shellUtils
 
 
+## JDBC fetch size used for the discovery queries when the job does not
+## define discoverFetchSize
+DEFAULT_FETCH_SIZE = 500
+
+## Pages are sized to hold about this many OSHs (discoverReportPageOshBudget),
+## within MIN_PAGE_ROWS..MAX_PAGE_ROWS rows
+DEFAULT_PAGE_OSH_BUDGET = 5000
+MIN_PAGE_ROWS = 100
+MAX_PAGE_ROWS = 10000
+
+## Job statistics name queries after the first table they read
+SQL_LABEL_TABLE_PATTERN = re.compile(r'\bfrom\s+([\w$#.]+)', re.I)
+
+
+def setStringAttribute(osh, attributeName, value):
+    osh.setAttribute(attributeName, value)
+
+
+def setDateAttribute(osh, attributeName, value):
+    osh.setDateAttribute(attributeName, value)
+
+
+def setOptionalDateAttribute(osh, attributeName, value):
+    try:
+        osh.setDateAttribute(attributeName, value)
+    except:
+        # If the date format is invalid discard it
+        pass
+
+
+def setIntAttribute(osh, attributeName, value):
+    osh.setAttribute(attributeName, int(value))
+
+
+def setLongAttribute(osh, attributeName, value):
+    osh.setLongAttribute(attributeName, long(value))
+
+
+def setDoubleAttribute(osh, attributeName, value):
+    osh.setAttribute(attributeName, float(value))
+
+
+class RowMapper:
+    '''
+    Declares the columns of a query once and streams its result set as
+    lightweight row tuples, in the declared column order.
+    Usage:
+
+        mapper = RowMapper('owner', 'object_name', 'object_type')
+        for owner, name, type in mapper.rows(resultSet):
+            ...
+
+    When the result set returns fewer columns than declared (older db
+    versions) the missing trailing fields are None.
+    '''
+    def __init__(self, *columns):
+        '@types: str*'
+        self.columns = columns
+        self.__indexes = {}
+        for index in range(len(columns)):
+            self.__indexes[columns[index]] = index
+
+    def index(self, column):
+        '@types: str -> int or None'
+        return self.__indexes.get(column)
+
+    def rows(self, resultSet):
+        '@types: ResultSet -> generator(tuple)'
+        if resultSet is None:
+            return
+        declared = len(self.columns)
+        width = declared
+        try:
+            width = min(declared, resultSet.getMetaData().getColumnCount())
+        except:
+            logger.debug('Failed to get columns count, assuming ', declared)
+        padding = (None,) * (declared - width)
+        columnIndexes = range(1, width + 1)
+        getString = resultSet.getString
+        while resultSet.next():
+            yield tuple([getString(i) for i in columnIndexes]) + padding
+
+
+class OshTemplate:
+    '''
+    Describes how one CI type is built from a mapped row.
+    Attributes are declared as (attributeName, columnName[, setter]) where
+    setter converts and sets the value (setStringAttribute by default).
+    Columns the row mapper does not declare and empty values are skipped, so
+    the same template serves both full and reference-only queries.
+    '''
+    def __init__(self, citName, attributes):
+        '@types: str, list[tuple]'
+        self.citName = citName
+        self.__attributes = []
+        for attribute in attributes:
+            setter = setStringAttribute
+            if len(attribute) > 2:
+                setter = attribute[2]
+            self.__attributes.append((attribute[0], attribute[1], setter))
+        self.__bindings = {}
+
+    def __bind(self, mapper):
+        binding = self.__bindings.get(mapper)
+        if binding is None:
+            binding = []
+            for attributeName, column, setter in self.__attributes:
+                index = mapper.index(column)
+                if index is not None:
+                    binding.append((attributeName, index, setter))
+            self.__bindings[mapper] = binding
+        return binding
+
+    def fill(self, osh, row, mapper):
+        '@types: ObjectStateHolder, tuple, RowMapper -> ObjectStateHolder'
+        for attributeName, index, setter in self.__bind(mapper):
+            value = row[index]
+            if value:
+                setter(osh, attributeName, value)
+        return osh
+
+    def build(self, row, mapper, container=None):
+        '@types: tuple, RowMapper, ObjectStateHolder -> ObjectStateHolder'
+        osh = self.fill(ObjectStateHolder(self.citName), row, mapper)
+        if container is not None:
+            osh.setContainer(container)
+        return osh
+
+
+def createReferenceOsh(citName, dataName, container):
+    r'Build OSH identified by data_name only, used as a link end'
+    osh = ObjectStateHolder(citName)
+    osh.setAttribute('data_name', dataName)
+    osh.setContainer(container)
+    return osh
+
+
+##############################################
+## Row mappers
+##############################################
+dbSpfileMapper = RowMapper('spfile')
+dbUserMapper = RowMapper('username', 'created', 'account_status',
+                         'default_tablespace', 'temporary_tablespace')
+dbSnapshotMapper = RowMapper('name', 'owner', 'table_name', 'master_link',
+                             'master')
+dbTablespaceMapper = RowMapper('tablespace_name', 'status', 'initial_extent',
+                               'next_extent', 'min_extents', 'max_extents',
+                               'min_extlen', 'contents', 'extent_management',
+                               'segment_space_management')
+dbLinkobjMapper = RowMapper('db_link', 'owner', 'host', 'created')
+dbDatafileMapper = RowMapper('file_name', 'file_id', 'tablespace_name',
+                             'bytes', 'maxbytes', 'autoextensible',
+                             'increment_by', 'status', 'err_msg',
+                             'backup_mode')
+dbJobMapper = RowMapper('job', 'priv_user', 'last_date', 'this_date',
+                        'next_date', 'broken', 'interval', 'failures', 'what')
+dbSchedulerjobMapper = RowMapper('owner', 'job_name', 'enabled', 'job_type',
+                                 'program_name', 'job_action',
+                                 'schedule_name', 'repeat_interval',
+                                 'job_class')
+db_ControlfileMapper = RowMapper('name', 'status')
+db_ArchivefileMapper = RowMapper('log_archive_dest', 'log_archive_format',
+                                 'log_mode')
+db_RedofileMapper = RowMapper('member', 'members', 'group', 'status', 'bytes')
+dbProcessDbClientMapper = RowMapper('process', 'machine', 'program')
+dbaObjectsMapper = RowMapper('owner', 'object_name', 'object_type',
+                             'created', 'last_ddl_time', 'timestamp',
+                             'status')
+dbLinkobjOwnerDbUserMapper = RowMapper('username', 'db_link')
+dbJobOwnerDbUserMapper = RowMapper('username', 'job')
+dbSnapshotOwnerDbUserMapper = RowMapper('username', 'name', 'owner')
+dbsnapshotResourceDbjobMapper = RowMapper('name', 'job', 'owner')
+dbLinkobjResourceDbsnapshotMapper = RowMapper('name', 'db_link', 'owner')
+dbtablespaceResourceDbdatafileMapper = RowMapper('file_id', 'tablespace_name')
+dbTablespaceToUsersMapper = RowMapper('username', 'tablespace_name',
+                                      'temp_tablespace_name')
+
+##############################################
+## CIT templates
+##############################################
+DBUSER_TEMPLATE = OshTemplate('dbuser', [
+    ('data_name', 'username'),
+    ('dbuser_created', 'created', setDateAttribute),
+    ('dbuser_accountstatus', 'account_status'),
+    ('dbuser_defaulttablespace', 'default_tablespace'),
+    ('dbuser_temporarytablespace', 'temporary_tablespace')])
+
+ORACLE_SCHEMA_TEMPLATE = OshTemplate('oracle_schema', [
+    ('data_name', 'username')])
+
+DBSNAPSHOT_TEMPLATE = OshTemplate('dbsnapshot', [
+    ('dbsnapshot_tablename', 'table_name'),
+    ('dbsnapshot_dblinkname', 'master_link'),
+    ('dbsnapshot_dblinktablename', 'master')])
+
+DBTABLESPACE_TEMPLATE = OshTemplate('dbtablespace', [
+    ('data_name', 'tablespace_name'),
+    ('dbtablespace_status', 'status'),
+    ('dbtablespace_initialextent', 'initial_extent'),
+    ('dbtablespace_nextextent', 'next_extent'),
+    ('dbtablespace_minextents', 'min_extents'),
+    ('dbtablespace_maxextents', 'max_extents'),
+    ('dbtablespace_minextlen', 'min_extlen'),
+    ('dbtablespace_contents', 'contents'),
+    ('dbtablespace_extentmanagement', 'extent_management'),
+    ('dbtablespace_segmentspacemanagement', 'segment_space_management')])
+
+DBLINKOBJ_TEMPLATE = OshTemplate('dblinkobj', [
+    ('data_name', 'db_link'),
+    ('dblinkobj_owner', 'owner'),
+    ('dblinkobj_created', 'created', setOptionalDateAttribute)])
+
+DBDATAFILE_TEMPLATE = OshTemplate('dbdatafile', [
+    ('dbdatafile_fileid', 'file_id', setIntAttribute),
+    ('data_name', 'file_name'),
+    ('dbdatafile_tablespacename', 'tablespace_name'),
+    ('dbdatafile_byte', 'bytes'),
+    ('db_datafile_byte_double', 'bytes', setDoubleAttribute),
+    ('dbdatafile_maxbytes', 'maxbytes'),
+    ('dbdatafile_autoextensible', 'autoextensible'),
+    ('dbdatafile_incrementby', 'increment_by', setIntAttribute),
+    ('dbdatafile_status', 'status'),
+    ('dbdatafile_errors', 'err_msg'),
+    ('dbdatafile_backupstatus', 'backup_mode')])
+
+DBJOB_TEMPLATE = OshTemplate('dbjob', [
+    ('dbjob_jobid', 'job', setIntAttribute),
+    ('data_name', 'what'),
+    ('dbjob_owner', 'priv_user'),
+    ('dbjob_lastdate', 'last_date', setDateAttribute),
+    ('dbjob_thisdate', 'this_date', setDateAttribute),
+    ('dbjob_nextdate', 'next_date', setDateAttribute),
+    ('dbjob_broken', 'broken'),
+    ('dbjob_interval', 'interval'),
+    ('dbjob_failures', 'failures', setIntAttribute),
+    ('dbjob_what', 'what')])
+
+DBSCHEDULERJOB_TEMPLATE = OshTemplate('dbschedulerjob', [
+    ('schedulerjob_owner', 'owner'),
+    ('schedulerjob_jobname', 'job_name'),
+    ('schedulerjob_enabled', 'enabled'),
+    ('schedulerjob_jobtype', 'job_type'),
+    ('schedulerjob_programname', 'program_name'),
+    ('schedulerjob_schedulename', 'schedule_name'),
+    ('schedulerjob_repeatinterval', 'repeat_interval'),
+    ('schedulerjob_jobclass', 'job_class')])
+
+DB_CONTROLFILE_TEMPLATE = OshTemplate('db_controlfile', [
+    ('data_name', 'name'),
+    ('db_controlfile_status', 'status')])
+
+DB_ARCHIVEFILE_TEMPLATE = OshTemplate('db_archivefile', [
+    ('data_name', 'log_archive_dest'),
+    ('db_archivefile_format', 'log_archive_format'),
+    ('db_archivefile_logmode', 'log_mode')])
+
+DB_REDOFILEGROUP_TEMPLATE = OshTemplate('db_redofilegroup', [
+    ('data_name', 'group')])
+
+DB_REDOFILE_TEMPLATE = OshTemplate('db_redofile', [
+    ('data_name', 'member'),
+    ('db_redofile_members', 'members', setIntAttribute),
+    ('db_redofile_group', 'group', setIntAttribute),
+    ('db_redofile_status', 'status'),
+    ('size', 'bytes', setLongAttribute)])
+
+DBAOBJECTS_TEMPLATE = OshTemplate('dbaobjects', [
+    ('data_name', 'object_name'),
+    ('dbaobjects_type', 'object_type'),
+    ('dbaobjects_owner', 'owner'),
+    ('dbaobjects_created', 'created', setDateAttribute),
+    ('dbaobjects_lastddltime', 'last_ddl_time', setDateAttribute),
+    ('dbaobjects_timestamp', 'timestamp'),
+    ('dbaobjects_status', 'status')])
+
+
 def parsedbSpfileTableQueryRes(dbSpfileTableQueryRes, executor, OSHVResult):
     spfile = 'Pfile'
     if dbSpfileTableQueryRes:
-        if dbSpfileTableQueryRes.next():
+        for (value,) in dbSpfileMapper.rows(dbSpfileTableQueryRes):
             spfile = None
-            try:
-                spfile = 'SPfile:' + dbSpfileTableQueryRes.getString(1)
-            except:
-                spfile = None
+            if value is not None:
+                spfile = 'SPfile:' + value
+            break
     if spfile:
         executor.getOracleOsh().setAttribute('oracle_filetype', spfile)
     OSHVResult.add(executor.getOracleOsh())
@@ -229,32 +537,11 @@ def parsedbSpfileTableQueryRes(dbSpfileTableQueryRes, executor, OSHVResult):
 def parseDbUserTableQueryRes(dbUserTableQueryRes, executor, OSHVResult):
     if dbUserTableQueryRes is not None:
         rows = 0
-        while dbUserTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in dbUserMapper.rows(dbUserTableQueryRes):
             rows = rows + 1
-            dataName = dbUserTableQueryRes.getString(1)
-            dbuserCreated = dbUserTableQueryRes.getString(2)
-            dbuserAccountstatus = dbUserTableQueryRes.getString(3)
-            dbuserDefaulttablespace = dbUserTableQueryRes.getString(4)
-            dbuserTemporarytablespace = dbUserTableQueryRes.getString(5)
-
-            dbuserOSH = ObjectStateHolder('dbuser')
-            dbuserOSH.setAttribute('data_name', dataName)
-            if dbuserCreated:
-                dbuserOSH.setDateAttribute('dbuser_created', dbuserCreated)
-            if dbuserAccountstatus:
-                dbuserOSH.setAttribute('dbuser_accountstatus', dbuserAccountstatus)
-            if dbuserDefaulttablespace:
-                dbuserOSH.setAttribute('dbuser_defaulttablespace', dbuserDefaulttablespace)
-            if dbuserTemporarytablespace:
-                dbuserOSH.setAttribute('dbuser_temporarytablespace', dbuserTemporarytablespace)
-
-            dbuserOSH.setContainer(executor.getOracleOsh())
-            OSHVResult.add(dbuserOSH)
-
-            dbschemaOSH = ObjectStateHolder('oracle_schema')
-            dbschemaOSH.setAttribute('data_name', dataName)
-            dbschemaOSH.setContainer(executor.getOracleOsh())
-            OSHVResult.add(dbschemaOSH)
+            OSHVResult.add(DBUSER_TEMPLATE.build(row, dbUserMapper, oracleOsh))
+            OSHVResult.add(ORACLE_SCHEMA_TEMPLATE.build(row, dbUserMapper, oracleOsh))
 
         logger.debug('parseDbUserTableQueryRes rows ', rows)
 
@@ -262,13 +549,9 @@ def parseDbUserTableQueryRes(dbUserTableQueryRes, executor, OSHVResult):
 def parseDbSnapshotTableQueryRes(dbSnapshotTableQueryRes, executor, OSHVResult):
     if dbSnapshotTableQueryRes is not None:
         rows = 0
-        while dbSnapshotTableQueryRes.next():
+        for row in dbSnapshotMapper.rows(dbSnapshotTableQueryRes):
             rows += 1
-            dataName = dbSnapshotTableQueryRes.getString(1)
-            dbsnapshotOwner = dbSnapshotTableQueryRes.getString(2)
-            dbsnapshotTablename = dbSnapshotTableQueryRes.getString(3)
-            dbsnapshotDblinkname = dbSnapshotTableQueryRes.getString(4)
-            dbsnapshotDblinktablename = dbSnapshotTableQueryRes.getString(5)
+            dataName, dbsnapshotOwner = row[0], row[1]
 
             dbsnapshotOSH = executor.getDbSnapshot(dataName, dbsnapshotOwner)
             if not dbsnapshotOSH:
@@ -276,63 +559,21 @@ def parseDbSnapshotTableQueryRes(dbSnapshotTableQueryRes, executor, OSHVResult):
                             % (dataName, dbsnapshotOwner))
                 continue
 
-            if dbsnapshotTablename:
-                dbsnapshotOSH.setAttribute('dbsnapshot_tablename', dbsnapshotTablename)
-            if dbsnapshotDblinkname:
-                dbsnapshotOSH.setAttribute('dbsnapshot_dblinkname', dbsnapshotDblinkname)
-            if dbsnapshotDblinktablename:
-                dbsnapshotOSH.setAttribute('dbsnapshot_dblinktablename', dbsnapshotDblinktablename)
-
+            DBSNAPSHOT_TEMPLATE.fill(dbsnapshotOSH, row, dbSnapshotMapper)
             OSHVResult.add(dbsnapshotOSH)
 
         logger.debug('parseDbSnapshotTableQueryRes rows ', rows)
 
 
 def parseDbTablespaceTableQueryRes(dbTablespaceTableQueryRes, executor, OSHVResult):
+    r'''Extent and segment space management columns are not relevant
+    for V8 Oracle database, the mapper leaves them empty'''
     if dbTablespaceTableQueryRes is not None:
         rows = 0
-        while dbTablespaceTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in dbTablespaceMapper.rows(dbTablespaceTableQueryRes):
             rows = rows + 1
-            dataName = dbTablespaceTableQueryRes.getString(1)
-            dbtablespaceStatus = dbTablespaceTableQueryRes.getString(2)
-            dbtablespaceInitialextent = dbTablespaceTableQueryRes.getString(3)
-            dbtablespaceNextextent = dbTablespaceTableQueryRes.getString(4)
-            dbtablespaceMinextents = dbTablespaceTableQueryRes.getString(5)
-            dbtablespaceMaxextents = dbTablespaceTableQueryRes.getString(6)
-            dbtablespaceMinextlen = dbTablespaceTableQueryRes.getString(7)
-            dbtablespaceContents = dbTablespaceTableQueryRes.getString(8)
-            # These attributes are not relevant for V8 Oracle database
-            dbtablespaceExtentmanagement = None
-            dbtablespaceSegmentspacemanagement = None
-            try:
-                dbtablespaceExtentmanagement = dbTablespaceTableQueryRes.getString(9)
-                dbtablespaceSegmentspacemanagement = dbTablespaceTableQueryRes.getString(10)
-            except:
-                dbtablespaceExtentmanagement = None
-                dbtablespaceSegmentspacemanagement = None
-
-            dbtablespaceOSH = ObjectStateHolder('dbtablespace')
-            dbtablespaceOSH.setAttribute('data_name', dataName)
-            if dbtablespaceStatus:
-                dbtablespaceOSH.setAttribute('dbtablespace_status', dbtablespaceStatus)
-            if dbtablespaceInitialextent:
-                dbtablespaceOSH.setAttribute('dbtablespace_initialextent', dbtablespaceInitialextent)
-            if dbtablespaceNextextent:
-                dbtablespaceOSH.setAttribute('dbtablespace_nextextent', dbtablespaceNextextent)
-            if dbtablespaceMinextents:
-                dbtablespaceOSH.setAttribute('dbtablespace_minextents', dbtablespaceMinextents)
-            if dbtablespaceMaxextents:
-                dbtablespaceOSH.setAttribute('dbtablespace_maxextents', dbtablespaceMaxextents)
-            if dbtablespaceMinextlen:
-                dbtablespaceOSH.setAttribute('dbtablespace_minextlen', dbtablespaceMinextlen)
-            if dbtablespaceContents:
-                dbtablespaceOSH.setAttribute('dbtablespace_contents', dbtablespaceContents)
-            if dbtablespaceExtentmanagement:
-                dbtablespaceOSH.setAttribute('dbtablespace_extentmanagement', dbtablespaceExtentmanagement)
-            if dbtablespaceSegmentspacemanagement:
-                dbtablespaceOSH.setAttribute('dbtablespace_segmentspacemanagement', dbtablespaceSegmentspacemanagement)
-            dbtablespaceOSH.setContainer(executor.getOracleOsh())
-            OSHVResult.add(dbtablespaceOSH)
+            OSHVResult.add(DBTABLESPACE_TEMPLATE.build(row, dbTablespaceMapper, oracleOsh))
 
         logger.debug('dbTablespaceTableQueryRes rows ', rows)
 
@@ -363,32 +604,19 @@ def parseDbLinkobjTableQueryRes(dbLinkobjTableQueryRes, executor, OSHVResult):
     if dbLinkobjTableQueryRes is not None:
         rows = 0
         dbLinkObj = 0
-        while dbLinkobjTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in dbLinkobjMapper.rows(dbLinkobjTableQueryRes):
             rows = rows + 1
-            dataName = dbLinkobjTableQueryRes.getString(1)
-            dblinkobjOwner = dbLinkobjTableQueryRes.getString(2)
-            dblinkobjHost = dbLinkobjTableQueryRes.getString(3)
-            dblinkobjCreated = dbLinkobjTableQueryRes.getString(4)
+            dblinkobjHost = row[2]
 
             #::We supply one object of each kind for each oracle database
             dbLinkObj = dbLinkObj + 1
 
-            dblinkobjOSH = ObjectStateHolder('dblinkobj')
-            dblinkobjOSH.setAttribute('data_name', dataName)
-            dblinkobjOSH.setContainer(executor.getOracleOsh())
-            if dblinkobjOwner:
-                dblinkobjOSH.setAttribute('dblinkobj_owner', dblinkobjOwner)
-
+            dblinkobjOSH = DBLINKOBJ_TEMPLATE.build(row, dbLinkobjMapper, oracleOsh)
             if dblinkobjHost:
                     dblinkobjHostTrimmed = re.sub("\s+", ' ', dblinkobjHost)
                     dblinkobjOSH.setAttribute('dblinkobj_host', dblinkobjHostTrimmed)
                     OSHVResult.addAll(parseDbLinkHost(dblinkobjHost, dblinkobjOSH))
-            try:
-                if dblinkobjCreated:
-                    dblinkobjOSH.setDateAttribute('dblinkobj_created', dblinkobjCreated)
-            except:
-                # If the date format is invalid discard it
-                pass
 
             OSHVResult.add(dblinkobjOSH)
 
@@ -398,138 +626,53 @@ def parseDbLinkobjTableQueryRes(dbLinkobjTableQueryRes, executor, OSHVResult):
 def parseDbDatafileTableQueryRes(dbDatafileTableQueryRes, executor, OSHVResult):
     if dbDatafileTableQueryRes is not None:
         rows = 0
-        while dbDatafileTableQueryRes.next():
+        disks = 0
+        oracleOsh = executor.getOracleOsh()
+        datafiles = []
+        for row in dbDatafileMapper.rows(dbDatafileTableQueryRes):
             rows = rows + 1
-            dataName = dbDatafileTableQueryRes.getString(1)
-            dbdatafileFileid = dbDatafileTableQueryRes.getString(2)
-            dbdatafileTablespacename = dbDatafileTableQueryRes.getString(3)
-            dbdatafileByte = dbDatafileTableQueryRes.getString(4)
-            dbdatafileMaxbytes = dbDatafileTableQueryRes.getString(5)
-            dbdatafileAutoextensible = dbDatafileTableQueryRes.getString(6)
-            dbdatafileIncrementby = dbDatafileTableQueryRes.getString(7)
-            dbdatafileStatus = dbDatafileTableQueryRes.getString(8)
-            dbdatafileErrors = dbDatafileTableQueryRes.getString(9)
-            dbdatafileBackupstatus = dbDatafileTableQueryRes.getString(10)
-
-            dbdatafileOSH = ObjectStateHolder('dbdatafile')
-            dbdatafileOSH.setAttribute('dbdatafile_fileid' , int(dbdatafileFileid))
-            if dataName:
-                dbdatafileOSH.setAttribute('data_name' , dataName)
-            if dbdatafileTablespacename:
-                dbdatafileOSH.setAttribute('dbdatafile_tablespacename' , dbdatafileTablespacename)
-            if dbdatafileByte:
-                dbdatafileOSH.setAttribute('dbdatafile_byte' , dbdatafileByte)
-                dbdatafileOSH.setAttribute('db_datafile_byte_double' ,float(dbdatafileByte)) # added by Daniel La 10/01/2012
-            if dbdatafileMaxbytes:
-                dbdatafileOSH.setAttribute('dbdatafile_maxbytes' , dbdatafileMaxbytes)
-            if dbdatafileAutoextensible:
-                dbdatafileOSH.setAttribute('dbdatafile_autoextensible' , dbdatafileAutoextensible)
-            if dbdatafileIncrementby:
-                dbdatafileOSH.setAttribute('dbdatafile_incrementby' , int(dbdatafileIncrementby))
-            if dbdatafileStatus:
-                dbdatafileOSH.setAttribute('dbdatafile_status' , dbdatafileStatus)
-            if dbdatafileErrors:
-                dbdatafileOSH.setAttribute('dbdatafile_errors' , dbdatafileErrors)
-            if dbdatafileBackupstatus:
-                dbdatafileOSH.setAttribute('dbdatafile_backupstatus' , dbdatafileBackupstatus)
-            dbdatafileOSH.setContainer(executor.getOracleOsh())
+            dbdatafileOSH = DBDATAFILE_TEMPLATE.build(row, dbDatafileMapper, oracleOsh)
             OSHVResult.add(dbdatafileOSH)
-            # get associated disk/filesystem - Daniel La 05/07/2012
-            logger.debug('*** get associated disk')
-            disk = None
-            disk = executor.getFileSystem(dataName)
+            datafiles.append((row[0], dbdatafileOSH))
+        # get associated disk/filesystem - Daniel La 05/07/2012
+        # resolved for the whole page in one go
+        disksByPath = executor.getFileSystems([dataName for dataName, osh in datafiles])
+        for dataName, dbdatafileOSH in datafiles:
+            disk = disksByPath.get(dataName)
             if (disk != None):
-                logger.debug('*** disk found')
+                disks = disks + 1
                 OSHVResult.add(disk)
                 OSHVResult.add(modeling.createLinkOSH('usage', dbdatafileOSH, disk))
-        logger.debug('dbDatafileTableQueryRes rows ', rows)
+        logger.debug('dbDatafileTableQueryRes rows ', rows, ' disks ', disks)
 
 
 def parseDbJobTableQueryRes(dbJobTableQueryRes, executor, OSHVResult):
     if dbJobTableQueryRes is not None:
         rows = 0
-        while dbJobTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in dbJobMapper.rows(dbJobTableQueryRes):
             rows = rows + 1
-            dbjobJobid = dbJobTableQueryRes.getString(1)
-            dbjobOwner = dbJobTableQueryRes.getString(2)
-            dbjobLastdate = dbJobTableQueryRes.getString(3)
-            dbjobThisdate = dbJobTableQueryRes.getString(4)
-            dbjobNextdate = dbJobTableQueryRes.getString(5)
-            dbjobBroken = dbJobTableQueryRes.getString(6)
-            dbjobInterval = dbJobTableQueryRes.getString(7)
-            dbjobFailures = dbJobTableQueryRes.getString(8)
-            dbjobWhat = dbJobTableQueryRes.getString(9)
-            dataName = dbjobWhat
-
-            dbjobOSH = ObjectStateHolder('dbjob')
-            dbjobOSH.setAttribute('dbjob_jobid', int(dbjobJobid))
-            if dataName:
-                dbjobOSH.setAttribute('data_name', dataName)
-            if dbjobOwner:
-                dbjobOSH.setAttribute('dbjob_owner', dbjobOwner)
-            if dbjobLastdate:
-                dbjobOSH.setDateAttribute('dbjob_lastdate', dbjobLastdate)
-            if dbjobThisdate:
-                dbjobOSH.setDateAttribute('dbjob_thisdate', dbjobThisdate)
-            if dbjobNextdate:
-                dbjobOSH.setDateAttribute('dbjob_nextdate', dbjobNextdate)
-            if dbjobBroken:
-                dbjobOSH.setAttribute('dbjob_broken', dbjobBroken)
-            if dbjobInterval:
-                dbjobOSH.setAttribute('dbjob_interval', dbjobInterval)
-            if dbjobFailures:
-                dbjobOSH.setAttribute('dbjob_failures', int(dbjobFailures))
-            if dbjobWhat:
-                dbjobOSH.setAttribute('dbjob_what', dbjobWhat)
-            dbjobOSH.setContainer(executor.getOracleOsh())
-            OSHVResult.add(dbjobOSH)
+            OSHVResult.add(DBJOB_TEMPLATE.build(row, dbJobMapper, oracleOsh))
         logger.debug('dbJobTableQueryRes rows ', rows)
 
 
 def parseDbSchedulerJobTableQueryRes(dbSchedulerjobTableQueryRes, executor, OSHVResult):
     if dbSchedulerjobTableQueryRes is not None:
         rows = 0
-        while dbSchedulerjobTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in dbSchedulerjobMapper.rows(dbSchedulerjobTableQueryRes):
             rows = rows + 1
-            schedulerjobOwner = dbSchedulerjobTableQueryRes.getString(1)
-            schedulerjobJobname = dbSchedulerjobTableQueryRes.getString(2)
-            schedulerjobEnabled = dbSchedulerjobTableQueryRes.getString(3)
-            schedulerjobJobtype = dbSchedulerjobTableQueryRes.getString(4)
-            schedulerjobProgramname = dbSchedulerjobTableQueryRes.getString(5)
-            schedulerjobJobaction = dbSchedulerjobTableQueryRes.getString(6)
-            schedulerjobSchedulename = dbSchedulerjobTableQueryRes.getString(7)
-            schedulerjobRepeatinterval = dbSchedulerjobTableQueryRes.getString(8)
-            schedulerjobJobclass = dbSchedulerjobTableQueryRes.getString(9)
-            if schedulerjobOwner is None:
-                schedulerjobOwner = ""
-            if schedulerjobJobname is None:
-                schedulerjobJobname = ""
-            dataName = schedulerjobOwner + ":" + schedulerjobJobname
-
-            dbschedulerjobOSH = ObjectStateHolder('dbschedulerjob')
-            dbschedulerjobOSH.setAttribute('data_name', dataName)
-            if schedulerjobOwner:
-                dbschedulerjobOSH.setAttribute('schedulerjob_owner', schedulerjobOwner)
-            if schedulerjobJobname:
-                dbschedulerjobOSH.setAttribute('schedulerjob_jobname', schedulerjobJobname)
-            if schedulerjobEnabled:
-                dbschedulerjobOSH.setAttribute('schedulerjob_enabled', schedulerjobEnabled)
-            if schedulerjobJobtype:
-                dbschedulerjobOSH.setAttribute('schedulerjob_jobtype', schedulerjobJobtype)
-            if schedulerjobProgramname:
-                dbschedulerjobOSH.setAttribute('schedulerjob_programname', schedulerjobProgramname)
+            schedulerjobOwner = row[0] or ""
+            schedulerjobJobname = row[1] or ""
+            schedulerjobJobaction = row[5]
+
+            dbschedulerjobOSH = DBSCHEDULERJOB_TEMPLATE.build(row, dbSchedulerjobMapper, oracleOsh)
+            dbschedulerjobOSH.setAttribute('data_name', schedulerjobOwner + ":" + schedulerjobJobname)
             if schedulerjobJobaction:
                 schedulerjobJobaction = str(schedulerjobJobaction)
                 if (len(schedulerjobJobaction) >4000):
                     schedulerjobJobaction = schedulerjobJobaction[:3999]
                 dbschedulerjobOSH.setAttribute('schedulerjob_jobaction', schedulerjobJobaction)
-            if schedulerjobSchedulename:
-                dbschedulerjobOSH.setAttribute('schedulerjob_schedulename', schedulerjobSchedulename)
-            if schedulerjobRepeatinterval:
-                dbschedulerjobOSH.setAttribute('schedulerjob_repeatinterval', schedulerjobRepeatinterval)
-            if schedulerjobJobclass:
-                dbschedulerjobOSH.setAttribute('schedulerjob_jobclass', schedulerjobJobclass)
-            dbschedulerjobOSH.setContainer(executor.getOracleOsh())
             OSHVResult.add(dbschedulerjobOSH)
         logger.debug('dbSchedulerjobTableQueryRes rows ', rows)
 
@@ -537,69 +680,34 @@ def parseDbSchedulerJobTableQueryRes(dbSchedulerjobTableQueryRes, executor, OSHV
 def parseDb_ControlfileTableQueryRes(db_ControlfileTableQueryRes, executor, OSHVResult):
     if db_ControlfileTableQueryRes is not None:
         rows = 0
-        while db_ControlfileTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in db_ControlfileMapper.rows(db_ControlfileTableQueryRes):
             rows = rows + 1
-            dataName = db_ControlfileTableQueryRes.getString(1)
-            db_controlfileStatus = db_ControlfileTableQueryRes.getString(2)
-
-            db_controlfileOSH = ObjectStateHolder('db_controlfile')
-            db_controlfileOSH.setAttribute('data_name', dataName)
-            if db_controlfileStatus:
-                db_controlfileOSH.setAttribute('db_controlfile_status', db_controlfileStatus)
-            db_controlfileOSH.setContainer(executor.getOracleOsh())
-            OSHVResult.add(db_controlfileOSH)
+            OSHVResult.add(DB_CONTROLFILE_TEMPLATE.build(row, db_ControlfileMapper, oracleOsh))
         logger.debug('db_ControlfileTableQueryRes rows ', rows)
 
 
 def parseDb_ArchivefileTableQueryRes(db_ArchivefileTableQueryRes, executor, OSHVResult):
     if db_ArchivefileTableQueryRes is not None:
         rows = 0
-        while db_ArchivefileTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in db_ArchivefileMapper.rows(db_ArchivefileTableQueryRes):
             rows = rows + 1
-            dataName = db_ArchivefileTableQueryRes.getString(1)
-            db_archivefileFormat = db_ArchivefileTableQueryRes.getString(2)
-            db_archivefileLogmode = db_ArchivefileTableQueryRes.getString(3)
-
-            db_archivefileOSH = ObjectStateHolder('db_archivefile')
-            db_archivefileOSH.setAttribute('data_name', dataName)
-            if db_archivefileFormat:
-                db_archivefileOSH.setAttribute('db_archivefile_format', db_archivefileFormat)
-            if db_archivefileLogmode:
-                db_archivefileOSH.setAttribute('db_archivefile_logmode', db_archivefileLogmode)
-            db_archivefileOSH.setContainer(executor.getOracleOsh())
-            OSHVResult.add(db_archivefileOSH)
+            OSHVResult.add(DB_ARCHIVEFILE_TEMPLATE.build(row, db_ArchivefileMapper, oracleOsh))
         logger.debug('db_ArchivefileTableQueryRes rows ', rows)
 
 
 def parseDb_RedofileTableQueryRes(db_RedofileTableQueryRes, executor, OSHVResult):
     if db_RedofileTableQueryRes is not None:
         rows = 0
-        while db_RedofileTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for row in db_RedofileMapper.rows(db_RedofileTableQueryRes):
             rows = rows + 1
-            dataName = db_RedofileTableQueryRes.getString(1)
-            db_redofileMembers = db_RedofileTableQueryRes.getString(2)
-            db_redofileGroup = db_RedofileTableQueryRes.getString(3)
-            db_redofileStatus = db_RedofileTableQueryRes.getString(4)
-            db_redofileSize = db_RedofileTableQueryRes.getString(5)
-
-            db_redofilegroupOSH = ObjectStateHolder('db_redofilegroup')
-            db_redofilegroupOSH.setAttribute('data_name', db_redofileGroup)
-            db_redofilegroupOSH.setContainer(executor.getOracleOsh())
+            db_redofilegroupOSH = DB_REDOFILEGROUP_TEMPLATE.build(row, db_RedofileMapper, oracleOsh)
             OSHVResult.add(db_redofilegroupOSH)
 
             # To do - Break the name to path and name (.*/)([^/]+)
-            db_redofileOSH = ObjectStateHolder('db_redofile')
-            db_redofileOSH.setAttribute('data_name', dataName)
-            if db_redofileMembers:
-                db_redofileOSH.setAttribute('db_redofile_members', int(db_redofileMembers))
-            if db_redofileGroup:
-                db_redofileOSH.setAttribute('db_redofile_group', int(db_redofileGroup))
-            if db_redofileStatus:
-                db_redofileOSH.setAttribute('db_redofile_status', db_redofileStatus)
-            if db_redofileSize:
-                db_redofileOSH.setLongAttribute('size', long(db_redofileSize))
-
-            db_redofileOSH.setContainer(executor.getOracleOsh())
+            db_redofileOSH = DB_REDOFILE_TEMPLATE.build(row, db_RedofileMapper, oracleOsh)
             OSHVResult.add(db_redofileOSH)
 
             memberOSH = modeling.createLinkOSH('member', db_redofilegroupOSH, db_redofileOSH)
@@ -607,7 +715,7 @@ def parseDb_RedofileTableQueryRes(db_RedofileTableQueryRes, executor, OSHVResult
         logger.debug('db_RedofileTableQueryRes rows ', rows)
 
 
-def parseAllRacTableQueryRes(dbRacInfoTableQueryTable, dbRacNodeInfoTableQueryTable, executor, OSHVResult):
+def parseAllRacTableQueryRes(dbRacInfoTableQueryTable, dbRacNodeInfoTableQueryTable, dbRacInterconnectTableQueryTable, executor, OSHVResult):
     if dbRacInfoTableQueryTable and dbRacNodeInfoTableQueryTable:
         # Get the RAC object
         racOSH = ObjectStateHolder('rac')
@@ -650,10 +758,12 @@ def parseAllRacTableQueryRes(dbRacInfoTableQueryTable, dbRacNodeInfoTableQueryTa
         oracleOSH = executor.getOracleOsh()
 
         for racNodeInfoTableRow in dbRacNodeInfoTableQueryTable:
-            getAllOracleNodeObjects(dbRacInfoTableQueryTable, racNodeInfoTableRow, sid, port, oracleOSH, racOSH, OSHVResult)
+            getAllOracleNodeObjects(dbRacInfoTableQueryTable, racNodeInfoTableRow, sid, port, oracleOSH, racOSH, OSHVResult,
+                                    dbRacInterconnectTableQueryTable, executor.getHostOsh())
 
 
-def getAllOracleNodeObjects(racInfoTableRows, racNodeInfoTableRow, sid, port, oracleOSH, racOSH, OSHVResult):
+def getAllOracleNodeObjects(racInfoTableRows, racNodeInfoTableRow, sid, port, oracleOSH, racOSH, OSHVResult,
+                            racInterconnectTableRows=None, hostOSH=None):
     instanceNumber = racNodeInfoTableRow[0]
     instanceName = racNodeInfoTableRow[1]
     hostName = racNodeInfoTableRow[2]
@@ -665,6 +775,8 @@ def getAllOracleNodeObjects(racInfoTableRows, racNodeInfoTableRow, sid, port, or
 
         memberOSH = modeling.createLinkOSH('member', racOSH, oracleOSH)
         OSHVResult.add(memberOSH)
+        if hostOSH is not None:
+            addRacInterconnects(racInterconnectTableRows, instanceName, hostOSH, OSHVResult)
     else:
         # Try and get the host ip address
         machine_ip = netutils.getHostAddress(hostName, None)
@@ -690,6 +802,22 @@ def getAllOracleNodeObjects(racInfoTableRows, racNodeInfoTableRow, sid, port, or
 
             for racInfoTableRow in racInfoTableRows:
                 createOracleNode(racInfoTableRow, instanceName, sid, oracleOSH, newOracleOSH)
+            addRacInterconnects(racInterconnectTableRows, instanceName, newHostOSH, OSHVResult)
+
+
+def addRacInterconnects(racInterconnectTableRows, instanceName, hostOSH, OSHVResult):
+    r'Report the cluster interconnect addresses of an instance on its host'
+    for row in racInterconnectTableRows or []:
+        interconnectInstance = row[0]
+        interconnectIp = row[1]
+        if interconnectInstance != instanceName or not netutils.isValidIp(interconnectIp):
+            continue
+        # link-local HAIP addresses are reassigned by the clusterware
+        if interconnectIp.startswith('169.254.'):
+            continue
+        ipOSH = modeling.createIpOSH(interconnectIp)
+        OSHVResult.add(ipOSH)
+        OSHVResult.add(modeling.createLinkOSH('containment', hostOSH, ipOSH))
 
 
 def createOracleNode(racInfoTableRow, instanceName, sid, oracleOSH, newOracleOSH):
@@ -707,11 +835,8 @@ def createOracleNode(racInfoTableRow, instanceName, sid, oracleOSH, newOracleOSH
 def parseDbProcessDbClientTableQueryRes(dbProcessDbClientTableQueryRes, executor, OSHVResult):
     if dbProcessDbClientTableQueryRes is not None:
         rows = 0
-        ucmdbVersion = modeling.CmdbClassModel().version()
-        while dbProcessDbClientTableQueryRes.next():
+        for (process, remote_machine_name, program_dataName) in dbProcessDbClientMapper.rows(dbProcessDbClientTableQueryRes):
             rows = rows + 1
-            remote_machine_name = dbProcessDbClientTableQueryRes.getString(2)
-            program_dataName = dbProcessDbClientTableQueryRes.getString(3)
 
             try:
                 remote_machine_ip = None
@@ -766,46 +891,24 @@ def parseDbaObjectsTableQueryRes(dbaObjectsTableQueryRes, executor, OSHVResult):
     if dbaObjectsTableQueryRes is not None:
         rows = 0
         dbObjectsCount = 0
-        dbObjectsList = []
-        while dbaObjectsTableQueryRes.next():
+        dbObjects = {}
+        oracleOsh = executor.getOracleOsh()
+        for row in dbaObjectsMapper.rows(dbaObjectsTableQueryRes):
             rows = rows + 1
-            dbaobjectsOwner = dbaObjectsTableQueryRes.getString(1)
-            dataName = dbaObjectsTableQueryRes.getString(2)
-            dbaobjectsType = dbaObjectsTableQueryRes.getString(3)
-            dbaobjectsCreated = dbaObjectsTableQueryRes.getString(4)
-            dbaobjectsLastddltime = dbaObjectsTableQueryRes.getString(5)
-            dbaobjectsTimestamp = dbaObjectsTableQueryRes.getString(6)
-            dbaobjectsStatus = dbaObjectsTableQueryRes.getString(7)
+            dbaobjectsOwner, dataName, dbaobjectsType = row[0], row[1], row[2]
 
             #::We supply one object of each kind for each oracle database
-            hashName = dataName + dbaobjectsType
-            if ((hashName in dbObjectsList) == 0):
-                dbObjectsList.append(hashName)
+            hashName = (dataName, dbaobjectsType)
+            if not dbObjects.has_key(hashName):
+                dbObjects[hashName] = None
                 dbObjectsCount = dbObjectsCount + 1
 
-                dbaobjectsOSH = ObjectStateHolder('dbaobjects')
-                dbaobjectsOSH.setAttribute('data_name', dataName)
-                dbaobjectsOSH.setAttribute('dbaobjects_type', dbaobjectsType)
-                if dbaobjectsOwner:
-                    dbaobjectsOSH.setAttribute('dbaobjects_owner', dbaobjectsOwner)
-                if dbaobjectsCreated:
-                    dbaobjectsOSH.setDateAttribute('dbaobjects_created', dbaobjectsCreated)
-                if dbaobjectsLastddltime:
-                    dbaobjectsOSH.setDateAttribute('dbaobjects_lastddltime', dbaobjectsLastddltime)
-                if dbaobjectsTimestamp:
-                    dbaobjectsOSH.setAttribute('dbaobjects_timestamp', dbaobjectsTimestamp)
-                if dbaobjectsStatus:
-                    dbaobjectsOSH.setAttribute('dbaobjects_status', dbaobjectsStatus)
-
+                dbaobjectsOSH = DBAOBJECTS_TEMPLATE.build(row, dbaObjectsMapper, oracleOsh)
                 if dbaobjectsOwner.upper() != 'PUBLIC':
-                    dbuserOSH = ObjectStateHolder('dbuser')
-                    dbuserOSH.setAttribute('data_name', dbaobjectsOwner)
-                    dbuserOSH.setContainer(executor.getOracleOsh())
-
+                    dbuserOSH = createReferenceOsh('dbuser', dbaobjectsOwner, oracleOsh)
                     ownerOSH = modeling.createLinkOSH('owner', dbuserOSH, dbaobjectsOSH)
                     OSHVResult.add(ownerOSH)
 
-                dbaobjectsOSH.setContainer(executor.getOracleOsh())
                 OSHVResult.add(dbaobjectsOSH)
         logger.debug('dbaObjectsTableQueryRes rows ', rows, ' dbObjects ', str(dbObjectsCount))
 
@@ -813,18 +916,12 @@ def parseDbaObjectsTableQueryRes(dbaObjectsTableQueryRes, executor, OSHVResult):
 def parseDbLinkobjOwnerDbUserTableQueryRes(dbLinkobjOwnerDbUserTableQueryRes, executor, OSHVResult):
     if dbLinkobjOwnerDbUserTableQueryRes is not None:
         rows = 0
-        while dbLinkobjOwnerDbUserTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbLinkobjOwnerDbUserMapper
+        for row in mapper.rows(dbLinkobjOwnerDbUserTableQueryRes):
             rows = rows + 1
-            dbuser_data_name = dbLinkobjOwnerDbUserTableQueryRes.getString(1)
-            dblinkobj_data_name = dbLinkobjOwnerDbUserTableQueryRes.getString(2)
-
-            dblinkobjOSH = ObjectStateHolder('dblinkobj')
-            dblinkobjOSH.setAttribute('data_name', dblinkobj_data_name)
-            dblinkobjOSH.setContainer(executor.getOracleOsh())
-
-            dbuserOSH = ObjectStateHolder('dbuser')
-            dbuserOSH.setAttribute('data_name', dbuser_data_name)
-            dbuserOSH.setContainer(executor.getOracleOsh())
+            dblinkobjOSH = DBLINKOBJ_TEMPLATE.build(row, mapper, oracleOsh)
+            dbuserOSH = DBUSER_TEMPLATE.build(row, mapper, oracleOsh)
 
             ownerOSH = modeling.createLinkOSH('owner', dbuserOSH, dblinkobjOSH)
             OSHVResult.add(ownerOSH)
@@ -834,18 +931,12 @@ def parseDbLinkobjOwnerDbUserTableQueryRes(dbLinkobjOwnerDbUserTableQueryRes, ex
 def parseDbLinkobjOwnerDbUserPublicTableQueryRes(dbLinkobjOwnerDbUserPublicTableQueryRes, executor, OSHVResult):
     if dbLinkobjOwnerDbUserPublicTableQueryRes is not None:
         rows = 0
-        while dbLinkobjOwnerDbUserPublicTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbLinkobjOwnerDbUserMapper
+        for row in mapper.rows(dbLinkobjOwnerDbUserPublicTableQueryRes):
             rows = rows + 1
-            dbuser_data_name = dbLinkobjOwnerDbUserPublicTableQueryRes.getString(1)
-            dblinkobj_data_name = dbLinkobjOwnerDbUserPublicTableQueryRes.getString(2)
-
-            dblinkobjOSH = ObjectStateHolder('dblinkobj')
-            dblinkobjOSH.setAttribute('data_name', dblinkobj_data_name)
-            dblinkobjOSH.setContainer(executor.getOracleOsh())
-
-            dbuserOSH = ObjectStateHolder('dbuser')
-            dbuserOSH.setAttribute('data_name', dbuser_data_name)
-            dbuserOSH.setContainer(executor.getOracleOsh())
+            dblinkobjOSH = DBLINKOBJ_TEMPLATE.build(row, mapper, oracleOsh)
+            dbuserOSH = DBUSER_TEMPLATE.build(row, mapper, oracleOsh)
 
             ownerOSH = modeling.createLinkOSH('owner', dbuserOSH, dblinkobjOSH)
             OSHVResult.add(ownerOSH)
@@ -855,18 +946,12 @@ def parseDbLinkobjOwnerDbUserPublicTableQueryRes(dbLinkobjOwnerDbUserPublicTable
 def parseDbJobOwnerDbUserTableQueryRes(dbJobOwnerDbUserTableQueryRes, executor, OSHVResult):
     if dbJobOwnerDbUserTableQueryRes is not None:
         rows = 0
-        while dbJobOwnerDbUserTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbJobOwnerDbUserMapper
+        for row in mapper.rows(dbJobOwnerDbUserTableQueryRes):
             rows = rows + 1
-            dbjob_dbjob_jobid = dbJobOwnerDbUserTableQueryRes.getString(2)
-            dbuser_data_name = dbJobOwnerDbUserTableQueryRes.getString(1)
-
-            dbjobOSH = ObjectStateHolder('dbjob')
-            dbjobOSH.setAttribute('dbjob_jobid', int(dbjob_dbjob_jobid))
-            dbjobOSH.setContainer(executor.getOracleOsh())
-
-            dbuserOSH = ObjectStateHolder('dbuser')
-            dbuserOSH.setAttribute('data_name', dbuser_data_name)
-            dbuserOSH.setContainer(executor.getOracleOsh())
+            dbjobOSH = DBJOB_TEMPLATE.build(row, mapper, oracleOsh)
+            dbuserOSH = DBUSER_TEMPLATE.build(row, mapper, oracleOsh)
 
             ownerOSH = modeling.createLinkOSH('owner', dbuserOSH, dbjobOSH)
             OSHVResult.add(ownerOSH)
@@ -876,17 +961,15 @@ def parseDbJobOwnerDbUserTableQueryRes(dbJobOwnerDbUserTableQueryRes, executor,
 def parseDbSnapshotOwnerDbUserTableQueryRes(dbSnapshotOwnerDbUserTableQueryRes, executor, OSHVResult):
     if dbSnapshotOwnerDbUserTableQueryRes is not None:
         rows = 0
-        while dbSnapshotOwnerDbUserTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbSnapshotOwnerDbUserMapper
+        for row in mapper.rows(dbSnapshotOwnerDbUserTableQueryRes):
             rows = rows + 1
-            dbuserName = dbSnapshotOwnerDbUserTableQueryRes.getString(1)
-            dbsnapshotName = dbSnapshotOwnerDbUserTableQueryRes.getString(2)
-            dbsnapshotOwner = dbSnapshotOwnerDbUserTableQueryRes.getString(3)
+            dbsnapshotName, dbsnapshotOwner = row[1], row[2]
 
             dbsnapshotOSH = executor.getDbSnapshot(dbsnapshotName, dbsnapshotOwner)
             if dbsnapshotOSH:
-                dbuserOSH = ObjectStateHolder('dbuser')
-                dbuserOSH.setAttribute('data_name', dbuserName)
-                dbuserOSH.setContainer(executor.getOracleOsh())
+                dbuserOSH = DBUSER_TEMPLATE.build(row, mapper, oracleOsh)
 
                 ownerOSH = modeling.createLinkOSH('owner', dbuserOSH, dbsnapshotOSH)
                 OSHVResult.add(ownerOSH)
@@ -899,17 +982,15 @@ def parseDbSnapshotOwnerDbUserTableQueryRes(dbSnapshotOwnerDbUserTableQueryRes,
 def parseDbsnapshotResourceDbjobtTableQueryRes(dbsnapshotResourceDbjobtTableQueryRes, executor, OSHVResult):
     if dbsnapshotResourceDbjobtTableQueryRes is not None:
         rows = 0
-        while dbsnapshotResourceDbjobtTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbsnapshotResourceDbjobMapper
+        for row in mapper.rows(dbsnapshotResourceDbjobtTableQueryRes):
             rows = rows + 1
-            snapshotName = dbsnapshotResourceDbjobtTableQueryRes.getString(1)
-            jobId = dbsnapshotResourceDbjobtTableQueryRes.getString(2)
-            shapshotOwner = dbsnapshotResourceDbjobtTableQueryRes.getString(3)
+            snapshotName, shapshotOwner = row[0], row[2]
 
             dbsnapshotOSH = executor.getDbSnapshot(snapshotName, shapshotOwner)
             if dbsnapshotOSH:
-                dbjobOSH = ObjectStateHolder('dbjob')
-                dbjobOSH.setAttribute('dbjob_jobid', int(jobId))
-                dbjobOSH.setContainer(executor.getOracleOsh())
+                dbjobOSH = DBJOB_TEMPLATE.build(row, mapper, oracleOsh)
                 OSHVResult.add(dbsnapshotOSH)
                 OSHVResult.add(modeling.createLinkOSH('depend', dbsnapshotOSH, dbjobOSH))
         logger.debug('dbsnapshotResourceDbjobtTableQueryRes rows ', rows)
@@ -918,17 +999,15 @@ def parseDbsnapshotResourceDbjobtTableQueryRes(dbsnapshotResourceDbjobtTableQuer
 def parseDbLinkobjResourceDbsnapshotTableQueryRes(dbLinkobjResourceDbsnapshotTableQueryRes, executor, OSHVResult):
     if dbLinkobjResourceDbsnapshotTableQueryRes is not None:
         rows = 0
-        while dbLinkobjResourceDbsnapshotTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbLinkobjResourceDbsnapshotMapper
+        for row in mapper.rows(dbLinkobjResourceDbsnapshotTableQueryRes):
             rows = rows + 1
-            dbsnapshotName = dbLinkobjResourceDbsnapshotTableQueryRes.getString(1)
-            dblinkobjName = dbLinkobjResourceDbsnapshotTableQueryRes.getString(2)
-            dbsnapshotOwner = dbLinkobjResourceDbsnapshotTableQueryRes.getString(3)
+            dbsnapshotName, dbsnapshotOwner = row[0], row[2]
 
             dbsnapshotOSH = executor.getDbSnapshot(dbsnapshotName, dbsnapshotOwner)
             if dbsnapshotOSH:
-                dblinkobjOSH = ObjectStateHolder('dblinkobj')
-                dblinkobjOSH.setAttribute('data_name', dblinkobjName)
-                dblinkobjOSH.setContainer(executor.getOracleOsh())
+                dblinkobjOSH = createReferenceOsh('dblinkobj', row[1], oracleOsh)
 
                 resourceOSH = modeling.createLinkOSH('resource', dbsnapshotOSH, dblinkobjOSH)
                 OSHVResult.add(resourceOSH)
@@ -938,18 +1017,14 @@ def parseDbLinkobjResourceDbsnapshotTableQueryRes(dbLinkobjResourceDbsnapshotTab
 def parseDbtablespaceResourceDbdatafileTableQueryRes(dbtablespaceResourceDbdatafileTableQueryRes, executor, OSHVResult):
     if dbtablespaceResourceDbdatafileTableQueryRes is not None:
         rows = 0
-        while dbtablespaceResourceDbdatafileTableQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        for file_id, tablespace_data_name in dbtablespaceResourceDbdatafileMapper.rows(dbtablespaceResourceDbdatafileTableQueryRes):
             rows = rows + 1
-            file_id = dbtablespaceResourceDbdatafileTableQueryRes.getString(1)
-            tablespace_data_name = dbtablespaceResourceDbdatafileTableQueryRes.getString(2)
-
             dbdatafileOSH = ObjectStateHolder('dbdatafile')
             dbdatafileOSH.setAttribute('dbdatafile_fileid' , int(file_id))
-            dbdatafileOSH.setContainer(executor.getOracleOsh())
+            dbdatafileOSH.setContainer(oracleOsh)
 
-            dbtablespaceOSH = ObjectStateHolder('dbtablespace')
-            dbtablespaceOSH.setAttribute('data_name', tablespace_data_name)
-            dbtablespaceOSH.setContainer(executor.getOracleOsh())
+            dbtablespaceOSH = createReferenceOsh('dbtablespace', tablespace_data_name, oracleOsh)
 
             resourceOSH = modeling.createLinkOSH('resource', dbtablespaceOSH, dbdatafileOSH)
             OSHVResult.add(resourceOSH)
@@ -962,90 +1037,71 @@ def setOracleVersion(oracleOSH, dbVersion, appVersion):
         oracleOSH.setAttribute('application_version', appVersion)
 
 
-def parseDbPFileTableQueryRes(dbPFileTableQueryRes, executor, OSHVResult):
-    r'Discover how was the db started'
-    value = 'SPFILE'
-    if dbPFileTableQueryRes is not None:
-        while dbPFileTableQueryRes.next():
-            value = dbPFileTableQueryRes.getString(1)
-            logger.debug('value:', value)
-    return value
+def prepareQueryForDbObjects(Framework):
+    return dbaObjectsTableQuery + prepareDbObjectTypes(Framework) + ')'
 
 
-def prepareQueryForDbObjects(Framework):
+def prepareDbObjectTypes(Framework):
+    r'''Object types to discover as the content of an SQL in-list
+    @types: Framework -> str'''
     delimiter = ''
-    dbaObjectsTableQuery = (
-        "SELECT owner,object_name,object_type, "
-            "nvl(to_char(created, 'YYYY.MM.DD_HH24:MI:SS'),'null'), "
-            "nvl(to_char(last_ddl_time, 'YYYY.MM.DD_HH24:MI:SS'),'null'), "
-            "TIMESTAMP,status "
-        "FROM DBA_OBJECTS "
-        "WHERE object_type in (")
+    dbaObjectsTypes = ''
 
     try:
         if Boolean.parseBoolean(Framework.getParameter('discoverFunctions')):
-            dbaObjectsTableQuery = dbaObjectsTableQuery + delimiter + '\'FUNCTION\''
+            dbaObjectsTypes = dbaObjectsTypes + delimiter + '\'FUNCTION\''
             delimiter = ','
     except:
         logger.debugException('discoverFunctions')
         pass
     try:
         if Boolean.parseBoolean(Framework.getParameter('discoverProcedures')):
-            dbaObjectsTableQuery = dbaObjectsTableQuery + delimiter + '\'PROCEDURE\''
+            dbaObjectsTypes = dbaObjectsTypes + delimiter + '\'PROCEDURE\''
             delimiter = ','
     except:
         logger.debugException('discoverProcedures')
         pass
     try:
         if Boolean.parseBoolean(Framework.getParameter('discoverPackages')):
-            dbaObjectsTableQuery = dbaObjectsTableQuery + delimiter + '\'PACKAGE\''
+            dbaObjectsTypes = dbaObjectsTypes + delimiter + '\'PACKAGE\''
             delimiter = ','
     except:
         logger.debugException('discoverPackages')
         pass
     try:
         if Boolean.parseBoolean(Framework.getParameter('discoverPackageBody')):
-            dbaObjectsTableQuery = dbaObjectsTableQuery + delimiter + '\'PACKAGE BODY\''
+            dbaObjectsTypes = dbaObjectsTypes + delimiter + '\'PACKAGE BODY\''
             delimiter = ','
     except:
         logger.debugException('discoverPackageBody')
         pass
     try:
         if Boolean.parseBoolean(Framework.getParameter('discoverTables')):
-            dbaObjectsTableQuery = dbaObjectsTableQuery + delimiter + '\'TABLE\''
+            dbaObjectsTypes = dbaObjectsTypes + delimiter + '\'TABLE\''
             delimiter = ','
     except:
         logger.debugException('discoverTables')
-    if delimiter != '':
-        dbaObjectsTableQuery = dbaObjectsTableQuery + ')'
-    else:
-        dbaObjectsTableQuery = dbaObjectsTableQuery + 'NULL )'
-    return dbaObjectsTableQuery
+    if delimiter == '':
+        dbaObjectsTypes = 'NULL '
+    return dbaObjectsTypes
 
 
 def dbTablespaceToUsersParser(dbTablespaceToUsersQueryRes, executor, OSHVResult):
     if dbTablespaceToUsersQueryRes is not None:
         rows = 0
-        while dbTablespaceToUsersQueryRes.next():
+        oracleOsh = executor.getOracleOsh()
+        mapper = dbTablespaceToUsersMapper
+        for row in mapper.rows(dbTablespaceToUsersQueryRes):
             rows = rows + 1
-            userName = dbTablespaceToUsersQueryRes.getString(1)
-            tablespaceName = dbTablespaceToUsersQueryRes.getString(2)
-            tempTableSpaceName = dbTablespaceToUsersQueryRes.getString(3)
-
-            dbuserOSH = ObjectStateHolder('dbuser')
-            dbuserOSH.setAttribute('data_name', userName)
-            dbuserOSH.setContainer(executor.getOracleOsh())
+            tempTableSpaceName = row[2]
 
-            dbtablespaceOSH = ObjectStateHolder('dbtablespace')
-            dbtablespaceOSH.setAttribute('data_name', tablespaceName)
-            dbtablespaceOSH.setContainer(executor.getOracleOsh())
+            dbuserOSH = DBUSER_TEMPLATE.build(row, mapper, oracleOsh)
+            dbtablespaceOSH = DBTABLESPACE_TEMPLATE.build(row, mapper, oracleOsh)
 
             OSHVResult.add(modeling.createLinkOSH('usage', dbuserOSH, dbtablespaceOSH))
 
             if tempTableSpaceName and tempTableSpaceName.strip():
-                dbtablespaceOSH = ObjectStateHolder('dbtablespace')
-                dbtablespaceOSH.setAttribute('data_name', tempTableSpaceName)
-                dbtablespaceOSH.setContainer(executor.getOracleOsh())
+                dbtablespaceOSH = createReferenceOsh('dbtablespace', tempTableSpaceName, oracleOsh)
 
                 OSHVResult.add(modeling.createLinkOSH('usage', dbuserOSH, dbtablespaceOSH))
 
@@ -1057,14 +1113,16 @@ def dbTablespaceToUsersParser(dbTablespaceToUsersQueryRes, executor, OSHVResult)
 # def discoverOracle(oracleClient, oracleOSH, discoveredHostOSH, Framework):
 def discoverOracle(oracleClient, oracleOSH, discoveredHostOSH, Framework, shellUtils):
 
+    spfileQuery = Query(dbSpfileTableQuery, parsedbSpfileTableQueryRes)
+    snapshotQuery = Query(dbSnapshotTableQuery, parseDbSnapshotTableQueryRes)
     queries =\
     [
-    Query(dbSpfileTableQuery, parsedbSpfileTableQueryRes),
+    spfileQuery,
     Query(dbTablespaceTableQuery, parseDbTablespaceTableQueryRes),
     Query(dbTablespaceTableQueryV8,
           parseDbTablespaceTableQueryRes,
           DbVersionValidator(required=8)),
-    Query(dbSnapshotTableQuery, parseDbSnapshotTableQueryRes),
+    snapshotQuery,
     Query(dbDatafileTableQuery, parseDbDatafileTableQueryRes),
     Query(dbSchedulerjobTableQuery, parseDbSchedulerJobTableQueryRes,
           #  version greater than 9
@@ -1075,25 +1133,26 @@ def discoverOracle(oracleClient, oracleOSH, discoveredHostOSH, Framework, shellU
     Query(dbProcessDbClientTableQuery, parseDbProcessDbClientTableQueryRes)
     ]
 
-    pfileQuery = Query(dbPFileTableQuery, parseDbPFileTableQueryRes)
-    racPFileInfoQuery = Query(dbRacPFileInfoTableQuery, None)
-    racNodeInfoQuery = Query(dbRacNodeInfoTableQuery, None)
-
-    racInfoQuery = Query(dbRacInfoTableQuery, None)
     allRacInfoQuery = RacInfoQuery(parseAllRacTableQueryRes)
-    allRacInfoQuery.setPFileQuery(pfileQuery)
-    allRacInfoQuery.setRacPFileInfoQuery(racPFileInfoQuery)
-    allRacInfoQuery.setRacInfoQuery(racInfoQuery)
-    allRacInfoQuery.setNodeInfoQuery(racNodeInfoQuery)
-
-    dbaObjectsTableQuery = prepareQueryForDbObjects(Framework)
+    allRacInfoQuery.setNodeInfoQuery(Query(dbRacNodeInfoTableQuery, None))
+    allRacInfoQuery.setRacInfoQuery(Query(dbRacInfoTableQuery, None))
+    allRacInfoQuery.setInterconnectQuery(Query(dbRacInterconnectTableQuery, None))
+    # both update the oracle OSH
+    allRacInfoQuery.dependsOn(spfileQuery)
+
+    dbaObjectsQuery = Query(prepareQueryForDbObjects(Framework), parseDbaObjectsTableQueryRes)
+    if Boolean.parseBoolean(Framework.getParameter('discoverObjectsIncrementally')):
+        dbaObjectsQuery = DbObjectsDeltaQuery(prepareDbObjectTypes(Framework),
+                                              Framework.getDestinationAttribute('id'),
+                                              parseDbaObjectsTableQueryRes)
     queries +=\
     [
     allRacInfoQuery,
+    # snapshot OSHs are shared through the executor and filled by snapshotQuery
     Query(dbsnapshotResourceDbjobtTableQuery,
-          parseDbsnapshotResourceDbjobtTableQueryRes),
+          parseDbsnapshotResourceDbjobtTableQueryRes).dependsOn(snapshotQuery),
     Query(dbLinkobjResourceDbsnapshotTableQuery,
-          parseDbLinkobjResourceDbsnapshotTableQueryRes),
+          parseDbLinkobjResourceDbsnapshotTableQueryRes).dependsOn(snapshotQuery),
     Query(dbtablespaceResourceDbdatafileTableQuery,
           parseDbtablespaceResourceDbdatafileTableQueryRes),
     Query(dbLinkobjTableQuery, parseDbLinkobjTableQueryRes)
@@ -1107,10 +1166,10 @@ def discoverOracle(oracleClient, oracleOSH, discoveredHostOSH, Framework, shellU
         Query(dbUserTableQuery, parseDbUserTableQueryRes),  # dbuser
         Query(dbJobTableQuery, parseDbJobTableQueryRes),  # dbjob
         Query(dbJobOwnerDbUserTableQuery, parseDbJobOwnerDbUserTableQueryRes),  # dbjob, dbuser
-        Query(dbaObjectsTableQuery, parseDbaObjectsTableQueryRes),  # dbaobjects
+        dbaObjectsQuery,  # dbaobjects
         Query(dbLinkobjOwnerDbUserTableQuery, parseDbLinkobjOwnerDbUserTableQueryRes),  # dblinkobj, dbuser
         Query(dbLinkobjOwnerDbUserPublicTableQuery, parseDbLinkobjOwnerDbUserPublicTableQueryRes),  # dblinkobj, dbuser
-        Query(dbSnapshotOwnerDbUserTableQuery, parseDbSnapshotOwnerDbUserTableQueryRes),  # dbsnapshot, dbuser
+        Query(dbSnapshotOwnerDbUserTableQuery, parseDbSnapshotOwnerDbUserTableQueryRes).dependsOn(snapshotQuery),  # dbsnapshot, dbuser
         Query(dbTablespaceToUsersQuery, dbTablespaceToUsersParser)
         ]
 
@@ -1122,26 +1181,57 @@ def discoverOracle(oracleClient, oracleOSH, discoveredHostOSH, Framework, shellU
     # queryExecutor = Executor(oracleClient, oracleOSH, discoveredHostOSH)
     queryExecutor = Executor(oracleClient, oracleOSH, discoveredHostOSH, shellUtils) # adjusted - added shellUtils by Daniel La
     isFullyCrashed = 1
-
-    def sendVectorImmediately(vector):
-        Framework.sendObjects(vector)
-        vector.clear()
+    statistics = Util.createJobStatistics(Framework)
+    queryExecutor.setStatistics(statistics)
 
     pageSize = Framework.getParameter('discoverReportPageSize')
     pageSize = str(pageSize).strip().isdigit() and int(pageSize) or 1000
+    # 0 turns adaptive paging and send batching off
+    pageOshBudget = Framework.getParameter('discoverReportPageOshBudget')
+    if str(pageOshBudget).strip().isdigit():
+        pageOshBudget = int(pageOshBudget)
+    else:
+        pageOshBudget = DEFAULT_PAGE_OSH_BUDGET
+    fetchSize = Framework.getParameter('discoverFetchSize')
+    fetchSize = str(fetchSize).strip().isdigit() and int(fetchSize) or DEFAULT_FETCH_SIZE
+    queryThreads = Framework.getParameter('discoverQueryThreads')
+    queryThreads = str(queryThreads).strip().isdigit() and int(queryThreads) or 1
+
+    vectorSender = VectorSender(Framework, pageOshBudget, statistics)
+
+    def runQuery(query, executor):
+        r'@types: Query, Executor -> bool'
+        startTime = time.time()
+        try:
+            try:
+                logger.debug('run query relevant to parser: "%s"' % query)
+                query.use(executor).execute(vectorSender.send)
+                return 1
+            except QueryExecuteException, qee:
+                logger.error(str(qee))
+                logger.debug(logger.prepareFullStackTrace(str(qee)))
+            except JException, je:
+                msg = str(je.getMessage())
+                logger.error(logger.prepareFullStackTrace(msg))
+                errormessages.resolveAndReport(msg, protocolName, Framework)
+            except Exception, e:
+                msg = str(e)
+                logger.error(logger.prepareFullStackTrace(msg))
+                errormessages.resolveAndReport(msg, protocolName, Framework)
+        finally:
+            query.elapsedTime = time.time() - startTime
+        return 0
 
+    executableQueries = []
     for query in queries:
         try:
             if query.isExecutable(queryExecutor):
                 query.limit = pageSize
-                logger.debug('run query relevant to parser: "%s"' % query)
-                query.use(queryExecutor).execute(sendVectorImmediately)
-                isFullyCrashed = 0
+                query.oshBudget = pageOshBudget
+                query.fetchSize = fetchSize
+                executableQueries.append(query)
             else:
                 logger.warn("Query is not executable. Reason: %s" % query.validator.getReason())
-        except QueryExecuteException, qee:
-            logger.error(str(qee))
-            logger.debug(logger.prepareFullStackTrace(str(qee)))
         except JException, je:
             msg = str(je.getMessage())
             logger.error(logger.prepareFullStackTrace(msg))
@@ -1151,10 +1241,145 @@ def discoverOracle(oracleClient, oracleOSH, discoveredHostOSH, Framework, shellU
             logger.error(logger.prepareFullStackTrace(msg))
             errormessages.resolveAndReport(msg, protocolName, Framework)
 
+    try:
+        if queryThreads > 1 and len(executableQueries) > 1:
+            try:
+                queryExecutor.openClientPool(Framework.createClient, min(queryThreads, len(executableQueries)))
+                if executeQueriesConcurrently(executableQueries, queryExecutor, runQuery):
+                    isFullyCrashed = 0
+            finally:
+                queryExecutor.closeClientPool()
+        else:
+            for query in executableQueries:
+                if runQuery(query, queryExecutor):
+                    isFullyCrashed = 0
+    finally:
+        # send what the queries reported so far also when they were interrupted
+        vectorSender.flush()
+        queryExecutor.closeStatements()
+
+    for query in executableQueries:
+        query.onResultsSent()
+
+    for query in executableQueries:
+        logger.debug('Query "%s" took %.2f s, rows: %s, pages: %s, bytes: %s, OSHs: %s'
+                     % (query, query.elapsedTime, query.rows, query.pages, query.bytes, query.oshs))
+    logger.debug('Results sent in %s batches' % vectorSender.getSendCount())
+    logger.debug('Statements parsed: %s, executed: %s' % queryExecutor.getStatementCounts())
+    Util.reportJobStatistics(Framework, statistics, 'SQL_Dis_Oracle')
+
     if isFullyCrashed:
         raise Exception('None of the queries was executed')
 
 
+class QueryTask(Callable):
+    '''
+    Runs one query on a client borrowed from the executor pool.
+    The task waits for the queries it depends on before borrowing a client.
+    '''
+    def __init__(self, query, executor, clients, runQuery):
+        self.query = query
+        self.executor = executor
+        self.clients = clients
+        self.runQuery = runQuery
+        self.dependencies = []
+        self.done = CountDownLatch(1)
+        self.succeeded = 0
+
+    def call(self):
+        try:
+            for dependency in self.dependencies:
+                dependency.done.await()
+            client = self.clients.take()
+            try:
+                self.succeeded = self.runQuery(self.query, self.executor.withClient(client))
+            finally:
+                self.clients.put(client)
+        finally:
+            self.done.countDown()
+        return self.succeeded
+
+
+def executeQueriesConcurrently(queries, executor, runQuery):
+    r'''Run queries on all the executor pooled clients at once.
+    Dependencies must be listed before the queries that need them: tasks
+    start in list order, so a waiting task never holds back its dependency.
+    @types: list[Query], Executor, callable -> int
+    @return: count of successfully executed queries
+    '''
+    pooledClients = executor.getPooledClients()
+    clients = LinkedBlockingQueue()
+    for client in pooledClients:
+        clients.put(client)
+    tasks = []
+    tasksByQuery = {}
+    for query in queries:
+        task = QueryTask(query, executor, clients, runQuery)
+        for dependency in query.dependencies:
+            if tasksByQuery.has_key(dependency):
+                task.dependencies.append(tasksByQuery[dependency])
+        tasksByQuery[query] = task
+        tasks.append(task)
+
+    logger.debug('Running %s queries on %s connections' % (len(tasks), len(pooledClients)))
+    workerPool = Executors.newFixedThreadPool(len(pooledClients))
+    try:
+        futures = [workerPool.submit(task) for task in tasks]
+        for future in futures:
+            future.get()
+    finally:
+        workerPool.shutdownNow()
+
+    succeeded = 0
+    for task in tasks:
+        succeeded += task.succeeded
+    return succeeded
+
+
+class VectorSender:
+    '''
+    Collects the page vectors of all queries and sends them in batches of
+    about batchSize OSHs, so that small queries do not cost a send each.
+    A page is always added whole, also when pages come from concurrent
+    queries. With batchSize 0 every page is sent as soon as it is added.
+    '''
+    def __init__(self, Framework, batchSize, statistics=Util.NO_STATISTICS):
+        self.__framework = Framework
+        self.__batchSize = batchSize
+        self.__statistics = statistics
+        self.__pending = ObjectStateHolderVector()
+        self.__lock = ReentrantLock()
+        self.__sendCount = 0
+
+    def send(self, vector):
+        self.__lock.lock()
+        try:
+            self.__pending.addAll(vector)
+            vector.clear()
+            if self.__pending.size() >= self.__batchSize:
+                self.__flush()
+        finally:
+            self.__lock.unlock()
+
+    def flush(self):
+        self.__lock.lock()
+        try:
+            self.__flush()
+        finally:
+            self.__lock.unlock()
+
+    def getSendCount(self):
+        return self.__sendCount
+
+    def __flush(self):
+        if self.__pending.size():
+            startTime = self.__statistics.start()
+            self.__framework.sendObjects(self.__pending)
+            self.__statistics.record('send', startTime, oshs=self.__pending.size())
+            self.__pending.clear()
+            self.__sendCount += 1
+
+
 class Validator:
     '''
     This class plays role of interface, that takes care of permission
@@ -1214,6 +1439,87 @@ class QueryExecuteException(Exception):
     pass
 
 
+class StatementCache:
+    '''
+    Prepared statements of one connection, kept for the lifetime of the job
+    so the same SQL text is parsed once however often it is executed.
+    Clients without prepareStatement get the SQL with the bind values inlined.
+    '''
+    def __init__(self, client):
+        self.__client = client
+        self.__statements = {}
+        self.__supported = 1
+        self.parses = 0
+        self.executions = 0
+
+    def executeQuery(self, sql, parameters):
+        r'@types: str, list -> ResultSet'
+        if self.__supported:
+            statement = self.__statements.get(sql)
+            if statement is None:
+                try:
+                    statement = self.__client.prepareStatement(sql)
+                except AttributeError:
+                    logger.debug('Prepared statements are not supported by the client, bind values are inlined')
+                    self.__supported = 0
+                else:
+                    self.parses += 1
+                    self.__statements[sql] = statement
+            if statement is not None:
+                bindParameters(statement, parameters)
+                self.executions += 1
+                return statement.executeQuery()
+        self.parses += 1
+        self.executions += 1
+        return self.__client.executeQuery(inlineParameters(sql, parameters))
+
+    def close(self):
+        for statement in self.__statements.values():
+            try:
+                statement.close()
+            except:
+                logger.debugException('Failed to close prepared statement')
+        self.__statements = {}
+
+
+def bindParameters(statement, parameters):
+    r'@types: PreparedStatement, list'
+    index = 1
+    for value in parameters:
+        if value is None:
+            statement.setNull(index, Types.VARCHAR)
+        elif isinstance(value, int) or isinstance(value, long):
+            statement.setLong(index, value)
+        elif isinstance(value, float):
+            statement.setDouble(index, value)
+        else:
+            statement.setString(index, value)
+        index += 1
+
+
+def inlineParameters(sql, parameters):
+    r'''Replace the ? placeholders outside of string literals by the values
+    @types: str, list -> str'''
+    if not parameters:
+        return sql
+    values = []
+    for value in parameters:
+        if value is None:
+            values.append('NULL')
+        elif isinstance(value, int) or isinstance(value, long) or isinstance(value, float):
+            values.append(str(value))
+        else:
+            values.append("'%s'" % value.replace("'", "''"))
+    values.reverse()
+    tokens = re.split("('(?:[^']|'')*')", sql)
+    for index in range(0, len(tokens), 2):
+        parts = tokens[index].split('?')
+        for partIndex in range(1, len(parts)):
+            parts[partIndex] = values.pop() + parts[partIndex]
+        tokens[index] = ''.join(parts)
+    return ''.join(tokens)
+
+
 class Executor:
     # def __init__(self, client, oracleOsh, hostOsh):
     def __init__(self, client, oracleOsh, hostOsh, shellUtils): # added shellUtils by Daniel La
@@ -1223,10 +1529,86 @@ class Executor:
         self.__hostOsh = hostOsh
         self.__dbSnapshots = {}
         self.__shellUtils = shellUtils # added by Daniel La
+        self.__mountPointResolver = None
+        if shellUtils is not None:
+            self.__mountPointResolver = Util.MountPointResolver(shellUtils)
+        self.__disks = {}
+        self.__pooledClients = [client]
+        self.__statementCaches = {}
+        self.__statementCachesLock = ReentrantLock()
+        self.__statistics = Util.NO_STATISTICS
 
     def getShellUtils(self):
         return self.__shellUtils
 
+    def setStatistics(self, statistics):
+        r'@types: Util.JobStatistics'
+        self.__statistics = statistics
+
+    def getStatistics(self):
+        return self.__statistics
+
+    def withClient(self, client):
+        r'''Executor that shares this one's OSHs and caches
+        but runs its queries on the given client
+        @types: Client -> Executor'''
+        executor = copy.copy(self)
+        executor.__client = client
+        return executor
+
+    def openClientPool(self, clientFactory, size):
+        r'''Open more connections next to the main client, up to size in total
+        @types: callable, int -> int'''
+        while len(self.__pooledClients) < size:
+            try:
+                self.__pooledClients.append(clientFactory())
+            except:
+                logger.debugException('Failed to open pooled connection')
+                break
+        return len(self.__pooledClients)
+
+    def getPooledClients(self):
+        return self.__pooledClients[:]
+
+    def closeClientPool(self):
+        for client in self.__pooledClients[1:]:
+            self.closeStatements(client)
+            try:
+                client.close()
+            except:
+                logger.debugException('Failed to close pooled connection')
+        self.__pooledClients = self.__pooledClients[:1]
+
+    def getStatementCache(self):
+        r'''Prepared statement cache of the client of this executor,
+        shared with the executors made by withClient
+        @types: -> StatementCache'''
+        self.__statementCachesLock.lock()
+        try:
+            cache = self.__statementCaches.get(id(self.__client))
+            if cache is None:
+                cache = StatementCache(self.__client)
+                self.__statementCaches[id(self.__client)] = cache
+            return cache
+        finally:
+            self.__statementCachesLock.unlock()
+
+    def getStatementCounts(self):
+        r'''Statements parsed and executed over all connections
+        @types: -> tuple(int, int)'''
+        parses = 0
+        executions = 0
+        for cache in self.__statementCaches.values():
+            parses += cache.parses
+            executions += cache.executions
+        return parses, executions
+
+    def closeStatements(self, client=None):
+        r'Close prepared statements of the client or of all clients'
+        for key, cache in self.__statementCaches.items():
+            if client is None or key == id(client):
+                cache.close()
+
     def getOracleOsh(self):
         return self.__oracleOsh
 
@@ -1263,13 +1645,17 @@ class Executor:
     def execute(self, query):
         if query is None or query.value is None:
             raise QueryExecuteException("No query specified to execute")
+        startTime = self.__statistics.start()
         try:
-            return self.__client.executeQuery(query.value)
-        except SQLException, sqlException:
-            raise QueryExecuteException(sqlException.getMessage())
-        except JException, je:
-            logger.debug(je.getMessage())
-            raise QueryExecuteException("Failed executing query: %s" % query)
+            try:
+                return self.getStatementCache().executeQuery(query.value, query.parameters)
+            except SQLException, sqlException:
+                raise QueryExecuteException(sqlException.getMessage())
+            except JException, je:
+                logger.debug(je.getMessage())
+                raise QueryExecuteException("Failed executing query: %s" % query)
+        finally:
+            self.__statistics.record('execute %s' % query.getLabel(), startTime)
 
     # create filesystem CI - Daniel La 05/07/2012
     def getDisk(self, path, hostid, ostype):
@@ -1284,25 +1670,33 @@ class Executor:
 
     # get associated filesystem that dbfile resides on - Daniel La - 05/07/2012
     def getFileSystem(self, dataName):
-        logger.debug('*** getFileSystem: ', dataName)
-        disk = None
+        return self.getFileSystems([dataName]).get(dataName)
+
+    def getFileSystems(self, dataNames):
+        r'''Resolve filesystems of a page of db files at once: one mount table
+        read per job on UNIX instead of one df per file
+        @types: list[str] -> dict(str, ObjectStateHolder)
+        '''
+        startTime = self.__statistics.start()
+        disksByPath = {}
         if (self.__shellUtils != None): # AIX box
-            logger.debug('AIX box')
-            try:
-                cmd = 'df \"' + dataName + '\" | awk \'NR==1 {next} {print $7; exit}\''
-                mountpoint = self.__shellUtils.execCmd(cmd)
-                if (mountpoint and (self.__shellUtils.getLastCmdReturnCode() == 0) and (not re.search('Cannot find or open file system', mountpoint))):
-                    ostype = 'unix'
-                    disk = self.getDisk(mountpoint.strip(),self.getHostOsh(),ostype)
-                else:
-                    logger.debug('Failed running: ' + cmd)
-            except:
-                logger.debugException('Failed running: ' + cmd)
+            ostype = 'unix'
+            mountPoints = self.__mountPointResolver.resolve(dataNames)
+            for dataName, mountPoint in mountPoints.items():
+                disk = self.__disks.get(mountPoint)
+                if disk is None:
+                    disk = self.getDisk(mountPoint, self.getHostOsh(), ostype)
+                    self.__disks[mountPoint] = disk
+                disksByPath[dataName] = disk
         else: # WIndows box
-            logger.debug('Windows box')
             ostype = 'win'
-            disk = self.getDisk(dataName,self.getHostOsh(),ostype)
-        return disk
+            for dataName in dataNames:
+                if dataName:
+                    disk = self.getDisk(dataName, self.getHostOsh(), ostype)
+                    if disk is not None:
+                        disksByPath[dataName] = disk
+        self.__statistics.record('filesystems', startTime, len(dataNames), len(disksByPath))
+        return disksByPath
 
 
 class PagedResultSet:
@@ -1312,10 +1706,12 @@ class PagedResultSet:
     Usage:
 
         pagination = PagedResultSet(cursor, limit=1000)
-        while not pagination.complete():
+        while not pagination.isComplete():
             while pagination.next(): # page loop
                 x = pagination.getString(1)
             pagination.reset() # next page
+
+    The limit can be changed between pages with setLimit().
     '''
     class PageEnd(Exception):
         '''
@@ -1329,9 +1725,13 @@ class PagedResultSet:
         First parameter is mandatory ResultSet. Limit is optional, set to 100 by default.
         '''
         self.__cursor = cursor
-        self.__limit = limit
+        self.__limit = max(1, limit)
         self.__count = 0
+        self.__pageEnded = 0
         self.__complete = 0
+        self.__rows = 0
+        self.__pages = 0
+        self.__bytes = 0
 
     def isComplete(self):
         '@types: -> Boolean'
@@ -1345,26 +1745,72 @@ class PagedResultSet:
         '@raise: PagedResultSet.PageEnd'
         '''
         Moves cursor to next record. If cursor is exhausted or page ended returns False.
+        A page holds exactly limit records.
         When next() is called on page ended w/o reset() call PagedResultSet.PageEnd exception raised.
         '''
-        if self.__count >= self.__limit:
+        if self.__complete:
+            return 0
+
+        if self.__pageEnded:
             raise PagedResultSet.PageEnd('Page finished')
 
-        self.__count += 1
         if self.__count >= self.__limit:
+            self.__pageEnded = 1
             return 0
 
         if not self.__cursor.next():
             self.__complete = 1
             return 0
 
+        if not self.__count:
+            self.__pages += 1
+        self.__count += 1
+        self.__rows += 1
         return 1
 
+    def getString(self, index):
+        value = self.__cursor.getString(index)
+        if value:
+            self.__bytes += len(value)
+        return value
+
+    def getRowCount(self):
+        '@types: -> int'
+        '''
+        Returns count of rows read over all pages.
+        '''
+        return self.__rows
+
+    def getPageCount(self):
+        '@types: -> int'
+        '''
+        Returns count of pages holding at least one row.
+        '''
+        return self.__pages
+
+    def getByteCount(self):
+        '@types: -> int'
+        '''
+        Returns count of characters read with getString() over all pages.
+        '''
+        return self.__bytes
+
+    def getLimit(self):
+        return self.__limit
+
+    def setLimit(self, limit):
+        '@types: int'
+        '''
+        Sets count of rows for the next pages.
+        '''
+        self.__limit = max(1, limit)
+
     def reset(self):
         '''
         Move to next page.
         '''
         self.__count = 0
+        self.__pageEnded = 0
 
     def __getattr__(self, name):
         if hasattr(self.__cursor, name):
@@ -1383,12 +1829,34 @@ class Query:
         self.executor = None
         self.parserFunction = None
         self.limit = 1000
+        self.oshBudget = 0
+        self.fetchSize = DEFAULT_FETCH_SIZE
+        self.dependencies = []
+        self.parameters = []
+        self.elapsedTime = 0
+        self.rows = 0
+        self.pages = 0
+        self.bytes = 0
+        self.oshs = 0
         self.setResultSetParser(parserFunction)
 
     def use(self, executor):
         self.executor = executor
         return self
 
+    def dependsOn(self, *queries):
+        r'''Declare queries that have to complete before this one
+        when queries run concurrently
+        @types: Query* -> Query'''
+        self.dependencies.extend(queries)
+        return self
+
+    def bind(self, *parameters):
+        r'''Values of the ? placeholders of the query, in order
+        @types: object* -> Query'''
+        self.parameters = list(parameters)
+        return self
+
     def setResultSetParser(self, resultSetParserFunction):
         self.parserFunction = resultSetParserFunction
 
@@ -1406,20 +1874,82 @@ class Query:
         if callback is None:
             raise QueryExecuteException('Callback is not defined for query: %s' % self)
 
+        statistics = self.executor.getStatistics()
+        startTime = statistics.start()
         resultSet = self.executor.execute(self)
         if not resultSet:
             return
+        self._setFetchSize(resultSet)
 
         paginator = PagedResultSet(resultSet, self.limit)
+        oshs = 0
 
         try:
             while not paginator.isComplete():
                 OshVector = self._parseResultSet(paginator)
+                oshs += OshVector.size()
+                self.oshs += OshVector.size()
+                self._adaptPageSize(paginator)
                 callback(OshVector)
                 paginator.reset()
         finally:
+            self.rows += paginator.getRowCount()
+            self.pages += paginator.getPageCount()
+            self.bytes += paginator.getByteCount()
+            statistics.record('query %s' % self.getLabel(), startTime, paginator.getRowCount(),
+                              oshs, paginator.getByteCount())
             paginator.close()
 
+    def _adaptPageSize(self, paginator):
+        r'''Size next pages to hold about oshBudget OSHs using the OSHs
+        per row seen so far, wide rows get smaller pages'''
+        rows = self.rows + paginator.getRowCount()
+        if not self.oshBudget or not rows:
+            return
+        oshsPerRow = max(1.0, float(self.oshs) / rows)
+        limit = int(self.oshBudget / oshsPerRow)
+        limit = max(min(MIN_PAGE_ROWS, self.limit), min(MAX_PAGE_ROWS, limit))
+        if limit != paginator.getLimit():
+            paginator.setLimit(limit)
+
+    def fetch(self):
+        r'''Execute and return what the parser returns for the whole result set,
+        for helper queries whose rows are used rather than reported
+        @types: -> object'''
+        if self.executor is None:
+            raise QueryExecuteException('Executor is not initialized for query: %s' % self)
+        resultSet = self.executor.execute(self)
+        if not resultSet:
+            return None
+        self._setFetchSize(resultSet)
+        try:
+            return self.parserFunction(resultSet, self.executor, None)
+        finally:
+            resultSet.close()
+
+    def onResultsSent(self):
+        r'Called once everything the query reported has been sent to the server'
+        pass
+
+    def getLabel(self):
+        r'''Name of the query in job statistics: class, first table and SQL
+        digest, so queries sharing a parser are told apart
+        @types: -> str'''
+        if self.value is None:
+            return self.__class__.__name__
+        sql = ' '.join(str(self.value).split())
+        match = SQL_LABEL_TABLE_PATTERN.search(sql)
+        table = match and match.group(1).lower() or 'sql'
+        return '%s %s#%s' % (self.__class__.__name__, table, md5.new(sql).hexdigest()[:6])
+
+    def _setFetchSize(self, resultSet):
+        r'Let the driver bring rows in batches of fetchSize per round trip'
+        if self.fetchSize:
+            try:
+                resultSet.setFetchSize(self.fetchSize)
+            except:
+                logger.debug('Failed to set fetch size for query: %s' % self)
+
     def _parseResultSet(self, resultSet):
         if self.parserFunction is None:
             raise QueryExecuteException('Parser method is not initialized for query: %s' % self)
@@ -1430,7 +1960,7 @@ class Query:
     def __str__(self):
         if self.parserFunction is not None:
             return self.parserFunction.__name__
-        return self
+        return self.getLabel()
 
 
 def convertResultSetToTable(resultSet):
@@ -1450,7 +1980,7 @@ def convertResultSetToTable(resultSet):
         while resultSet.next():
             row = []
             try:
-                for i in range(1, columnsCount):
+                for i in range(1, columnsCount + 1):
                     row.append(resultSet.getString(i))
             except:
                 pass
@@ -1463,35 +1993,50 @@ def returnResultSet(resultSet, executor, OshVector):
 
 
 class RacInfoQuery(Query):
+    '''
+    Discovers the RAC topology with one GV$ query set.
+    Only the instance list is queried on every run: parameters and
+    interconnects of the cluster are shared through the probe-local RAC
+    cache by the triggers of sibling nodes.
+    '''
     def __init__(self, parseFunction, validator=None):
         Query.__init__(self, None, parseFunction, validator)
-        self.__pfileQuery = None
-        self.__racpfileInfoQuery = None
-        self.__racInfoQuery = None
         self.__nodeInfoQuery = None
+        self.__racInfoQuery = None
+        self.__interconnectQuery = None
 
-    def execute(self, OshVector):
-        if self.executor is not None:
-            startupType = self.__pfileQuery.use(self.executor).execute(OshVector)
-            racNodeInfoRs = self.__nodeInfoQuery.use(self.executor).execute(OshVector)
-            racInfoRs = None
-            if (startupType == 'PFILE'):
-                racInfoRs = self.__racpfileInfoQuery.use(self.executor).execute(OshVector)
-            else:
-                racInfoRs = self.__racInfoQuery.use(self.executor).execute(OshVector)
-
-            if self.parserFunction is None:
-                raise QueryExecuteException('Parser method is not initialized for query: %s' % self)
-            self.parserFunction(racInfoRs, racNodeInfoRs, self.executor, OshVector)
-        else:
+    def execute(self, callback):
+        if self.executor is None:
             raise QueryExecuteException('Executor is not initialized for query: %s' % self)
+        if self.parserFunction is None:
+            raise QueryExecuteException('Parser method is not initialized for query: %s' % self)
 
-    def setPFileQuery(self, pfileQuery):
-        self.__pfileQuery = pfileQuery
+        racNodeInfoRows = self.__nodeInfoQuery.use(self.executor).fetch() or []
+        self.rows += len(racNodeInfoRows)
+        if not isClusterDatabase(racNodeInfoRows):
+            logger.debug('Database is not clustered, RAC topology is not discovered')
+            return
 
-    def setRacPFileInfoQuery(self, racPFileInfoQuery):
-        self.__racpfileInfoQuery = racPFileInfoQuery
-        self.__racpfileInfoQuery.setResultSetParser(returnResultSet)
+        fingerprint = getRacFingerprint(racNodeInfoRows)
+        topology = loadRacTopology(fingerprint)
+        if topology:
+            racInfoRows, interconnectRows = topology
+        else:
+            racInfoRows = self.__racInfoQuery.use(self.executor).fetch() or []
+            interconnectRows = []
+            try:
+                interconnectRows = self.__interconnectQuery.use(self.executor).fetch() or []
+            except QueryExecuteException, qee:
+                # GV$CLUSTER_INTERCONNECTS is there since 10g
+                logger.debug('Failed to get cluster interconnects: ', str(qee))
+            self.rows += len(racInfoRows) + len(interconnectRows)
+            saveRacTopology(fingerprint, racInfoRows, interconnectRows)
+
+        OshVector = ObjectStateHolderVector()
+        self.parserFunction(racInfoRows, racNodeInfoRows, interconnectRows, self.executor, OshVector)
+        self.pages += 1
+        self.oshs += OshVector.size()
+        callback(OshVector)
 
     def setRacInfoQuery(self, racInfoQuery):
         self.__racInfoQuery = racInfoQuery
@@ -1501,6 +2046,286 @@ class RacInfoQuery(Query):
         self.__nodeInfoQuery = racNodeInfoQuery
         self.__nodeInfoQuery.setResultSetParser(returnResultSet)
 
+    def setInterconnectQuery(self, racInterconnectQuery):
+        self.__interconnectQuery = racInterconnectQuery
+        self.__interconnectQuery.setResultSetParser(returnResultSet)
+
+
+def isClusterDatabase(racNodeInfoRows):
+    r'@types: list[list[str]] -> bool'
+    for row in racNodeInfoRows:
+        if len(row) > 6 and row[6] and row[6].upper() == 'TRUE':
+            return 1
+    return 0
+
+
+def getRacFingerprint(racNodeInfoRows):
+    r'''Cluster identity: database id and name plus the instance list
+    @types: list[list[str]] -> str'''
+    instances = []
+    for row in racNodeInfoRows:
+        instances.append('%s@%s' % (row[1], row[2]))
+    instances.sort()
+    dbIdentity = ''
+    if racNodeInfoRows and len(racNodeInfoRows[0]) > 5:
+        dbIdentity = '%s:%s' % (racNodeInfoRows[0][4], racNodeInfoRows[0][5])
+    return md5.new(dbIdentity + '|' + ','.join(instances)).hexdigest()
+
+
+def getRacCacheDir():
+    if RAC_CACHE_DIR is not None:
+        return RAC_CACHE_DIR
+    return os.path.join(CollectorsParameters.PROBE_MGR_TEMP_DIR, 'oracle_rac_topology')
+
+
+def loadRacTopology(fingerprint):
+    r'''Parameter and interconnect rows published by a sibling node trigger
+    @types: str -> tuple(list, list) or None'''
+    try:
+        cacheFile = os.path.join(getRacCacheDir(), fingerprint + '.rac')
+        if not os.path.isfile(cacheFile):
+            return None
+        if time.time() - os.path.getmtime(cacheFile) > RAC_CACHE_MAX_AGE:
+            logger.debug('RAC topology cache is too old: ', cacheFile)
+            return None
+        cacheHandle = open(cacheFile, 'r')
+        try:
+            cacheLines = cacheHandle.read().split('\n')
+        finally:
+            cacheHandle.close()
+        racInfoRows = []
+        interconnectRows = []
+        for cacheLine in cacheLines:
+            fields = [field or None for field in cacheLine.split('\t')]
+            if fields[0] == 'P':
+                racInfoRows.append(fields[1:])
+            elif fields[0] == 'C':
+                interconnectRows.append(fields[1:])
+        logger.debug('Reusing RAC topology of sibling node discovery: ', cacheFile)
+        return racInfoRows, interconnectRows
+    except:
+        logger.debugException('Failed to read RAC topology cache')
+    return None
+
+
+def saveRacTopology(fingerprint, racInfoRows, interconnectRows):
+    r'@types: str, list, list'
+    try:
+        cacheDir = getRacCacheDir()
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        cacheLines = []
+        for (tag, rows) in (('P', racInfoRows), ('C', interconnectRows)):
+            for row in rows:
+                fields = [tag] + [(value or '').replace('\t', ' ').replace('\n', ' ') for value in row]
+                cacheLines.append('\t'.join(fields))
+        cacheFile = os.path.join(cacheDir, fingerprint + '.rac')
+        # unique temporary name, sibling triggers may publish at the same time
+        tempFile = '%s.%s.tmp' % (cacheFile, id(cacheLines))
+        cacheHandle = open(tempFile, 'w')
+        try:
+            cacheHandle.write('\n'.join(cacheLines))
+        finally:
+            cacheHandle.close()
+        if os.path.exists(cacheFile):
+            os.remove(cacheFile)
+        os.rename(tempFile, cacheFile)
+        evictRacTopologies(cacheDir)
+    except:
+        logger.debugException('Failed to write RAC topology cache')
+
+
+def evictRacTopologies(cacheDir):
+    r'''Remove cache files, and temporary files left by failed writes,
+    older than RAC_CACHE_MAX_AGE
+    @types: str'''
+    for fileName in os.listdir(cacheDir):
+        if not (fileName.endswith('.rac') or fileName.endswith('.tmp')):
+            continue
+        cacheFile = os.path.join(cacheDir, fileName)
+        try:
+            if time.time() - os.path.getmtime(cacheFile) > RAC_CACHE_MAX_AGE:
+                logger.debug('Removing expired RAC topology cache: ', cacheFile)
+                os.remove(cacheFile)
+        except:
+            # a sibling node trigger may have removed it already
+            logger.debug('Failed to remove RAC topology cache: ', cacheFile)
+
+
+class DbObjectsDeltaQuery(Query):
+    '''
+    DBA_OBJECTS query that reads only objects changed since the last run.
+    A summary query gives per owner the object count and object_id sum; they
+    are kept with the LAST_DDL_TIME watermark in a probe-local state file.
+    Owners whose count and sum do not add up with the objects created since
+    the watermark have lost objects and are read in full, as are new owners.
+    Everything is read when there is no state, the object types changed, or
+    the last full read is older than DBA_OBJECTS_FULL_REFRESH_AGE.
+    The new state is saved only once the objects read have been sent.
+    '''
+    def __init__(self, objectTypes, stateKey, parserFunction, validator=None):
+        Query.__init__(self, None, parserFunction, validator)
+        self.__objectTypes = objectTypes
+        self.__stateKey = re.sub('[^\w.-]', '_', str(stateKey))
+        self.__newState = None
+
+    def execute(self, callback):
+        if self.executor is None:
+            raise QueryExecuteException('Executor is not initialized for query: %s' % self)
+
+        state = loadDbObjectsState(self.__stateKey)
+        watermark = DBA_OBJECTS_NO_WATERMARK
+        if state is not None:
+            watermark = state['watermark']
+        summaryQuery = Query(dbaObjectsSummaryQuery % self.__objectTypes, returnResultSet).bind(watermark, watermark)
+        summaryRows = summaryQuery.use(self.executor).fetch() or []
+        self.rows += len(summaryRows)
+
+        plan, newState = planDbObjectsDelta(state, summaryRows, self.__objectTypes, time.time())
+        self.value = dbaObjectsTableQuery + self.__objectTypes + ')'
+        self.parameters = []
+        if plan is not None:
+            fullOwners, deltaOwners = plan
+            logger.debug('DBA_OBJECTS delta: %s owners read in full, %s owners changed, %s owners unchanged'
+                         % (len(fullOwners), len(deltaOwners), len(summaryRows) - len(fullOwners) - len(deltaOwners)))
+            if not fullOwners and not deltaOwners:
+                self.__newState = newState
+                return
+            fullCondition, fullParameters = getInListCondition('owner', fullOwners)
+            deltaCondition, deltaParameters = getInListCondition('owner', deltaOwners)
+            self.value = (self.value + " AND (" + fullCondition + " OR (" + deltaCondition
+                          + " AND last_ddl_time >= to_date(?, 'YYYY.MM.DD_HH24:MI:SS')))")
+            self.parameters = fullParameters + deltaParameters + [watermark]
+        else:
+            logger.debug('DBA_OBJECTS are read in full')
+        Query.execute(self, callback)
+        self.__newState = newState
+
+    def getLabel(self):
+        # the statement text changes with the owners read
+        return self.__class__.__name__
+
+    def onResultsSent(self):
+        if self.__newState is not None:
+            saveDbObjectsState(self.__stateKey, self.__newState)
+            self.__newState = None
+
+    def __str__(self):
+        return 'DbObjectsDeltaQuery(%s)' % Query.__str__(self)
+
+
+def getInListCondition(column, values):
+    r'''SQL condition with bind variables matching column to any of the values.
+    In-lists are split to stay within MAX_IN_LIST_SIZE and padded with NULL
+    to a power of two, so only a few statement texts are ever parsed
+    @types: str, list[str] -> str, list[str]'''
+    if not values:
+        return '1 = 0', []
+    conditions = []
+    parameters = []
+    for index in range(0, len(values), MAX_IN_LIST_SIZE):
+        chunk = values[index:index + MAX_IN_LIST_SIZE]
+        size = 1
+        while size < len(chunk):
+            size *= 2
+        size = min(size, MAX_IN_LIST_SIZE)
+        conditions.append('%s in (%s)' % (column, ','.join(['?'] * size)))
+        parameters.extend(chunk + [None] * (size - len(chunk)))
+    return '(' + ' OR '.join(conditions) + ')', parameters
+
+
+def planDbObjectsDelta(state, summaryRows, objectTypes, now):
+    r'''Decide which owners are read in full and which only from the watermark
+    @types: dict, list[list[str]], str, float -> tuple(list, list) or None, dict
+    @return: (full owners, changed owners) or None to read everything,
+    and the state to keep once the objects are read
+    '''
+    owners = {}
+    watermark = None
+    for row in summaryRows:
+        owners[row[0]] = (long(row[1]), long(row[2] or 0))
+        # YYYY.MM.DD_HH24:MI:SS orders as a string
+        if row[3] and row[3] != 'null' and (watermark is None or row[3] > watermark):
+            watermark = row[3]
+    newState = {'watermark': watermark or DBA_OBJECTS_NO_WATERMARK,
+                'lastFull': now,
+                'objectTypes': objectTypes,
+                'owners': owners}
+    if (state is None or state['objectTypes'] != objectTypes
+        or now - state['lastFull'] > DBA_OBJECTS_FULL_REFRESH_AGE):
+        return None, newState
+
+    newState['lastFull'] = state['lastFull']
+    fullOwners = []
+    deltaOwners = []
+    for row in summaryRows:
+        owner = row[0]
+        count, idSum = owners[owner]
+        previous = state['owners'].get(owner)
+        if previous is None:
+            fullOwners.append(owner)
+        elif (count - long(row[4] or 0), idSum - long(row[5] or 0)) != previous:
+            # objects were dropped since the last run
+            fullOwners.append(owner)
+        elif row[3] and row[3] != 'null' and row[3] >= state['watermark']:
+            deltaOwners.append(owner)
+    return (fullOwners, deltaOwners), newState
+
+
+def getDbObjectsStateDir():
+    if DBA_OBJECTS_STATE_DIR is not None:
+        return DBA_OBJECTS_STATE_DIR
+    return os.path.join(CollectorsParameters.PROBE_MGR_TEMP_DIR, 'oracle_dba_objects')
+
+
+def loadDbObjectsState(stateKey):
+    r'@types: str -> dict or None'
+    try:
+        stateFile = os.path.join(getDbObjectsStateDir(), stateKey + '.state')
+        if not os.path.isfile(stateFile):
+            return None
+        stateHandle = open(stateFile, 'r')
+        try:
+            stateLines = stateHandle.read().split('\n')
+        finally:
+            stateHandle.close()
+        header = stateLines[0].split('\t')
+        state = {'watermark': header[0],
+                 'lastFull': float(header[1]),
+                 'objectTypes': header[2],
+                 'owners': {}}
+        for stateLine in stateLines[1:]:
+            fields = stateLine.split('\t')
+            if len(fields) == 3:
+                state['owners'][fields[0]] = (long(fields[1]), long(fields[2]))
+        return state
+    except:
+        logger.debugException('Failed to read DBA_OBJECTS state')
+    return None
+
+
+def saveDbObjectsState(stateKey, state):
+    r'@types: str, dict'
+    try:
+        stateDir = getDbObjectsStateDir()
+        if not os.path.isdir(stateDir):
+            os.makedirs(stateDir)
+        stateLines = ['%s\t%s\t%s' % (state['watermark'], state['lastFull'], state['objectTypes'])]
+        for owner, (count, idSum) in state['owners'].items():
+            stateLines.append('%s\t%s\t%s' % (owner, count, idSum))
+        stateFile = os.path.join(stateDir, stateKey + '.state')
+        stateHandle = open(stateFile + '.tmp', 'w')
+        try:
+            stateHandle.write('\n'.join(stateLines))
+        finally:
+            stateHandle.close()
+        if os.path.exists(stateFile):
+            os.remove(stateFile)
+        os.rename(stateFile + '.tmp', stateFile)
+    except:
+        logger.debugException('Failed to write DBA_OBJECTS state')
+
+
 # this discovery job has been enhanced to capture the filesystem that datafiles reside on.
 # a link is created between the datafile and filesystem - Daniel La 05/07/2012
 def DiscoveryMain(Framework):
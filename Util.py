@@ -1,10 +1,16 @@
 #coding=utf-8
 from java.lang import String
+from java.lang import Boolean
+from java.util.concurrent.locks import ReentrantLock
 import re
+import os
+import time
 
 import netutils
 import modeling
+import logger
 from org.python.core import Py
+from com.hp.ucmdb.discovery.library.common import CollectorsParameters
 
 def getHostKey(host, domain):
     return netutils.getHostAddress(host) + " " + domain
@@ -98,3 +104,251 @@ def mapToInString(objectMap,attribute):
 ######################################################
 def getSqlServer(name,host,sqlserverid):
     return modeling.createOshByCmdbId("sqlserver", sqlserverid)
+
+######################################################
+## Mount point resolution for UNIX database files
+######################################################
+def quoteShellArgument(value):
+    return "'" + value.replace("'", "'\\''") + "'"
+
+def getParentDirectory(path):
+    index = path.rfind('/')
+    if index > 0:
+        return path[:index]
+    return '/'
+
+def parseDfMountPoint(line):
+    # POSIX df -P line: Filesystem blocks Used Available Capacity Mounted on
+    tokens = line.split()
+    if len(tokens) >= 6 and tokens[5].startswith('/'):
+        return ' '.join(tokens[5:])
+    return None
+
+def parseDfMountPoints(output):
+    mountPoints = []
+    for line in output.splitlines():
+        mountPoint = parseDfMountPoint(line.strip())
+        if mountPoint and mountPoint not in mountPoints:
+            mountPoints.append(mountPoint)
+    # longest first so the first match is the innermost of nested mounts
+    mountPoints.sort(lambda x, y: cmp(len(y), len(x)))
+    return mountPoints
+
+def findMountPoint(path, mountPoints):
+    for mountPoint in mountPoints:
+        if mountPoint == '/' or path == mountPoint or path.startswith(mountPoint + '/'):
+            return mountPoint
+    return None
+
+class MountPointResolver:
+    '''
+    Resolves the mount points of many files on one UNIX host with as few
+    shell round trips as possible. The mount table is read once with df -P
+    and files are matched to the longest mount point prefix locally. Files
+    not covered by the table are sent to a single chunked df call.
+    Results are cached by parent directory for the lifetime of the resolver,
+    or by the path itself for paths that may be directories.
+    '''
+    CHUNK_SIZE = 100
+    MARKER = 'DFDIR:'
+
+    def __init__(self, shellUtils):
+        self.__shellUtils = shellUtils
+        self.__mountPoints = None
+        self.__directories = {}
+
+    def getMountPoints(self):
+        if self.__mountPoints is None:
+            self.__mountPoints = []
+            cmd = 'df -P'
+            try:
+                output = self.__shellUtils.execCmd(cmd)
+                if output and self.__shellUtils.getLastCmdReturnCode() == 0:
+                    self.__mountPoints = parseDfMountPoints(output)
+                else:
+                    logger.debug('Failed running: ' + cmd)
+            except:
+                logger.debugException('Failed running: ' + cmd)
+            logger.debug('Mount points found: ', len(self.__mountPoints))
+        return self.__mountPoints
+
+    def resolve(self, paths, directories=0):
+        r'''@types: list[str], bool -> dict(str, str)
+        @param directories: paths may be directories and mount points
+        themselves, resolve the path rather than its parent directory
+        '''
+        mountPointByPath = {}
+        unresolved = {}
+        for path in paths:
+            if not path:
+                continue
+            if directories:
+                directory = path.rstrip('/') or '/'
+            else:
+                directory = getParentDirectory(path)
+            if self.__directories.has_key(directory):
+                mountPoint = self.__directories[directory]
+            else:
+                mountPoint = findMountPoint(directory, self.getMountPoints())
+                if mountPoint:
+                    self.__directories[directory] = mountPoint
+                else:
+                    unresolved.setdefault(directory, []).append(path)
+                    continue
+            if mountPoint:
+                mountPointByPath[path] = mountPoint
+        if unresolved:
+            directories = unresolved.keys()
+            for index in range(0, len(directories), MountPointResolver.CHUNK_SIZE):
+                self.__resolveRemotely(directories[index:index + MountPointResolver.CHUNK_SIZE])
+            for directory, directoryPaths in unresolved.items():
+                mountPoint = self.__directories.get(directory)
+                if mountPoint:
+                    for path in directoryPaths:
+                        mountPointByPath[path] = mountPoint
+        return mountPointByPath
+
+    def resolvePath(self, path):
+        r'@types: str -> str or None'
+        return self.resolve([path]).get(path)
+
+    def __resolveRemotely(self, directories):
+        for directory in directories:
+            # cache failures as well, the directory is not retried in this job
+            self.__directories[directory] = None
+        cmd = ('for f in %s; do echo "%s$f"; df -P "$f" 2>/dev/null | tail -1; done'
+               % (' '.join(map(quoteShellArgument, directories)), MountPointResolver.MARKER))
+        try:
+            output = self.__shellUtils.execCmd(cmd)
+        except:
+            logger.debugException('Failed running: ' + cmd)
+            return
+        if not output:
+            logger.debug('Failed running: ' + cmd)
+            return
+        directory = None
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith(MountPointResolver.MARKER):
+                directory = line[len(MountPointResolver.MARKER):]
+            elif directory and self.__directories.has_key(directory):
+                mountPoint = parseDfMountPoint(line)
+                if mountPoint:
+                    self.__directories[directory] = mountPoint
+
+######################################################
+## Job statistics
+######################################################
+class JobStatistics:
+    '''
+    Wall time, calls, rows read, OSHs produced and bytes read per stage of a
+    discovery job, summed over all threads. A disabled instance returns from
+    every call at once, so stages can be recorded unconditionally.
+    '''
+    def __init__(self, enabled=1):
+        self.__enabled = enabled
+        self.__stages = {}
+        self.__order = []
+        self.__lock = ReentrantLock()
+
+    def isEnabled(self):
+        return self.__enabled
+
+    def start(self):
+        r'''Start time to pass to record, None when disabled
+        @types: -> float or None'''
+        if self.__enabled:
+            return time.time()
+        return None
+
+    def record(self, stage, startTime, rows=0, oshs=0, bytes=0):
+        r'@types: str, float, int, int, int'
+        if startTime is None:
+            return
+        elapsedTime = time.time() - startTime
+        self.__lock.lock()
+        try:
+            values = self.__stages.get(stage)
+            if values is None:
+                values = [0, 0.0, 0, 0, 0]
+                self.__stages[stage] = values
+                self.__order.append(stage)
+            values[0] += 1
+            values[1] += elapsedTime
+            values[2] += rows
+            values[3] += oshs
+            values[4] += bytes
+        finally:
+            self.__lock.unlock()
+
+    def getStage(self, stage):
+        r'''@types: str -> dict or None
+        @return: calls, time, rows, oshs and bytes of the stage'''
+        values = self.__stages.get(stage)
+        if values is None:
+            return None
+        return {'calls': values[0], 'time': values[1], 'rows': values[2],
+                'oshs': values[3], 'bytes': values[4]}
+
+    def getStages(self):
+        return self.__order[:]
+
+    def logSummary(self, title):
+        if not self.__enabled:
+            return
+        lines = [title,
+                 '%-50s %8s %10s %10s %10s %12s' % ('Stage', 'Calls', 'Time (s)', 'Rows', 'OSHs', 'Bytes')]
+        stages = self.getStages()
+        stages.sort(lambda x, y: cmp(self.__stages[y][1], self.__stages[x][1]))
+        for stage in stages:
+            values = self.__stages[stage]
+            lines.append('%-50s %8d %10.2f %10d %10d %12d' % (stage[:50], values[0], values[1],
+                                                              values[2], values[3], values[4]))
+        logger.debug('\n'.join(lines))
+
+    def toJson(self):
+        stages = []
+        for stage in self.getStages():
+            values = self.__stages[stage]
+            stages.append('{"stage": "%s", "calls": %d, "time": %.3f, "rows": %d, "oshs": %d, "bytes": %d}'
+                          % (stage.replace('\\', '\\\\').replace('"', '\\"'),
+                             values[0], values[1], values[2], values[3], values[4]))
+        return '[\n' + ',\n'.join(stages) + '\n]'
+
+    def writeJson(self, path):
+        r'@types: str'
+        if not self.__enabled:
+            return
+        try:
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            jsonFile = open(path, 'w')
+            try:
+                jsonFile.write(self.toJson())
+            finally:
+                jsonFile.close()
+            logger.debug('Job statistics written to ', path)
+        except:
+            logger.debugException('Failed to write job statistics to ' + path)
+
+NO_STATISTICS = JobStatistics(0)
+
+def createJobStatistics(Framework):
+    r'''Statistics enabled by the reportJobStatistics job parameter
+    @types: Framework -> JobStatistics'''
+    if Boolean.parseBoolean(Framework.getParameter('reportJobStatistics')):
+        return JobStatistics()
+    return NO_STATISTICS
+
+def reportJobStatistics(Framework, statistics, jobName):
+    r'''Log the summary table and, with the writeJobStatisticsFile job
+    parameter, write it as JSON to the probe temp directory
+    @types: Framework, JobStatistics, str'''
+    if not statistics.isEnabled():
+        return
+    destinationId = re.sub('[^\\w.-]', '_', str(Framework.getDestinationAttribute('id')))
+    statistics.logSummary('%s statistics for %s' % (jobName, destinationId))
+    if Boolean.parseBoolean(Framework.getParameter('writeJobStatisticsFile')):
+        statistics.writeJson(os.path.join(CollectorsParameters.PROBE_MGR_TEMP_DIR, 'job_statistics',
+                                          '%s_%s.json' % (jobName, destinationId)))
@@ -16,6 +16,7 @@ import modeling
 import errormessages
 import shellutils
  # added by Daniel La
+import Util
 
 from appilog.common.system.types.vectors import ObjectStateHolderVector
 from appilog.common.system.types import ObjectStateHolder
@@ -90,14 +91,72 @@ def getDisk(path,hostId, ostype):
     type = modeling.UNKNOWN_STORAGE_TYPE
     return modeling.createDiskOSH(hostId, diskName, type, name = diskName)
 
+#######################################################################
+#
+# ContainerFileSystemResolver - filesystems of tablespace containers
+#
+#######################################################################
+def isRawDevice(path):
+    return path.startswith('/dev/')
+
+def getWindowsDrive(path):
+    # C:\db2\... as well as raw \\.\C: devices, physical drives have no letter
+    match = re.match(r'(?:\\\\[.?]\\)?([A-Za-z]):', path)
+    if match:
+        return match.group(1).upper()
+    return None
+
+class ContainerFileSystemResolver:
+    '''
+    Resolves the filesystems of all containers of a job at once. On UNIX the
+    mount table is read once per host and containers are matched to the
+    longest mount point locally, raw devices have no filesystem. On Windows
+    containers map to their drive letter. Filesystem OSHs are cached for all
+    tablespaces of the job.
+    '''
+    def __init__(self, shellUtils, hostid):
+        self.__hostid = hostid
+        self.__mountPointResolver = None
+        if shellUtils is not None: # AIX box
+            self.__mountPointResolver = Util.MountPointResolver(shellUtils)
+        self.__disks = {}
+
+    def resolve(self, paths):
+        r'@types: list[str] -> dict(str, ObjectStateHolder)'
+        disksByPath = {}
+        if self.__mountPointResolver is not None:
+            files = [path for path in paths if path and not isRawDevice(path)]
+            # SMS containers are directories and can be mount points themselves
+            mountPoints = self.__mountPointResolver.resolve(files, directories=1)
+            for path, mountPoint in mountPoints.items():
+                disk = self.__getDisk(mountPoint, 'unix')
+                if disk is not None:
+                    disksByPath[path] = disk
+            logger.debug('Containers: ', len(paths), ' raw devices: ', len(paths) - len(files),
+                         ' on filesystems: ', len(disksByPath))
+        else: # WIndows box
+            for path in paths:
+                drive = path and getWindowsDrive(path)
+                if drive:
+                    disk = self.__getDisk(drive + ':\\', 'win')
+                    if disk is not None:
+                        disksByPath[path] = disk
+        return disksByPath
+
+    def __getDisk(self, name, ostype):
+        if not self.__disks.has_key(name):
+            self.__disks[name] = getDisk(name, self.__hostid, ostype)
+        return self.__disks[name]
+
 #######################################################################
 #
 # addDBFile - add dbFile in specific DB
 # file_name: the file,parnetID: the dbServer process
+# disk: the filesystem the file resides on, if known
 #
 #######################################################################
 # def addDBFile(full_path_name,dbtablespace,tblspcname,database_server,file_id,maxsize, OSHVResult):
-def addDBFile(full_path_name,dbtablespace,tblspcname,database_server,file_id,maxsize, OSHVResult, shellUtils, hostid):
+def addDBFile(full_path_name,dbtablespace,tblspcname,database_server,file_id,maxsize, OSHVResult, disk):
     dbFileOSH = ObjectStateHolder('dbdatafile')
     dbFileOSH.setAttribute('data_name', full_path_name)
     dbFileOSH.setAttribute('dbdatafile_fileid', file_id)
@@ -109,30 +168,11 @@ def addDBFile(full_path_name,dbtablespace,tblspcname,database_server,file_id,max
     resource=modeling.createLinkOSH('resource', dbtablespace, dbFileOSH)
     OSHVResult.add(resource)
 
-    # added code to work out which filesystem data file sits on and then create link to filesystem - Daniel La
-    disk = None
-    if (shellUtils != None): # AIX box
-        try:
-            cmd = 'df \"' + full_path_name + '\" | awk \'NR==1 {next} {print $7; exit}\''
-            mountpoint = shellUtils.execCmd(cmd)
-            if mountpoint and shellUtils.getLastCmdReturnCode() == 0 and not re.search('Cannot find or open file system', mountpoint):
-                ostype = 'unix'
-                disk = getDisk(mountpoint.strip(),hostid,ostype)
-                if (disk != None):
-                    OSHVResult.add(disk)
-                    # OSHVResult.add(modeling.createLinkOSH('depend', dbFileOSH, disk)) # ucmdb 8.x - Daniel La
-                    OSHVResult.add(modeling.createLinkOSH('usage', dbFileOSH, disk))
-            else:
-                logger.debug('Failed running: ' + cmd)
-        except:
-            logger.debugException('Failed running: ' + cmd)
-    else: # WIndows box
-        ostype = 'win'
-        disk = getDisk(full_path_name,hostid,ostype)
-        if (disk != None):
-            OSHVResult.add(disk)
-            # OSHVResult.add(modeling.createLinkOSH('depend', dbFileOSH, disk))   # ucmdb 8.x - Daniel La
-            OSHVResult.add(modeling.createLinkOSH('usage', dbFileOSH, disk))
+    # link to the filesystem the data file sits on - Daniel La
+    if (disk != None):
+        OSHVResult.add(disk)
+        # OSHVResult.add(modeling.createLinkOSH('depend', dbFileOSH, disk)) # ucmdb 8.x - Daniel La
+        OSHVResult.add(modeling.createLinkOSH('usage', dbFileOSH, disk))
 
 
 #######################################################################
@@ -142,12 +182,15 @@ def addDBFile(full_path_name,dbtablespace,tblspcname,database_server,file_id,max
 #
 #######################################################################
 # def getDBTablespace(db2Client,parentID,hostid,OSHVResult):
-def getDBTablespace(db2Client,parentID,hostid,OSHVResult, shellUtils): # adjusted by Daniel La
+def getDBTablespace(db2Client,parentID,OSHVResult, fileSystemResolver, statistics=Util.NO_STATISTICS): # adjusted by Daniel La
     rs = None
+    rows = 0
+    containers = []
     try:
         dbfid = 1
         rs = db2Client.executeQuery("select a.TABLESPACE_NAME,a.CONTAINER_NAME,0,A.TABLESPACE_ID  from TABLE(sysproc.SNAPSHOT_CONTAINER('" + db2Client.getDatabaseName() +"',-2)) as a")#@@CMD_PERMISION sql protocol execution
         while (rs.next()):
+            rows = rows + 1
             name = string.strip(rs.getString(1))
             phyname = string.strip(rs.getString(2))
             ## Fix for Defect 32863 to enable handling multiple datafiles per tablespace
@@ -162,12 +205,20 @@ def getDBTablespace(db2Client,parentID,hostid,OSHVResult, shellUtils): # adjuste
             dbtblspOSH.setContainer(parentID)
             OSHVResult.add(dbtblspOSH)
             if (phyname!=''):
-                # addDBFile(phyname,dbtblspOSH,name,parentID,dbfid,0, OSHVResult)
-                addDBFile(phyname,dbtblspOSH,name,parentID,dbfid,0, OSHVResult, shellUtils,hostid) # adjusted by Daniel La
+                containers.append((phyname, dbtblspOSH, name, dbfid))
     finally:
         if rs != None:
             rs.close()
 
+    # filesystems of all containers at once rather than a df per container
+    startTime = statistics.start()
+    disks = fileSystemResolver.resolve([container[0] for container in containers])
+    statistics.record('filesystems', startTime, len(containers), len(disks))
+    for (phyname, dbtblspOSH, name, dbfid) in containers:
+        # addDBFile(phyname,dbtblspOSH,name,parentID,dbfid,0, OSHVResult)
+        addDBFile(phyname,dbtblspOSH,name,parentID,dbfid,0, OSHVResult, disks.get(phyname))
+    return rows
+
 
 #######################################################################
 #
@@ -176,9 +227,11 @@ def getDBTablespace(db2Client,parentID,hostid,OSHVResult, shellUtils): # adjuste
 #######################################################################
 def getDBSession(db2Client, parentID, OSHVResult):
     rs = None
+    rows = 0
     try:
         rs = db2Client.executeQuery("select appl_name,substr(appl_id,1,posstr(appl_id,'.')-1),AUTH_ID,CLIENT_NNAME,client_pid,count(*) from TABLE(sysproc.SNAPSHOT_APPL_INFO('"+ db2Client.getDatabaseName() + "',-2)) as a group by  appl_name,substr(appl_id,1,posstr(appl_id,'.')-1),AUTH_ID,CLIENT_NNAME,client_pid")#@@CMD_PERMISION sql protocol execution
         while rs.next():
+            rows = rows + 1
             programName = string.strip(rs.getString(1))
             hostName = string.strip(rs.getString(2))
             user = string.strip(rs.getString(3))
@@ -214,12 +267,15 @@ def getDBSession(db2Client, parentID, OSHVResult):
                 OSHVResult.add(dbLink)
     finally:
         rs and rs.close()
+    return rows
 
 def getDBSchemas(db2Client,parentID,OSHVResult):
     rs = None
+    rows = 0
     try:
         rs = db2Client.executeQuery("select SCHEMANAME, CREATE_TIME from SYSCAT.SCHEMATA")#@@CMD_PERMISION sql protocol execution
         while (rs.next()):
+            rows = rows + 1
             schemaOSH = ObjectStateHolder('db2_schema')
             schemaOSH.setAttribute('data_name', rs.getString(1))
             schemaOSH.setAttribute("createdate", DateParser.parse(rs.getTimestamp(2)))
@@ -228,18 +284,38 @@ def getDBSchemas(db2Client,parentID,OSHVResult):
     finally:
         if rs != None:
             rs.close()
+    return rows
 
 # added by Daniel La 08/02/12
 # method to get database size and populate custom attribute db_size on CIT DB2
 def getDBSize(db2Client,db2OSH):
     rs = None
+    rows = 0
     try:
         rs = db2Client.executeQuery("select SUM(total_pages*page_size)/1024.0/1024 TOTAL_ALLOCATED_SPACE_IN_MB from table (snapshot_tbs_cfg('"+ db2Client.getDatabaseName() + "',-1)) TBS_SPCE")#@@CMD_PERMISION sql protocol execution
         while (rs.next()):
+            rows = rows + 1
             db2OSH.setAttribute('db_size', rs.getFloat(1))
     finally:
         if rs != None:
             rs.close()
+    return rows
+
+#######################################################################
+#
+# measureStage - run one of the getDB* functions recording its wall time,
+# the rows it returns as read and the OSHs it adds to OSHVResult
+#
+#######################################################################
+def measureStage(statistics, stage, OSHVResult, function, *args):
+    startTime = statistics.start()
+    oshs = OSHVResult.size()
+    rows = 0
+    try:
+        rows = function(*args)
+    finally:
+        statistics.record(stage, startTime, rows or 0, OSHVResult.size() - oshs)
+    return rows
 
 ########################
 #                      #
@@ -251,6 +327,7 @@ def DiscoveryMain(Framework):
     protocolName = 'SQL'
     db2Client = None
     shellUtils = None # added by Daniel La
+    statistics = Util.createJobStatistics(Framework)
 
     try:
         try:
@@ -283,14 +360,16 @@ def DiscoveryMain(Framework):
             discoverySuccessful = 1
             try:
                 # getDBTablespace(db2Client, db2OSH, hostOSH, OSHVResult, shellUtils)
-                getDBTablespace(db2Client, db2OSH, hostOSH, OSHVResult, shellUtils) # adjusted by Danile La
+                fileSystemResolver = ContainerFileSystemResolver(shellUtils, hostOSH)
+                measureStage(statistics, 'getDBTablespace', OSHVResult,
+                             getDBTablespace, db2Client, db2OSH, OSHVResult, fileSystemResolver, statistics) # adjusted by Danile La
             except:
                 discoverySuccessful = 0
                 logger.debugException('')
                 Framework.reportWarning("SQL: Failed to discover tablespaces")
 
             try:
-                getDBSession(db2Client, db2OSH, OSHVResult)
+                measureStage(statistics, 'getDBSession', OSHVResult, getDBSession, db2Client, db2OSH, OSHVResult)
             except:
                 discoverySuccessful = 0
                 logger.debugException('')
@@ -299,14 +378,14 @@ def DiscoveryMain(Framework):
             # added by Daniel La 08/02/12
             # get database size
             try:
-                getDBSize(db2Client, db2OSH)
+                measureStage(statistics, 'getDBSize', OSHVResult, getDBSize, db2Client, db2OSH)
             except:
                 discoverySuccessful = 0
                 logger.debugException('')
                 Framework.reportWarning("SQL: Failed to discover db size")
 
             try:
-                getDBSchemas(db2Client, db2OSH, OSHVResult)
+                measureStage(statistics, 'getDBSchemas', OSHVResult, getDBSchemas, db2Client, db2OSH, OSHVResult)
             except JavaException, ex:
                 logger.debugException()
                 if not discoverySuccessful:
@@ -333,5 +412,6 @@ def DiscoveryMain(Framework):
             db2Client.close()
         if shellUtils:              # added by Daniel La
             shellUtils.closeClient()
+        Util.reportJobStatistics(Framework, statistics, 'db2_dis_physical')
 
     return OSHVResult
\ No newline at end of file
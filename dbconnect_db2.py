@@ -8,6 +8,7 @@
 
 ## Jython imports
 import re
+import time
 
 ## Local helper scripts on probe
 import logger
@@ -20,6 +21,11 @@ import shell_interpreter
 ## Globals
 ##############################################
 SCRIPT_NAME="dbconnect_db2.py"
+DB2_CMD_CACHE = {} ## {host IP:{search location:(time cached, [DB2 command processor paths])}}
+DB2_CMD_CACHE_TTL = 3600 ## Seconds before a cached DB2 command processor location is looked up again
+DB2_FIND_MAX_DEPTH = 6 ## Deep enough for <location>/<instance>/sqllib/bin/db2
+DB2_FIND_PRUNE_FILESYSTEMS = ['nfs', 'nfs3', 'nfs4', 'autofs', 'cifs', 'smbfs'] ## Network filesystems that find should not walk
+DB2_BATCH_MODE = 1 ## Get dbm config and database directories of all instances with one command, see getDatabasesBatch
 
 ##############################################
 ## Find databases
@@ -30,7 +36,7 @@ def findDatabases(localClient, procToPortDict, dbInstanceDict, isWindows='true',
         localClientType = localClient.getClientType()
         if localClientType not in ['telnet', 'ssh', 'ntadmin']:
             logger.error('[' + SCRIPT_NAME + ':findDatabase] DB2 discovery requires SSH/Telnet/NTCMD')
-            return
+            return 1
 
         ## The best approach to find DB2 instances is to make a list of
         ## locations where DB2 may be installed and search through them.
@@ -39,11 +45,13 @@ def findDatabases(localClient, procToPortDict, dbInstanceDict, isWindows='true',
         ## For DB2, it is not possible to get database details from this
         ## dictionary. the best approach is to get possible install
         ## locations of DB2 and find databases later
-        processProcToPortDict(localClient, isWindows, procToPortDict, searchLocations)
+        succeeded = processProcToPortDict(localClient, isWindows, procToPortDict, searchLocations)
 
         ## Use the list of possible install locations to identify valid
         ## install locations
         instanceLocations = getInstancePaths(localClient, isWindows, searchLocations)
+        if instanceLocations == None:
+            return 0
 
         # used for debugging purposes only - Daniel La
         for instancePath in instanceLocations:
@@ -51,11 +59,14 @@ def findDatabases(localClient, procToPortDict, dbInstanceDict, isWindows='true',
 
         ## Get databases using instance locations
         if instanceLocations:
-            getDatabases(localClient, isWindows, instanceLocations, dbInstanceDict)
+            if not DB2_BATCH_MODE or not getDatabasesBatch(localClient, isWindows, instanceLocations, dbInstanceDict):
+                if not getDatabases(localClient, isWindows, instanceLocations, dbInstanceDict):
+                    succeeded = 0
+        return succeeded
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':findDatabases] Exception: <%s>' % excInfo)
-        pass
+        return 0
 
 ##############################################
 ## Extract information from process to port dictionary
@@ -84,18 +95,15 @@ def processProcToPortDict(localClient, isWindows, p2pDict, possibleInstallLocati
                 dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':processProcToPortDict] (1) Found process name <%s>. Ignoring...' % processName)
                 continue
             ## Look for DB2 install locations using known process/service/software names
-            elif re.search('db2', processName):
+            elif dbconnect_utils.PATTERNS['db2Process'].search(processName):
 
                 ## Daniel La: This box has DB2. We will look for userName in /etc/passwd to find it's home directory. This home directory is what should
                 ## be used to search for possible DB2 install paths. This information was provided by Felix Iwan from DB2 team.
-                if dbconnect_utils.isValidString(userName):
-
-                    passwdentry = None
-                    grepCommand = 'grep ' + userName.strip() + ' /etc/passwd | grep -v root' # ignore root user account
-                    passwdentry = localClient.executeCmd(grepCommand)
-                    m = re.search('.*:.*:.*:.*:.*:(.*):.*', passwdentry)
-                    if m:
-                        userHomeDirectory = m.group(1)
+                ## /etc/passwd is read once per job and looked up locally
+                if dbconnect_utils.isValidString(userName) and userName.strip() != 'root': # ignore root user account
+
+                    userHomeDirectory = dbconnect_utils.getUserHomeDirectory(localClient, userName)
+                    if userHomeDirectory:
                         # logger.debug('userHomeDirectory is: ', userHomeDirectory)
                         if userHomeDirectory.lower() not in checkedPaths:
                             dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] (2.1) Found possible DB2 install path <%s>' % userHomeDirectory)
@@ -128,7 +136,7 @@ def processProcToPortDict(localClient, isWindows, p2pDict, possibleInstallLocati
                     ## For windows, the processName variable may contain service
                     ## names, so extract process names
                     if isWindows == 'true':
-                        procNameMatch = re.search(r'.*[\\|/](\w+\.exe)', path)
+                        procNameMatch = dbconnect_utils.PATTERNS['windowsExeName'].search(path)
                         if procNameMatch:
                             procName = procNameMatch.group(1).strip()
                             db2Path = path[:path.rfind(procName)-1]
@@ -140,10 +148,11 @@ def processProcToPortDict(localClient, isWindows, p2pDict, possibleInstallLocati
                         dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':processProcToPortDict] (2.2) Skipping path <%s> since it has been processed before' % path)
                 else:
                     dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':processProcToPortDict] (2.2) Invalid path for process/service/software <%s>' % processName)
+        return 1
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':processProcToPortDict] Exception: <%s>' % excInfo)
-        pass
+        return 0
 
 
 ##############################################
@@ -174,6 +183,11 @@ def getInstancePaths(localClient, isWindows, possibleInstallLocations):
                 possibleInstallLocations.append('$DB2_HOME')
                 possibleInstallLocations.append('$DB2HOME')
 
+        ## Search all locations at once on UNIX
+        unixDb2CmdLocations = {}
+        if isWindows != 'true':
+            unixDb2CmdLocations = getDb2CmdLocations(localClient, possibleInstallLocations)
+
         for location in possibleInstallLocations:
             logger.debug('location to search is: ', location) # added for debugging - Daniel La
             ## Search for DB2 command processor executable
@@ -182,7 +196,7 @@ def getInstancePaths(localClient, isWindows, possibleInstallLocations):
             if isWindows == 'true':
                 db2cmdLocations = dbconnect_utils.findFile(localClient, 'db2cmd.exe', location, isWindows)
             else:
-                db2cmdLocations = dbconnect_utils.findFile(localClient, 'db2', location, isWindows)
+                db2cmdLocations = unixDb2CmdLocations.get(location)
             ## If an executable was found, check if it is indeed a DB2
             ## instance and extract the install path
             if db2cmdLocations and len(db2cmdLocations) > 0:
@@ -261,6 +275,144 @@ def getInstancePaths(localClient, isWindows, possibleInstallLocations):
         pass
 
 
+##############################################
+## Find the DB2 command processor under a list of
+## search locations on UNIX
+## Known instance layouts (<home>/sqllib/bin/db2) are
+## probed first with a single command. Locations where
+## that finds nothing are searched with one combined find
+## that skips network filesystems and limits depth.
+## Locations where DB2 was found are cached per host for
+## DB2_CMD_CACHE_TTL seconds, others are searched again
+## Returns {search location:[DB2 command processor paths]}
+##############################################
+def getDb2CmdLocations(localClient, searchLocations):
+    try:
+        hostIp = localClient.getIpAddress()
+        if not DB2_CMD_CACHE.has_key(hostIp):
+            DB2_CMD_CACHE[hostIp] = {}
+        hostCache = DB2_CMD_CACHE[hostIp]
+        returnTable = {}
+        pendingLocations = []
+        for searchLocation in searchLocations:
+            if hostCache.has_key(searchLocation):
+                (cachedAt, cmdLocations) = hostCache[searchLocation]
+                if time.time() - cachedAt < DB2_CMD_CACHE_TTL:
+                    returnTable[searchLocation] = cmdLocations
+                    continue
+            if searchLocation not in pendingLocations:
+                pendingLocations.append(searchLocation)
+        if pendingLocations:
+            (expandedLocations, probedLocations) = probeDb2Layouts(localClient, pendingLocations)
+            findLocations = []
+            for searchLocation in pendingLocations:
+                if probedLocations.has_key(searchLocation):
+                    returnTable[searchLocation] = probedLocations[searchLocation]
+                elif expandedLocations.has_key(searchLocation):
+                    findLocations.append(searchLocation)
+                ## else an environment variable that isn't set or a location that doesn't exist
+            if findLocations:
+                foundLocations = findDb2InLocations(localClient, findLocations, expandedLocations)
+                for searchLocation in findLocations:
+                    if foundLocations.has_key(searchLocation):
+                        returnTable[searchLocation] = foundLocations[searchLocation]
+            ## Empty results aren't cached so DB2 installed later is found on the next run
+            for searchLocation in pendingLocations:
+                if returnTable.get(searchLocation):
+                    hostCache[searchLocation] = (time.time(), returnTable[searchLocation])
+        for searchLocation in searchLocations:
+            if not returnTable.has_key(searchLocation):
+                returnTable[searchLocation] = []
+        return returnTable
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':getDb2CmdLocations] Exception: <%s>' % excInfo)
+        return {}
+
+
+##############################################
+## Probe known DB2 instance layouts under search locations
+## with a single shell command
+## Returns ({search location:expanded existing directory},
+##          {search location:[DB2 command processor paths]})
+##############################################
+def probeDb2Layouts(localClient, searchLocations):
+    expandedLocations = {}
+    probedLocations = {}
+    probeCommands = []
+    for locationIndex in range(len(searchLocations)):
+        searchLocation = searchLocations[locationIndex].rstrip('/')
+        ## Print the expanded location so environment variables can be matched up later
+        probeCommands.append('[ -d "%s" ] && echo "L|%s|%s"' % (searchLocation, locationIndex, searchLocation))
+        candidates = [searchLocation + '/sqllib/bin/db2']
+        ## Location may be inside sqllib already (from a process path like <home>/sqllib/adm)
+        if searchLocation.find('/sqllib') > -1:
+            candidates.insert(0, searchLocation[:searchLocation.find('/sqllib')] + '/sqllib/bin/db2')
+        for candidate in candidates:
+            probeCommands.append('[ -f "%s" ] && echo "F|%s|%s"' % (candidate, locationIndex, candidate))
+    probeOutput = localClient.executeCmd('; '.join(probeCommands) + '; true')
+    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':probeDb2Layouts] Probe output: <%s>', probeOutput)
+    if probeOutput == None:
+        return (expandedLocations, probedLocations)
+    for probeLine in dbconnect_utils.iterCommandOutput(probeOutput):
+        probeFields = probeLine.split('|', 2)
+        if len(probeFields) != 3 or not probeFields[1].isdigit() or int(probeFields[1]) >= len(searchLocations):
+            continue
+        searchLocation = searchLocations[int(probeFields[1])]
+        if probeFields[0] == 'L':
+            expandedLocations[searchLocation] = probeFields[2]
+        elif probeFields[0] == 'F':
+            if not probedLocations.has_key(searchLocation):
+                probedLocations[searchLocation] = []
+            if probeFields[2] not in probedLocations[searchLocation]:
+                probedLocations[searchLocation].append(probeFields[2])
+                dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':probeDb2Layouts] Found DB2 command processor <%s> under <%s>' % (probeFields[2], searchLocation))
+    return (expandedLocations, probedLocations)
+
+
+##############################################
+## Search for the DB2 command processor under several
+## locations with a single find
+## Returns {search location:[DB2 command processor paths]}
+##############################################
+def findDb2InLocations(localClient, searchLocations, expandedLocations):
+    foundLocations = {}
+    findRoots = []
+    for searchLocation in searchLocations:
+        findRoots.append('"' + expandedLocations[searchLocation] + '"')
+    pruneFilesystems = []
+    for fileSystem in DB2_FIND_PRUNE_FILESYSTEMS:
+        pruneFilesystems.append('-fstype ' + fileSystem)
+    findTests = '\\( ' + ' -o '.join(pruneFilesystems) + ' \\) -prune -o -name db2 -type f -print'
+    findCommand = 'find -L %s -maxdepth %s %s 2>&1' % (' '.join(findRoots), DB2_FIND_MAX_DEPTH, findTests)
+    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':findDb2InLocations] Going to run find command: <%s>' % findCommand)
+    findOutput = localClient.executeCmd(findCommand, 120000)
+    if findOutput != None and findOutput.find('maxdepth') > -1:
+        ## Not all UNIX flavors have -maxdepth. Use shell globs down to
+        ## the same depth rather than an unbounded find
+        globPatterns = []
+        for findRoot in findRoots:
+            for depth in range(DB2_FIND_MAX_DEPTH):
+                globPatterns.append(findRoot + '/*' * depth + '/db2')
+        ## Run under sh because the login shell may be csh
+        findCommand = 'sh -c \'for f in %s; do [ -f "$f" ] && echo "$f"; done; true\'' % ' '.join(globPatterns)
+        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':findDb2InLocations] find doesn\'t support -maxdepth. Going to run: <%s>' % findCommand)
+        findOutput = localClient.executeCmd(findCommand, 120000)
+    if findOutput == None:
+        return foundLocations
+    for findLine in dbconnect_utils.iterCommandOutput(findOutput):
+        ## Skip error messages
+        if not findLine.startswith('/') or not findLine.endswith('/db2'):
+            continue
+        for searchLocation in searchLocations:
+            if findLine.startswith(expandedLocations[searchLocation].rstrip('/') + '/'):
+                if not foundLocations.has_key(searchLocation):
+                    foundLocations[searchLocation] = []
+                foundLocations[searchLocation].append(findLine)
+                dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':findDb2InLocations] Found DB2 command processor <%s> under <%s>' % (findLine, searchLocation))
+    return foundLocations
+
+
 ##############################################
 ## Get Db Directory  - Daniel La
 ##############################################
@@ -294,56 +446,8 @@ def getDatabases(localClient, isWindows, instancePaths, dbDict):
                     if not listDbDirectoryOutput or not re.search('entry:', listDbDirectoryOutput):
                         dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getDatabases] Invalid output from command db2 list db directory for instance at <%s>! Skipping...' % instancePath)
                         continue
-                    ## Initialize variables
-                    dbNameAliasDict = {}
-                    ## Need to initialize the database alias here because the sequecne has alias
-                    ## followed by a name and there may be more than one of each
-                    databaseAlias = None
-
-                    ## Split the command output into individial lines
-                    listDbDirectoryOutputLines= dbconnect_utils.splitCommandOutput(listDbDirectoryOutput)
-
-                    ## Get DB details one line at a time
-                    for listDbDirectoryOutputLine in listDbDirectoryOutputLines:
-                        logger.debug('*** outputline is: ', listDbDirectoryOutputLine)
-                        ## Database alias
-                        m = re.search('Database alias\s+=\s*(\S+)', listDbDirectoryOutputLine.strip())
-                        if (m):
-                            databaseAlias = m.group(1)
-                            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Found Database Alias: <%s>' % databaseAlias)
-
-                        ## Database name
-                        m = re.search('Database name\s+=\s*(\S+)', listDbDirectoryOutputLine.strip())
-                        if (m):
-                            databaseName = m.group(1)
-                            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Found Database Name: <%s>' % databaseName)
-
-                        ## Directory entry type - tells whether database is local (indirect) or remote (remote)
-                        m = re.search('Directory entry type\s+=\s*Indirect', listDbDirectoryOutputLine.strip())
-
-                        if (m):
-                            logger.debug('database is local: ', databaseName)
-                            if databaseName and databaseName not in dbNameAliasDict.keys():
-                                if databaseAlias:
-                                    dbNameAliasDict[databaseName] = databaseAlias
-                                else:
-                                    dbNameAliasDict[databaseName] = databaseName
-
-#    original.. without instance name.
-#                    for databaseName in dbNameAliasDict.keys():
-#                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 instance <%s> listening at port <%s>, on <%s>, and installed in <%s>' % (databaseName, listenerPort, localClient.getIpAddress(), instancePath))
-#                        dbDict[databaseName] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN]
-#                        if databaseName != dbNameAliasDict[databaseName]:
-#                            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 instance alias <%s> listening at port <%s>, on <%s>, and installed in <%s>' % (dbNameAliasDict[databaseName], listenerPort, localClient.getIpAddress(), instancePath))
-#                            dbDict[dbNameAliasDict[databaseName]] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN]
-
-                    for databaseName in dbNameAliasDict.keys():
-                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 database <%s> in DB2 instance <%s>, listening at port <%s>, on <%s>, and installed in <%s>' % (databaseName, instance.upper(), listenerPort, localClient.getIpAddress(), instancePath))
-                        dbDict[databaseName] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, instance.upper()]
-                        if databaseName != dbNameAliasDict[databaseName]:
-                            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 database alias <%s> in DB2 instance <%s>, listening at port <%s>, on <%s>, and installed in <%s>' % (dbNameAliasDict[databaseName], instance.upper(), listenerPort, localClient.getIpAddress(), instancePath))
-                            dbDict[dbNameAliasDict[databaseName]] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, instance.upper()]
-
+                    dbNameAliasDict = parseDbDirectory(dbconnect_utils.iterCommandOutput(listDbDirectoryOutput))
+                    addDatabases(localClient, dbDict, dbNameAliasDict, listenerPort, instancePath, instance.upper())
 
             else: # Unix
                 ## Get instance port
@@ -367,57 +471,149 @@ def getDatabases(localClient, isWindows, instancePaths, dbDict):
 
                 logger.debug('instance is: ', instance)
 
-                ## Initialize variables
-                dbNameAliasDict = {}
-                ## Need to initialize the database alias here because the sequecne has alias
-                ## followed by a name and there may be more than one of each
-                databaseAlias = None
-
-                ## Split the command output into individial lines
-                listDbDirectoryOutputLines= dbconnect_utils.splitCommandOutput(listDbDirectoryOutput)
-
-                ## Get DB details one line at a time
-                for listDbDirectoryOutputLine in listDbDirectoryOutputLines:
-                    # logger.debug('*** outputline is: ', listDbDirectoryOutputLine)
-                    ## Database alias
-                    m = re.search('Database alias\s+=\s*(\S+)', listDbDirectoryOutputLine.strip())
-                    if (m):
-                        databaseAlias = m.group(1)
-                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Found Database Alias: <%s>' % databaseAlias)
-                    ## Database name
-                    m = re.search('Database name\s+=\s*(\S+)', listDbDirectoryOutputLine.strip())
-                    if (m):
-                        databaseName = m.group(1)
-                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Found Database Name: <%s>' % databaseName)
-
-                    ## Directory entry type - tells whether database is local (indirect) or remote (remote)
-                    m = re.search('Directory entry type\s+=\s*Indirect', listDbDirectoryOutputLine.strip())
-                    if (m):
-                        logger.debug('database is local: ', databaseName)
-                        if databaseName and databaseName not in dbNameAliasDict.keys():
-                            if databaseAlias:
-                                dbNameAliasDict[databaseName] = databaseAlias
-                            else:
-                                dbNameAliasDict[databaseName] = databaseName
-
-#                for databaseName in dbNameAliasDict.keys():
-#                    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 instance <%s> listening at port <%s>, on <%s>, and installed in <%s>' % (databaseName, listenerPort, localClient.getIpAddress(), instancePath))
-#                    dbDict[databaseName] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN]
-#                    if databaseName != dbNameAliasDict[databaseName]:
-#                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 instance alias <%s> listening at port <%s>, on <%s>, and installed in <%s>' % (dbNameAliasDict[databaseName], listenerPort, localClient.getIpAddress(), instancePath))
-#                        dbDict[dbNameAliasDict[databaseName]] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN]
-
-                for databaseName in dbNameAliasDict.keys():
-                    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 database <%s> in DB2 instance <%s>, listening at port <%s>, on <%s>, and installed in <%s>' % (databaseName, instance, listenerPort, localClient.getIpAddress(), instancePath))
-                    dbDict[databaseName] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, instance]
-                    if databaseName != dbNameAliasDict[databaseName]:
-                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabases] Adding DB2 database alias <%s> in DB2 instance <%s>, listening at port <%s>, on <%s>, and installed in <%s>' % (dbNameAliasDict[databaseName], instance, listenerPort, localClient.getIpAddress(), instancePath))
-                        dbDict[dbNameAliasDict[databaseName]] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, instance]
+                dbNameAliasDict = parseDbDirectory(dbconnect_utils.iterCommandOutput(listDbDirectoryOutput))
+                addDatabases(localClient, dbDict, dbNameAliasDict, listenerPort, instancePath, instance)
+        return 1
 
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':getDatabaseInstances] Exception: <%s>' % excInfo)
-        pass
+        return 0
+
+
+##############################################
+## Get database instances of all instance paths with
+## one command. The command sets up each instance's
+## environment in turn and prints its dbm config and
+## database directory after a DB2DBM:<n>/DB2DIR:<n>
+## marker (and the instance name after DB2NAME:<n> on
+## UNIX). Windows needs one db2ilist per install path
+## first. Returns 0 if the output can't be used so the
+## caller can fall back to getDatabases
+##############################################
+def getDatabasesBatch(localClient, isWindows, instancePaths, dbDict):
+    try:
+        ## [(instance path, instance name)]
+        instances = []
+        batchCommands = []
+        if isWindows == 'true':
+            for instancePath in instancePaths:
+                listInstancesCommand = '\"' + instancePath + '\\db2envar.bat\" && ' + '\"' + instancePath + '\\db2ilist\"'
+                for instance in dbconnect_utils.iterCommandOutput(localClient.executeCmd(listInstancesCommand) or ''):
+                    if instance and (instancePath, instance) not in instances:
+                        instances.append((instancePath, instance))
+            for instanceIndex in range(len(instances)):
+                (instancePath, instance) = instances[instanceIndex]
+                environmentCommand = '(\"' + instancePath + '\\db2envar.bat\") && ' + '(set DB2INSTANCE=' + instance + ') && '
+                batchCommands.append('echo DB2DBM:%s & %s(\"%s\\db2cmd\" /c /w /i db2 get dbm config)' % (instanceIndex, environmentCommand, instancePath))
+                batchCommands.append('echo DB2DIR:%s & %s(\"%s\\db2cmd\" /c /w /i db2 list db directory)' % (instanceIndex, environmentCommand, instancePath))
+            batchCommand = ' & '.join(batchCommands)
+        else:
+            for instancePath in instancePaths:
+                if (instancePath, None) not in instances:
+                    instances.append((instancePath, None))
+            for instanceIndex in range(len(instances)):
+                instancePath = instances[instanceIndex][0]
+                ## Subshell so one instance's profile doesn't leak into the next
+                batchCommands.append('echo "DB2DBM:%s"; (unset LIBPATH; cd %s/../ && . ./db2profile; export DB2NODE=127.0.0.1; echo "DB2NAME:%s:$DB2INSTANCE"; %s/db2 get dbm config; echo "DB2DIR:%s"; %s/db2 list db directory; %s/db2 terminate) 2>&1' % (instanceIndex, instancePath, instanceIndex, instancePath, instanceIndex, instancePath, instancePath))
+            batchCommand = '; '.join(batchCommands)
+        if len(instances) < 1:
+            return 1
+
+        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getDatabasesBatch] Going to run DB2 batch for <%s> instances' % len(instances))
+        batchOutput = localClient.executeCmd(batchCommand, 120000)
+        if not batchOutput or batchOutput.find('DB2DBM:') < 0:
+            dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getDatabasesBatch] Invalid output from DB2 batch: <%s>' % batchOutput)
+            return 0
+
+        ## {(DBM or DIR, instance index):[lines]}
+        sections = {}
+        instanceNames = {}
+        currentSection = None
+        for batchLine in dbconnect_utils.iterCommandOutput(batchOutput):
+            m = dbconnect_utils.PATTERNS['db2BatchMarker'].search(batchLine)
+            if m and int(m.group(2)) < len(instances):
+                if m.group(1) == 'NAME':
+                    instanceNames[int(m.group(2))] = m.group(3).strip().upper()
+                else:
+                    currentSection = (m.group(1), int(m.group(2)))
+                    sections[currentSection] = []
+                continue
+            if currentSection != None:
+                sections[currentSection].append(batchLine)
+
+        for instanceIndex in range(len(instances)):
+            (instancePath, instance) = instances[instanceIndex]
+            if instance == None:
+                instance = instanceNames.get(instanceIndex, '')
+            else:
+                instance = instance.upper()
+            dbmConfigLines = sections.get(('DBM', instanceIndex), [])
+            listenerPort = dbconnect_utils.UNKNOWN
+            if len([dbmConfigLine for dbmConfigLine in dbmConfigLines if dbmConfigLine.find('Database Manager Configuration') > -1]) > 0:
+                listenerPort = getServicePort(localClient, isWindows, parseSvcename(dbmConfigLines, instancePath), instancePath)
+            else:
+                dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getDatabasesBatch] Invalid output from command db2 get dbm config for instance <%s> at <%s>' % (instance, instancePath))
+            dbDirectoryLines = sections.get(('DIR', instanceIndex), [])
+            if len([dbDirectoryLine for dbDirectoryLine in dbDirectoryLines if dbDirectoryLine.find('entry:') > -1]) < 1:
+                dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getDatabasesBatch] Invalid output from command db2 list db directory for instance <%s> at <%s>! Skipping...' % (instance, instancePath))
+                continue
+            addDatabases(localClient, dbDict, parseDbDirectory(dbDirectoryLines), listenerPort, instancePath, instance)
+        return 1
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':getDatabasesBatch] Exception: <%s>' % excInfo)
+        return 0
+
+
+##############################################
+## Get local databases from "db2 list db directory" lines
+## Returns {database name:database alias}
+##############################################
+def parseDbDirectory(listDbDirectoryOutputLines):
+    ## Initialize variables
+    dbNameAliasDict = {}
+    ## Need to initialize the database alias here because the sequecne has alias
+    ## followed by a name and there may be more than one of each
+    databaseAlias = None
+    databaseName = None
+
+    ## Get DB details one line at a time
+    for listDbDirectoryOutputLine in listDbDirectoryOutputLines:
+        ## Database alias
+        m = dbconnect_utils.PATTERNS['db2DbAlias'].search(listDbDirectoryOutputLine.strip())
+        if (m):
+            databaseAlias = m.group(1)
+            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':parseDbDirectory] Found Database Alias: <%s>' % databaseAlias)
+        ## Database name
+        m = dbconnect_utils.PATTERNS['db2DbName'].search(listDbDirectoryOutputLine.strip())
+        if (m):
+            databaseName = m.group(1)
+            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':parseDbDirectory] Found Database Name: <%s>' % databaseName)
+
+        ## Directory entry type - tells whether database is local (indirect) or remote (remote)
+        m = dbconnect_utils.PATTERNS['db2IndirectEntry'].search(listDbDirectoryOutputLine.strip())
+        if (m):
+            logger.debug('database is local: ', databaseName)
+            if databaseName and databaseName not in dbNameAliasDict.keys():
+                if databaseAlias:
+                    dbNameAliasDict[databaseName] = databaseAlias
+                else:
+                    dbNameAliasDict[databaseName] = databaseName
+    return dbNameAliasDict
+
+
+##############################################
+## Add databases (and their aliases) of an instance
+## to the database dictionary
+##############################################
+def addDatabases(localClient, dbDict, dbNameAliasDict, listenerPort, instancePath, instance):
+    for databaseName in dbNameAliasDict.keys():
+        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':addDatabases] Adding DB2 database <%s> in DB2 instance <%s>, listening at port <%s>, on <%s>, and installed in <%s>' % (databaseName, instance, listenerPort, localClient.getIpAddress(), instancePath))
+        dbDict[databaseName] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, instance]
+        if databaseName != dbNameAliasDict[databaseName]:
+            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':addDatabases] Adding DB2 database alias <%s> in DB2 instance <%s>, listening at port <%s>, on <%s>, and installed in <%s>' % (dbNameAliasDict[databaseName], instance, listenerPort, localClient.getIpAddress(), instancePath))
+            dbDict[dbNameAliasDict[databaseName]] = ['db2', listenerPort, localClient.getIpAddress(), instancePath, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, instance]
 
 
 ##############################################
@@ -441,61 +637,60 @@ def getListenerPort(localClient, isWindows, instancePath, instance=None):
             dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getListenerPort] Invalid output from command db2 list db directory for instance at <%s>! Skipping...' % instancePath)
             return returnPort
 
-        ## Split the command output into individial lines
-        getDbmConfigOutputLines= dbconnect_utils.splitCommandOutput(getDbmConfigOutput)
-        serviceName = None
-        ## Get service name of this instance
-        for getDbmConfigOutputLine in getDbmConfigOutputLines:
-            ## Only one line will have the service name and
-            ## nothing else is required from this command output
-            if serviceName:
-                continue
-            ## Service name
-            m = re.search('TCP/IP [Ss]ervice [Nn]ame\s+\(([^)]+)\)\s*=\s*(\S+)', getDbmConfigOutputLine)
-            if (m):
-                serviceName = m.group(2)
-                dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getListenerPort] (1) Found service name <%s> for instance in path <%s>' % (serviceName, instancePath))
+        serviceName = parseSvcename(dbconnect_utils.iterCommandOutput(getDbmConfigOutput), instancePath)
+        return getServicePort(localClient, isWindows, serviceName, instancePath)
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':getListenerPort] Exception: <%s>' % excInfo)
+        pass
 
-            ## This may be in two separate lines
-            parseService = 0
-            if (re.search('TCP/IP [Ss]ervice', getDbmConfigOutputLine)):
-                parseService = 1
-                continue
-            m = re.search('[Nn]ame\s+\(([^)]+)\)\s*=\s*(\S+)', getDbmConfigOutputLine)
-            if parseService and m:
-                parseService = 0
-                serviceName = m.group(2)
-                dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getListenerPort] (2) Found service name <%s> for instance in path <%s>' % (serviceName, instancePath))
 
-        ## Get the port number from services config file
+##############################################
+## Get the service name (SVCENAME) from "db2 get dbm config" lines
+##############################################
+def parseSvcename(getDbmConfigOutputLines, instancePath):
+    serviceName = None
+    ## This may be in two separate lines
+    parseService = 0
+    ## Get service name of this instance
+    for getDbmConfigOutputLine in getDbmConfigOutputLines:
+        ## Only one line will have the service name and
+        ## nothing else is required from this command output
         if serviceName:
-#            getPortCommand = 'cat /etc/services | grep %s' % serviceName   # original
-            getPortCommand = 'cat /etc/services | grep -w %s' % serviceName # updated to include -w option for direct word match - Daniel La 24/11/10
-
-            getPortCommand2 = 'type %%WINDIR%%\\system32\\drivers\\etc\\services' # altered by Daniel La
-            getPortCommand2 = 'echo %%WINDIR%%' # altered by Daniel La
-            getPortCommandOutput2 = localClient.executeCmd(getPortCommand2)
-
-            if isWindows == 'true':
-                #getPortCommand = 'type %%WINDIR%%\\system32\\drivers\\etc\\services | find "%s"' % serviceName
-                getPortCommand = 'type %%WINDIR%%\\system32\\drivers\\etc\\services | findstr /I "%s\>"' % serviceName # altered by Daniel La
-
-
-            getPortCommandOutput = localClient.executeCmd(getPortCommand)
-
-            if not getPortCommandOutput or not re.search('tcp', getPortCommandOutput):
-                dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getListenerPort] Unable to get port number from services file for instance at <%s> with service name <%s>' % (instancePath, serviceName))
-                return returnPort
+            break
+        ## Service name
+        m = dbconnect_utils.PATTERNS['db2Svcename'].search(getDbmConfigOutputLine)
+        if (m):
+            serviceName = m.group(2)
+            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':parseSvcename] (1) Found service name <%s> for instance in path <%s>' % (serviceName, instancePath))
+            continue
+
+        if (dbconnect_utils.PATTERNS['db2SvcenameLabel'].search(getDbmConfigOutputLine)):
+            parseService = 1
+            continue
+        m = dbconnect_utils.PATTERNS['db2SvcenameWrapped'].search(getDbmConfigOutputLine)
+        if parseService and m:
+            serviceName = m.group(2)
+            dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':parseSvcename] (2) Found service name <%s> for instance in path <%s>' % (serviceName, instancePath))
+        parseService = 0
+    return serviceName
 
-            m = re.search('^\s*(\S+)\s+(\d+).*$', getPortCommandOutput.strip())
-            if (m):
-                returnPort = m.group(2)
 
-        return returnPort
-    except:
-        excInfo = logger.prepareJythonStackTrace('')
-        dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':getListenerPort] Exception: <%s>' % excInfo)
-        pass
+##############################################
+## Get the port number of a DB2 service name
+## The services file is read once per job and looked up locally
+##############################################
+def getServicePort(localClient, isWindows, serviceName, instancePath):
+    if not serviceName:
+        return dbconnect_utils.UNKNOWN
+    if serviceName.strip().isdigit():
+        ## SVCENAME can be set to the port number itself
+        return serviceName.strip()
+    servicesIndex = dbconnect_utils.getServicesIndex(localClient, isWindows)
+    if not servicesIndex.has_key(serviceName.strip().lower()):
+        dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getServicePort] Unable to get port number from services file for instance at <%s> with service name <%s>' % (instancePath, serviceName))
+        return dbconnect_utils.UNKNOWN
+    return servicesIndex[serviceName.strip().lower()]
 
 
 '''
@@ -39,15 +39,17 @@ SCRIPT_NAME="dbconnect_mssql.py"
 def findDatabases(localClient, procToPortDict, dbInstanceDict, isWindows='true', wmiRegistryClient=None):
     try:
         ## Extract information from process to port dictionary first
-        processProcToPortDict(localClient, procToPortDict, dbInstanceDict)
+        succeeded = processProcToPortDict(localClient, procToPortDict, dbInstanceDict)
 
         ## Search for MSSQL related stuff in the registry
         if localClient.getClientType() != 'snmp' or wmiRegistryClient != None:
-            registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClient)
+            if not registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClient):
+                succeeded = 0
+        return succeeded
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':findDatabases] Exception: <%s>' % excInfo)
-        pass
+        return 0
 
 ##############################################
 ## Extract information from process to port dictionary
@@ -128,10 +130,11 @@ def processProcToPortDict(localClient, p2pDict, dbDict):
                     installPath = binPath[:len(binPath)-5]
                 dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] (6) Found MSSQL Server instance <%s> at port <%s> from process name <%s> and its path is <%s>' % (instanceNameFound, listenerPort, processName, path))
                 dbDict[instanceNameFound] = ['MicrosoftSQLServer', listenerPort, ipAddress, installPath, version, statusFlag]
+        return 1
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':processProcToPortDict] Exception: <%s>' % excInfo)
-        pass
+        return 0
 
 ##############################################
 ## Look for information in the registry
@@ -146,7 +149,7 @@ def registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClien
         internalInstanceName = None
         # If  SQL Server is present on this box, get instance names
         installedInstancesKeypath = 'SOFTWARE\\Microsoft\\Microsoft SQL Server'
-        installedInstances = dbconnect_utils.getRegValues(localClient, wmiRegistryClient, installedInstancesKeypath, 'InstalledInstances')
+        installedInstances = dbconnect_utils.getRegSnapshotValues(localClient, wmiRegistryClient, installedInstancesKeypath, 'InstalledInstances')
         if installedInstances == None or str(installedInstances) == '[[], []]' or str(installedInstances) == '{}':
             if dbInstanceDict != None and len(dbInstanceDict) > 0:
                 instancesString = ''
@@ -156,7 +159,7 @@ def registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClien
                 installedInstances.update({installedInstancesKeypath:instancesString[:-1]})         # chop last \n
             else:
                 dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':registryLookup] SQL Server not installed on this box')
-                return None
+                return 1
         if installedInstances:
             ## We have SQL Server
             dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':registryLookup] SQL Server present on this box <%s>' % installedInstances)
@@ -171,7 +174,7 @@ def registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClien
                 instanceNameList.append(installedInstanceName.strip())
                 dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':registryLookup] Found SQL Server instance <%s>' % installedInstanceName.strip())
                 internalInstanceNameKeyPath = 'SOFTWARE\\Microsoft\\Microsoft SQL Server\\Instance Names\\SQL'
-                internalInstanceNameDict = dbconnect_utils.getRegValues(localClient, wmiRegistryClient, internalInstanceNameKeyPath, installedInstanceName)
+                internalInstanceNameDict = dbconnect_utils.getRegSnapshotValues(localClient, wmiRegistryClient, internalInstanceNameKeyPath, installedInstanceName)
                 if internalInstanceNameDict:
                     internalInstanceName = internalInstanceNameDict[internalInstanceNameKeyPath]
                 if internalInstanceName:
@@ -207,7 +210,7 @@ def registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClien
                         sqlServerDetailKeypath = string.replace(sqlServerDetailKeypaths[sqlServerDetailIndex], 'iNsTaNcEnAmE', instanceName)
                 if instanceName.find('MSSQL10_50') and sqlServerDetailKeypath.find('MSSQLSERVER\\MSSQLServer'):
                     sqlServerDetailKeypath = string.replace(sqlServerDetailKeypath,'MSSQLSERVER\\MSSQLServer','MSSQLSERVER' + instanceName)
-                regValues = dbconnect_utils.getRegValues(localClient, wmiRegistryClient, sqlServerDetailKeypath, sqlServerDetailFilters[sqlServerDetailIndex])
+                regValues = dbconnect_utils.getRegSnapshotValues(localClient, wmiRegistryClient, sqlServerDetailKeypath, sqlServerDetailFilters[sqlServerDetailIndex])
                 if regValues == None or str(regValues) == '[[], []]' or str(regValues) == '{}':
                     dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':registryLookup] Got nothing for key <%s> with filter <%s>' % (sqlServerDetailKeypath, sqlServerDetailFilters[sqlServerDetailIndex]))
                     sqlServerDetailValues.insert(sqlServerDetailIndex, None)
@@ -261,10 +264,11 @@ def registryLookup(procToPortDict, dbInstanceDict, localClient, wmiRegistryClien
                 dbInstanceDict[newInstanceName] = dbInstanceDict[instanceName]
                 del dbInstanceDict[instanceName]
             #print dbInstanceDict
+        return 1
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':registryLookup] Exception: <%s>' % excInfo)
-        pass
+        return 0
 
 
 # Original registryLookup - drop the "_orig" if need to revert back to original - Daniel La (JDS) 25/06/2014
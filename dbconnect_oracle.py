@@ -20,6 +20,7 @@ import dbconnect_utils
 ## Globals
 ##############################################
 SCRIPT_NAME="dbconnect_oracle.py"
+USE_LSNRCTL = 1 ## Ask running listeners for the ports of instances that processes alone can't place (several listeners)
 
 ##############################################
 ## Find databases
@@ -27,7 +28,7 @@ SCRIPT_NAME="dbconnect_oracle.py"
 def findDatabases(localClient, procToPortDict, dbInstanceDict, isWindows='true', wmiRegistryClient=None):
     try:
         ## Extract information from process to port dictionary first
-        processProcToPortDict(localClient, procToPortDict, dbInstanceDict)
+        succeeded = processProcToPortDict(localClient, procToPortDict, dbInstanceDict, isWindows)
 
         # Commented out below by Daniel La 06/01/11 - Been told not to detect Oracle DBs through these files. So only look
         # at services and processes to get DB instance names. Also tnsnames.ora may not necessarily be on the Oracle server. This file is used
@@ -37,17 +38,18 @@ def findDatabases(localClient, procToPortDict, dbInstanceDict, isWindows='true',
 #        if localClient.getClientType() != 'wmi' and localClient.getClientType() != 'snmp':
 #            install_locs = parseEtcFiles(localClient, procToPortDict, dbInstanceDict, isWindows)
 #            findTnsnamesOra(localClient, procToPortDict, dbInstanceDict, isWindows, install_locs)
+        return succeeded
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':findDatabases] Exception: <%s>' % excInfo)
-        pass
+        return 0
 
 ##############################################
 ## Extract information from process to port dictionary
 ## Updated by Daniel La: this method will only set listening port for Oracle DB's when there is only one listener listening on one port.
 ## For all other cases, no port is set for found Oracle DBs.
 ##############################################
-def processProcToPortDict(localClient, p2pDict, dbDict):
+def processProcToPortDict(localClient, p2pDict, dbDict, isWindows='true'):
     try:
         dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict]')
         tnslsnrPort = dbconnect_utils.UNKNOWN
@@ -61,7 +63,7 @@ def processProcToPortDict(localClient, p2pDict, dbDict):
         totaltnslsnr = 0;
         for pid in p2pDict.keys():
             processName = (p2pDict[pid])[dbconnect_utils.PROCESSNAME_INDEX].lower()
-            if re.search('tnslsnr', processName) or re.search('tnslistener', processName):
+            if dbconnect_utils.PATTERNS['oracleListenerProcess'].search(processName):
                 logger.debug('listener pid: ', pid, ' listener procname: ', processName, ' port: ', (p2pDict[pid])[dbconnect_utils.PORT_INDEX])
                 if (p2pDict[pid])[dbconnect_utils.PORT_INDEX] != 'UNKNOWN':
                     totaltnslsnr += 1
@@ -79,20 +81,20 @@ def processProcToPortDict(localClient, p2pDict, dbDict):
             sidFound = ''
             ## See if a TNS listener is present
             ## If present, get the listener port and install path
-            if re.search('tnslsnr', processName) or re.search('tnslistener', processName):
+            if dbconnect_utils.PATTERNS['oracleListenerProcess'].search(processName):
                 tnslsnrPort = listenerPort
                 tnslsnrIp = ipAddress
                 binPath = path[:path.strip().lower().find('tnslsnr')]
                 installPath = binPath[:len(binPath)-4]
                 dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] (1) Found TNS Listener at port <%s> from process <%s> with path <%s>' % (listenerPort, processName, path))
             ## Next, check for oracle process and service names to extract SID
-            elif re.search('dbconsole', processName) or re.search('jobscheduler', processName) or re.search('oradb10g', processName) or re.search('oracleora9ias_', processName) or re.search('oracle-oracleas_', processName) or re.search('oradb11g', processName) or re.search('mtsrecovery', processName) or re.search('remexec', processName):
+            elif dbconnect_utils.PATTERNS['oracleIgnoredProcess'].search(processName):
                 dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':processProcToPortDict] (2) Found process name <%s>. Ignoring...' % processName)
                 ## If we don't filter these out, the next check for "oracle"
                 ## will catch it and create a database with incorrect SIDs
                 continue
-            elif re.search('oracleservice', processName):
-                sidRegexStr = re.search('oracleservice(\w+)', processName)
+            elif dbconnect_utils.PATTERNS['oracleServiceProcess'].search(processName):
+                sidRegexStr = dbconnect_utils.PATTERNS['oracleServiceSid'].search(processName)
                 if sidRegexStr:
                     sidFound = sidRegexStr.group(1).strip()
                     dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] (3) Found Oracle instance <%s> from process name <%s> and its path is <%s>' % (sidFound, processName, path))
@@ -103,8 +105,8 @@ def processProcToPortDict(localClient, p2pDict, dbDict):
                 # if sidRegexStr:
                 #    sidFound = sidRegexStr.group(1).strip()
                 #    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] (4) Found Oracle instance <%s> from process name <%s> and its path is <%s>' % (sidFound, processName, path))
-            elif re.search('ora_pmon', processName):
-                sidRegexStr = re.search('ora_pmon_(\w+)', processName)
+            elif dbconnect_utils.PATTERNS['oraclePmonProcess'].search(processName):
+                sidRegexStr = dbconnect_utils.PATTERNS['oraclePmonSid'].search(processName)
                 if sidRegexStr:
                     sidFound = sidRegexStr.group(1).strip()
                     dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] (5) Found Oracle instance <%s> from process name <%s> and its path is <%s>' % (sidFound, processName, path))
@@ -131,10 +133,132 @@ def processProcToPortDict(localClient, p2pDict, dbDict):
             # if (dbDict[sid])[dbconnect_utils.PATH_INDEX] == dbconnect_utils.UNKNOWN:
             if (dbDict[sid])[dbconnect_utils.PATH_INDEX] == dbconnect_utils.UNKNOWN and totaltnslsnr == 1:
                 (dbDict[sid])[dbconnect_utils.PATH_INDEX] = installPath
+
+        ## With several listeners, ask each of them which instances it serves
+        unknownPortSids = [sid for sid in dbDict.keys() if (dbDict[sid])[dbconnect_utils.DBTYPE_INDEX] == 'oracle' and (dbDict[sid])[dbconnect_utils.PORT_INDEX] == dbconnect_utils.UNKNOWN]
+        if USE_LSNRCTL and len(unknownPortSids) > 0 and localClient.getClientType() not in ['wmi', 'snmp']:
+            listenerServices = getListenerServices(localClient, p2pDict, isWindows)
+            for sid in unknownPortSids:
+                if listenerServices.has_key(sid.lower()):
+                    (listenerPort, oracleHome, listenerHost) = listenerServices[sid.lower()]
+                    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':processProcToPortDict] Setting port of Oracle instance <%s> to <%s> from its listener' % (sid, listenerPort))
+                    (dbDict[sid])[dbconnect_utils.PORT_INDEX] = listenerPort
+                    ## Keep the current IP for wildcard and loopback endpoints
+                    listenerIp = dbconnect_utils.fixIP(listenerHost, (dbDict[sid])[dbconnect_utils.IP_INDEX])
+                    if listenerIp != None and listenerIp != dbconnect_utils.UNKNOWN:
+                        (dbDict[sid])[dbconnect_utils.IP_INDEX] = listenerIp
+                    if (dbDict[sid])[dbconnect_utils.PATH_INDEX] == dbconnect_utils.UNKNOWN:
+                        (dbDict[sid])[dbconnect_utils.PATH_INDEX] = oracleHome
+        return 1
     except:
         excInfo = logger.prepareJythonStackTrace('')
         dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':processProcToPortDict] Exception: <%s>' % excInfo)
-        pass
+        return 0
+
+
+##############################################
+## Get SID to listener endpoint mappings from
+## "lsnrctl status" of every running listener
+## All listeners are queried with a single command
+## Returns {lower case SID:(port, ORACLE_HOME, host)}
+##############################################
+def getListenerServices(localClient, p2pDict, isWindows):
+    try:
+        ## [(lsnrctl path, listener name, ORACLE_HOME)]
+        listeners = []
+        for pid in p2pDict.keys():
+            processName = (p2pDict[pid])[dbconnect_utils.PROCESSNAME_INDEX]
+            if not dbconnect_utils.PATTERNS['oracleListenerProcess'].search(processName.lower()):
+                continue
+            path = (p2pDict[pid])[dbconnect_utils.PATH_INDEX]
+            tnslsnrIndex = path.lower().find('tnslsnr')
+            if tnslsnrIndex < 5:
+                continue
+            binPath = path[:tnslsnrIndex]
+            oracleHome = binPath[:len(binPath)-4]
+            if isWindows == 'true':
+                lsnrctlPath = binPath + 'lsnrctl.exe'
+                ## Service names look like Oracle<home name>TNSListener<listener name>
+                listenerName = ''
+                if processName.lower().find('tnslistener') > -1:
+                    listenerName = processName[processName.lower().find('tnslistener')+11:].strip()
+            else:
+                lsnrctlPath = binPath + 'lsnrctl'
+                ## Command lines look like "tnslsnr <listener name> -inherit"
+                listenerName = ''
+                cmdlineTokens = (p2pDict[pid])[dbconnect_utils.COMMANDLINE_INDEX].split()
+                if len(cmdlineTokens) > 1 and cmdlineTokens[1][0] != '-':
+                    listenerName = cmdlineTokens[1]
+            if not listenerName:
+                listenerName = 'LISTENER'
+            if (lsnrctlPath, listenerName, oracleHome) not in listeners:
+                listeners.append((lsnrctlPath, listenerName, oracleHome))
+        if len(listeners) < 1:
+            return {}
+
+        lsnrctlCommands = []
+        for listenerIndex in range(len(listeners)):
+            (lsnrctlPath, listenerName, oracleHome) = listeners[listenerIndex]
+            if isWindows == 'true':
+                lsnrctlCommands.append('echo LSNR:%s & "%s" status %s' % (listenerIndex, lsnrctlPath, listenerName))
+            else:
+                ## env works in csh too, lsnrctl reports errors on stdout
+                lsnrctlCommands.append('echo "LSNR:%s"; env ORACLE_HOME="%s" "%s" status %s' % (listenerIndex, oracleHome, lsnrctlPath, listenerName))
+        lsnrctlSeparator = '; '
+        if isWindows == 'true':
+            lsnrctlSeparator = ' & '
+        lsnrctlOutput = localClient.executeCmd(lsnrctlSeparator.join(lsnrctlCommands), 120000)
+        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getListenerServices] lsnrctl output: <%s>', lsnrctlOutput)
+        if lsnrctlOutput == None:
+            return {}
+        return parseLsnrctlStatus(lsnrctlOutput, listeners)
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        dbconnect_utils.debugPrint('[' + SCRIPT_NAME + ':getListenerServices] Exception: <%s>' % excInfo)
+        return {}
+
+
+##############################################
+## Parse output of getListenerServices' lsnrctl batch
+## Each listener's "lsnrctl status" starts after a
+## LSNR:<listener index> line. Instances take the first
+## TCP endpoint not on a loopback address. A SID served
+## by several listeners keeps the first one
+## Returns {lower case SID:(port, ORACLE_HOME, host)}
+##############################################
+def parseLsnrctlStatus(lsnrctlOutput, listeners):
+    sidMap = {}
+    ## [[listener index, [(host, port)], [loopback (host, port)], [SIDs]]]
+    listenerSections = []
+    for lsnrctlLine in dbconnect_utils.iterCommandOutput(lsnrctlOutput):
+        if lsnrctlLine.startswith('LSNR:'):
+            listenerIndex = lsnrctlLine[5:].strip()
+            if listenerIndex.isdigit() and int(listenerIndex) < len(listeners):
+                listenerSections.append([int(listenerIndex), [], [], []])
+            continue
+        if len(listenerSections) < 1:
+            continue
+        listenerSection = listenerSections[-1]
+        m = dbconnect_utils.PATTERNS['lsnrctlTcpEndpoint'].search(lsnrctlLine)
+        if m:
+            if m.group(1).startswith('127.') or m.group(1).lower() == 'localhost':
+                listenerSection[2].append((m.group(1), m.group(2)))
+            else:
+                listenerSection[1].append((m.group(1), m.group(2)))
+            continue
+        m = dbconnect_utils.PATTERNS['lsnrctlInstance'].search(lsnrctlLine)
+        if m and m.group(1).lower() not in listenerSection[3]:
+            listenerSection[3].append(m.group(1).lower())
+    for (listenerIndex, listenerEndpoints, loopbackEndpoints, listenerSids) in listenerSections:
+        listenerEndpoints = listenerEndpoints + loopbackEndpoints
+        if len(listenerEndpoints) < 1:
+            continue
+        (listenerHost, listenerPort) = listenerEndpoints[0]
+        for sid in listenerSids:
+            if not sidMap.has_key(sid):
+                sidMap[sid] = (listenerPort, listeners[listenerIndex][2], listenerHost)
+                dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':parseLsnrctlStatus] Found Oracle instance <%s> on listener <%s> at <%s:%s>' % (sid, listeners[listenerIndex][1], listenerHost, listenerPort))
+    return sidMap
 
 
 ##############################################
@@ -267,9 +391,9 @@ def findTnsnamesOra(localClient, p2pDict, dbDict, isWindows, installLocs):
             for pid in p2pDict.keys():
                 processName = (p2pDict[pid])[dbconnect_utils.PROCESSNAME_INDEX].lower()
                 path = (p2pDict[pid])[dbconnect_utils.PATH_INDEX].lower()
-                if re.search('tns', processName) or re.search('dbconsole', processName) or re.search('jobscheduler', processName) or re.search('oradb', processName) or re.search('oracle', processName) or re.search('ora_', processName):
+                if dbconnect_utils.PATTERNS['oracleRelatedProcess'].search(processName):
                     ## Remove /bin/tnslsnr from TNS process path
-                    if re.search('/bin/tnslsnr', path):
+                    if dbconnect_utils.PATTERNS['tnslsnrBinPath'].search(path):
                         path = path[:path.find('/bin/tnslsnr')]
                     if path in searchLocations:
                         dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':findTnsnamesOra] [2] <%s> already in search locations' % path)
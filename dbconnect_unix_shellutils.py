@@ -9,12 +9,13 @@
 ## DONE * Add all other *NIX's
 ## DONE * Add software discovery
 ## DONE * Add LSOF option for AIX and Solaris
-## * Move LSOF based port mapper to an external method
+## DONE * Move LSOF based port mapper to an external method
 ##############################################
 
 ## Jython imports
 import re
 import string
+import time
 
 ## Java imports
 from java.lang import ArrayIndexOutOfBoundsException
@@ -34,6 +35,15 @@ import TTY_HR_Process_Lib
 ## Globals
 ##############################################
 SCRIPT_NAME='dbconnect_unix_shellutils.py'
+KDB_BATCH_SIZE = 100 ## Number of socket addresses sent to a single kdb session
+AIX_SOCKET_PID_CACHE = {} ## {host IP:{socket address:(time resolved, PID)}}
+AIX_SOCKET_PID_CACHE_TTL = 300 ## Seconds before a cached socket address is resolved again, kernel addresses get reused
+LINUX_USE_PROCFS = 0 ## Set to 1 to read processes and listening sockets straight from /proc on Linux, falls back to ps/netstat
+## Dumps everything needed for the Linux process to port map in one command. See parseProcfsOutput
+LINUX_PROCFS_SCRIPT = 'cd /proc && for p in [0-9]*; do [ -r $p/cmdline ] || continue; printf "C|%s|" $p; tr "\\000" " " < $p/cmdline; echo; done 2>/dev/null; ' \
+                    + 'find /proc -maxdepth 1 -name "[0-9]*" -printf "U|%f|%u\\n" 2>/dev/null; ' \
+                    + 'find /proc -mindepth 2 -maxdepth 3 -path "/proc/[0-9]*" -lname "socket:*" -printf "L|%p|%l\\n" 2>/dev/null; ' \
+                    + 'echo "T|tcp"; cat /proc/net/tcp; echo "T|tcp6"; cat /proc/net/tcp6 2>/dev/null; true'
 
 ############################################################
 ##### Helper for AIX P2P
@@ -62,23 +72,23 @@ def getAIXpIDfromAddress(localClient, procAddress, USE_SUDO):
         kdbOutLines = dbconnect_utils.splitCommandOutput(kdbOut.strip())
         if kdbOutLines == None:
             kdbOutLines = kdbOut.strip()
-        dbconnect_utils.debugPrint(5, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] kdbOutLines before extracting pidLine is <%s> (length=<%s>)' % (kdbOutLines, len(kdbOutLines)))
+        dbconnect_utils.debugPrint(5, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] kdbOutLines before extracting pidLine is <%s> (length=<%s>)', kdbOutLines, len(kdbOutLines))
         ### We're only interested in the line with string "ACTIVE" in it
         if len(kdbOutLines) > 0:
             for kdbOutLine in kdbOutLines:
-                if re.search('ACTIVE', kdbOutLine):
+                if dbconnect_utils.PATTERNS['kdbActiveLine'].search(kdbOutLine):
                     pidLine = kdbOutLine.strip()
         else:
             dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] Unusable KDB output for address <%s>' % procAddress)
             return None
         ## Extract process ID hex from output of kbd
         #m = re.match('\S+\+\w+\s+\d+\*\S+\s+\S+\s+(\w+)\s+\w+\s+\w+\s+\w+\s+\w+\s+\w+\s+.*', pidLine)
-        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] pidLine is <%s>' % pidLine)
-        m = re.match('.*ACTIVE\s+(\w+)\s+.*', pidLine)
+        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] pidLine is <%s>', pidLine)
+        m = dbconnect_utils.PATTERNS['kdbActivePid'].match(pidLine)
         if (m):
             #thePID = str(int(m.group(1), 16))
             thePID = str(int(m.group(1), 16))
-            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] Found PID <%s> for address <%s>' % (thePID, procAddress))
+            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] Found PID <%s> for address <%s>', thePID, procAddress)
             return thePID
         else:
             dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getAIXpIDfromAddress] Couldn\'t find PID for address [' + procAddress + ']')
@@ -90,13 +100,314 @@ def getAIXpIDfromAddress(localClient, procAddress, USE_SUDO):
         pass
 
 
+############################################################
+##### Parse output of a batched kdb sockinfo session
+##### Each "sockinfo <address> tcpcb" echo line starts the
+##### section for that address and the last ACTIVE line in
+##### the section holds the owning process
+############################################################
+def parseKdbSockinfoOutput(kdbOut):
+    try:
+        addressToPid = {}
+        if kdbOut == None:
+            return addressToPid
+        procAddress = None
+        for kdbOutLine in dbconnect_utils.iterCommandOutput(kdbOut):
+            m = dbconnect_utils.PATTERNS['kdbSockinfoEcho'].search(kdbOutLine)
+            if (m):
+                procAddress = m.group(1).strip()
+                continue
+            if procAddress == None:
+                continue
+            ## Output: pvproc+00E000   56*inetd    ACTIVE 003808A 00360AC 0000000001244400   0 0001
+            m = dbconnect_utils.PATTERNS['kdbActivePid'].match(kdbOutLine.strip())
+            if (m):
+                try:
+                    addressToPid[procAddress] = str(int(m.group(1), 16))
+                except ValueError:
+                    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':parseKdbSockinfoOutput] Invalid PID in line <%s>' % kdbOutLine)
+        return addressToPid
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        logger.debug('[' + SCRIPT_NAME + ':parseKdbSockinfoOutput] Exception: <%s>' % excInfo)
+        return {}
+
+
+############################################################
+##### Resolve many socket addresses to PIDs with one kdb
+##### session per KDB_BATCH_SIZE addresses instead of one
+##### per address. Results are cached per host for
+##### AIX_SOCKET_PID_CACHE_TTL seconds
+############################################################
+def getAIXpIDsfromAddresses(localClient, procAddresses, USE_SUDO):
+    try:
+        hostIp = localClient.getIpAddress()
+        if not AIX_SOCKET_PID_CACHE.has_key(hostIp):
+            AIX_SOCKET_PID_CACHE[hostIp] = {}
+        hostCache = AIX_SOCKET_PID_CACHE[hostIp]
+        now = time.time()
+        for procAddress in hostCache.keys():
+            if now - hostCache[procAddress][0] >= AIX_SOCKET_PID_CACHE_TTL:
+                del hostCache[procAddress]
+        addressToPid = {}
+        unresolvedAddresses = []
+        for procAddress in procAddresses:
+            if hostCache.has_key(procAddress):
+                addressToPid[procAddress] = hostCache[procAddress][1]
+            elif procAddress not in unresolvedAddresses:
+                unresolvedAddresses.append(procAddress)
+        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getAIXpIDsfromAddresses] <%s> addresses cached, <%s> to resolve through kdb' % (len(addressToPid), len(unresolvedAddresses)))
+
+        for batchStart in range(0, len(unresolvedAddresses), KDB_BATCH_SIZE):
+            batch = unresolvedAddresses[batchStart:batchStart + KDB_BATCH_SIZE]
+            kdbInput = ''
+            for procAddress in batch:
+                kdbInput = kdbInput + 'sockinfo ' + procAddress + ' tcpcb\\n'
+            kdbCmd = 'printf "' + kdbInput + '" | kdb | egrep "sockinfo|ACTIVE"'
+            if USE_SUDO == 'true':
+                kdbCmd = 'sudo ' + kdbCmd
+            try:
+                kdbOut = localClient.executeCmd(kdbCmd)
+            except:
+                excInfo = logger.prepareJythonStackTrace('')
+                logger.warn('[' + SCRIPT_NAME + ':getAIXpIDsfromAddresses] Error: Couldn\'t execute <%s>: <%s>' % (kdbCmd, excInfo))
+                continue
+            if kdbOut == None:
+                continue
+            if (kdbOut.find('do not allow') != -1):
+                logger.debug('[' + SCRIPT_NAME + ':getAIXpIDsfromAddresses] Couldn\'t get info from kdb. Please set suid on /usr/sbin/kdb or use root credentials.')
+                break
+            if kdbOut.find('sockinfo') == -1:
+                ## This kdb doesn't echo its input so the output can't be split
+                ## per address. Fall back on one kdb session per address
+                dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getAIXpIDsfromAddresses] Unusable batched kdb output, resolving addresses one at a time')
+                for procAddress in batch:
+                    pid = getAIXpIDfromAddress(localClient, procAddress, USE_SUDO)
+                    if pid != None:
+                        hostCache[procAddress] = (time.time(), pid)
+                        addressToPid[procAddress] = pid
+                continue
+            batchResult = parseKdbSockinfoOutput(kdbOut)
+            for procAddress in batch:
+                if batchResult.has_key(procAddress):
+                    hostCache[procAddress] = (time.time(), batchResult[procAddress])
+                    addressToPid[procAddress] = batchResult[procAddress]
+                else:
+                    dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getAIXpIDsfromAddresses] Couldn\'t find PID for address [' + procAddress + ']')
+        return addressToPid
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        logger.debug('[' + SCRIPT_NAME + ':getAIXpIDsfromAddresses] Exception: <%s>' % excInfo)
+        return {}
+
+
+##############################################
+## Add LISTEN sockets from "lsof -n -P -i" output
+## to a process to port index in a single pass.
+## Returns the number of ports mapped to known processes
+##############################################
+def addLsofListeners(localClient, procToPortDict, lsofStr):
+    try:
+        portCount = 0
+        if lsofStr == None:
+            return portCount
+        localIp = localClient.getIpAddress()
+        for lsofLine in dbconnect_utils.iterCommandOutput(lsofStr):
+            if len(lsofLine) < 1:
+                continue
+            m = dbconnect_utils.PATTERNS['lsofListen'].search(lsofLine)
+            if not m:
+                continue
+            pid = m.group(1).strip()
+            if not procToPortDict.hasPid(pid):
+                continue
+            ## Set the IP address to that of the destination if it is "*", "::", or "0.0.0.0"
+            ipAddress = dbconnect_utils.fixIP(m.group(2).strip(), localIp)
+            ## Skip loopback IPs
+            if dbconnect_utils.PATTERNS['loopbackIp'].search(ipAddress):
+                continue
+            serverPort = m.group(3).strip()
+            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':addLsofListeners] Found port <%s:%s> for pid <%s>', ipAddress, serverPort, pid)
+            procToPortDict.addPort(pid, ipAddress, serverPort)
+            portCount = portCount + 1
+        return portCount
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        logger.debug('[' + SCRIPT_NAME + ':addLsofListeners] Exception: <%s>' % excInfo)
+        return 0
+
+
+##############################################
+## Decode an address from /proc/net/tcp or /proc/net/tcp6
+## Addresses are hex words in host (little endian) byte order
+##############################################
+def decodeProcNetAddress(hexAddress):
+    if len(hexAddress) == 8:
+        return '%d.%d.%d.%d' % (int(hexAddress[6:8], 16), int(hexAddress[4:6], 16), int(hexAddress[2:4], 16), int(hexAddress[0:2], 16))
+    if len(hexAddress) != 32:
+        return None
+    addressBytes = []
+    for wordIndex in range(0, 32, 8):
+        word = hexAddress[wordIndex:wordIndex+8]
+        addressBytes = addressBytes + [word[6:8], word[4:6], word[2:4], word[0:2]]
+    ## IPv4 mapped IPv6 address (::ffff:a.b.c.d)
+    if ''.join(addressBytes[:12]).lower() == '00000000000000000000ffff':
+        return '.'.join([str(int(addressByte, 16)) for addressByte in addressBytes[12:]])
+    groups = []
+    for byteIndex in range(0, 16, 2):
+        groups.append('%x' % int(addressBytes[byteIndex] + addressBytes[byteIndex+1], 16))
+    ## Compress the longest run of zero groups
+    (bestStart, bestLength, runStart) = (-1, 0, -1)
+    for groupIndex in range(len(groups) + 1):
+        if groupIndex < len(groups) and groups[groupIndex] == '0':
+            if runStart < 0:
+                runStart = groupIndex
+        elif runStart > -1:
+            if groupIndex - runStart > bestLength:
+                (bestStart, bestLength) = (runStart, groupIndex - runStart)
+            runStart = -1
+    if bestLength > 1:
+        return ':'.join(groups[:bestStart]) + '::' + ':'.join(groups[bestStart+bestLength:])
+    return ':'.join(groups)
+
+
+##############################################
+## Parse the output of LINUX_PROCFS_SCRIPT
+## Record types (one per line, "|" separated):
+##   C|<pid>|<cmdline>    process command line
+##   U|<pid>|<user>       process owner
+##   L|<link>|<target>    /proc/<pid>/fd/<fd> socket link
+##   T|<protocol>         start of /proc/net/tcp or tcp6 dump
+## Returns ({pid:[cmdline, user]},
+##          {socket inode:(ip, port)}, {socket inode:[pids]})
+##############################################
+def parseProcfsOutput(procfsOut):
+    processes = {}
+    listenSockets = {}
+    socketOwners = {}
+    inTcpTable = 0
+    for procLine in dbconnect_utils.iterCommandOutput(procfsOut):
+        if procLine.startswith('C|'):
+            inTcpTable = 0
+            procFields = procLine.split('|', 2)
+            if len(procFields) == 3 and procFields[1].isdigit():
+                processes[procFields[1]] = [procFields[2].strip(), '']
+        elif procLine.startswith('U|'):
+            procFields = procLine.split('|')
+            if len(procFields) == 3 and processes.has_key(procFields[1]):
+                processes[procFields[1]][1] = procFields[2]
+        elif procLine.startswith('L|'):
+            procFields = procLine.split('|', 2)
+            if len(procFields) != 3:
+                continue
+            linkPath = procFields[1].split('/')
+            ## /proc/<pid>/fd/<fd>
+            if len(linkPath) < 5 or not linkPath[2].isdigit():
+                continue
+            pid = linkPath[2]
+            if procFields[2].startswith('socket:['):
+                socketInode = procFields[2][8:-1]
+                if socketOwners.has_key(socketInode):
+                    socketOwners[socketInode].append(pid)
+                else:
+                    socketOwners[socketInode] = [pid]
+        elif procLine.startswith('T|'):
+            inTcpTable = 1
+        elif inTcpTable:
+            ## sl local_address rem_address st tx_queue:rx_queue tr:tm->when retrnsmt uid timeout inode
+            tcpFields = procLine.split()
+            if len(tcpFields) < 10 or tcpFields[3] != '0A' or tcpFields[1].find(':') < 0:
+                continue
+            (hexAddress, hexPort) = tcpFields[1].split(':')
+            ipAddress = decodeProcNetAddress(hexAddress)
+            if ipAddress != None:
+                listenSockets[tcpFields[9]] = (ipAddress, str(int(hexPort, 16)))
+    return (processes, listenSockets, socketOwners)
+
+
+##############################################
+## Build the process to port map on Linux from /proc
+## with a single command. Returns None if /proc could
+## not be read, or no listening socket could be joined
+## to its process (find without -printf, no access to
+## the fds of other users), so the caller can fall
+## back to ps/netstat
+##############################################
+def getProcToPortDictFromProcfs(localClient, USE_SUDO):
+    try:
+        procfsCmd = LINUX_PROCFS_SCRIPT
+        if USE_SUDO == 'true':
+            procfsCmd = procfsCmd.replace('find /proc ', 'sudo find /proc ')
+        procfsOut = localClient.executeCmd(procfsCmd, 120000)
+        if procfsOut == None or procfsOut.find('T|tcp') < 0:
+            dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictFromProcfs] Unable to read /proc. Output was <%s>' % procfsOut)
+            return None
+        (processes, listenSockets, socketOwners) = parseProcfsOutput(procfsOut)
+        if len(processes) < 1:
+            return None
+
+        procToPortDict = dbconnect_utils.ProcPortIndex()
+        for (pid, (commandLine, userName)) in processes.items():
+            ## Kernel threads have no command line
+            if len(commandLine) < 1:
+                continue
+            ## Same name and path rules as the ps parser. Processes such as Oracle
+            ## background processes rename themselves through argv[0]
+            commandTokens = commandLine.split(None, 1)
+            commandPath = commandTokens[0]
+            if (commandPath.find('/') == -1) or (commandPath[0] == '['):
+                cleanCommand = commandPath
+            else:
+                res2 = dbconnect_utils.PATTERNS['unixPathAndName'].search(commandPath)
+                if (res2):
+                    cleanCommand = res2.group(2)
+                else:
+                    continue
+            commandLine = ' '.join([cleanCommand] + commandTokens[1:])
+            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictFromProcfs] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>', pid, cleanCommand, commandPath, userName, commandLine)
+            dbconnect_utils.populateProcToPortDict(procToPortDict, pid, cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine, userName)
+
+        localIp = localClient.getIpAddress()
+        listenCount = 0
+        joinedCount = 0
+        for (socketInode, (ipAddress, serverPort)) in listenSockets.items():
+            ## Skip loopback IPs
+            if dbconnect_utils.PATTERNS['loopbackIp'].search(ipAddress) or ipAddress == '::1':
+                continue
+            listenCount = listenCount + 1
+            ## Listening sockets are shared by forked children, the lowest pid is the parent
+            ownerPids = [int(ownerPid) for ownerPid in socketOwners.get(socketInode, []) if procToPortDict.hasPid(ownerPid)]
+            if len(ownerPids) < 1:
+                continue
+            joinedCount = joinedCount + 1
+            ownerPids.sort()
+            pid = str(ownerPids[0])
+            ipAddress = dbconnect_utils.fixIP(ipAddress, localIp)
+            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictFromProcfs] Adding port <%s:%s> for process <%s>', ipAddress, serverPort, (procToPortDict[pid])[dbconnect_utils.PROCESSNAME_INDEX])
+            procToPortDict.addPort(pid, ipAddress, serverPort)
+        if listenCount > 0 and joinedCount < 1:
+            dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictFromProcfs] None of <%s> listening sockets could be joined to a process' % listenCount)
+            return None
+        return procToPortDict
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictFromProcfs] Exception: <%s>' % excInfo)
+        return None
+
+
 ##############################################
 ## Linux
 ##############################################
 def getProcToPortDictOnLinux(localClient, USE_SUDO, USE_LSOF):
     try:
         dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux]')
-        procToPortDict = {}
+        if LINUX_USE_PROCFS:
+            procToPortDict = getProcToPortDictFromProcfs(localClient, USE_SUDO)
+            if procToPortDict != None:
+                dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Returning process to port dictionary from /proc with <%s> items' % len(procToPortDict))
+                return procToPortDict
+            dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Falling back to ps and netstat')
+        procToPortDict = dbconnect_utils.ProcPortIndex()
 
         ## Get process OSHs
         ############################################
@@ -105,17 +416,12 @@ def getProcToPortDictOnLinux(localClient, USE_SUDO, USE_LSOF):
             if psOut == None:
                 logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Unable to get list of processes!')
                 return None
-            psLines = dbconnect_utils.splitCommandOutput(psOut.strip())
-            if psLines == None:
-                logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Unable to get list of processes!')
-                return None
-            for psLine in psLines:
-                psLine = psLine.strip()
+            for psLine in dbconnect_utils.iterCommandOutput(psOut):
                 token = psLine.split(None, 4)
                 # Some checks to make sure line is valid
                 if(len(token) != 5):
                     continue
-                if(not re.search('^\d+$',token[0])):
+                if(not dbconnect_utils.PATTERNS['allDigits'].search(token[0])):
                     continue
                 if(len(token[4]) < 2):
                     continue
@@ -137,13 +443,13 @@ def getProcToPortDictOnLinux(localClient, USE_SUDO, USE_LSOF):
                 if (commandPath.find('/') == -1) or (commandPath[0] == '['):
                     cleanCommand = commandPath
                 else:
-                    res2 = re.search('(.*/)([^/]+)',commandPath)
+                    res2 = dbconnect_utils.PATTERNS['unixPathAndName'].search(commandPath)
                     if (res2):
                         cleanCommand = res2.group(2)
                     else:
                         continue
                 commandLine = cleanCommand + ' ' + cleanArgs
-                dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>' % (pid, cleanCommand, commandPath, userName, commandLine))
+                dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>', pid, cleanCommand, commandPath, userName, commandLine)
                 ## {PID:[cleanCommand, listeningPort, ipAddress, path, version, status, processCommandline]}
 #                        procToPortDict[pid] = [cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine]
                 if dbconnect_utils.populateProcToPortDict(procToPortDict, pid, cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine, userName) == 0:
@@ -161,26 +467,23 @@ def getProcToPortDictOnLinux(localClient, USE_SUDO, USE_LSOF):
             if USE_SUDO == 'true':
                 netstatLisCmd = 'sudo ' + netstatLisCmd
             netstatLisStr = localClient.executeCmd(netstatLisCmd)
-            nsLisLines = dbconnect_utils.splitCommandOutput(netstatLisStr.strip())
-            if nsLisLines != None:
-                for nsLine in nsLisLines:
-                    nsLine = nsLine.strip()
-                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Got nsLine <%s>' % nsLine)
-                    m = re.search('tcp.* (\S+):(\d+).*:.*\s+(\d+|-).*', nsLine)
+            if netstatLisStr != None:
+                for nsLine in dbconnect_utils.iterCommandOutput(netstatLisStr):
+                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Got nsLine <%s>', nsLine)
+                    m = dbconnect_utils.PATTERNS['netstatLinuxListen'].search(nsLine)
                     if (m):
                         ipAddress = m.group(1).strip()
                         ## Skip loopback IPs
-                        if re.search('127.0.0', ipAddress):
+                        if dbconnect_utils.PATTERNS['loopbackIp'].search(ipAddress):
                             continue
                         ## Set the IP address to that of the destination if it is "*", "::", or "0.0.0.0"
                         ipAddress = dbconnect_utils.fixIP(ipAddress, localClient.getIpAddress())
                         serverPort = m.group(2).strip()
                         pid = m.group(3).strip()
-                        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Got port <%s> for pid <%s>' % (serverPort, pid))
-                        if pid != '-' and procToPortDict.has_key(pid):
-                            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Adding port <%s:%s> for process <%s>' % (ipAddress, serverPort, (procToPortDict[pid])[dbconnect_utils.PROCESSNAME_INDEX]))
-                            (procToPortDict[pid])[dbconnect_utils.IP_INDEX] = ipAddress
-                            (procToPortDict[pid])[dbconnect_utils.PORT_INDEX] = serverPort
+                        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Got port <%s> for pid <%s>', serverPort, pid)
+                        if pid != '-' and procToPortDict.hasPid(pid):
+                            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Adding port <%s:%s> for process <%s>', ipAddress, serverPort, (procToPortDict[pid])[dbconnect_utils.PROCESSNAME_INDEX])
+                            procToPortDict.addPort(pid, ipAddress, serverPort)
                     else:
                         dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictOnLinux] Couldn\'t get netstat information (Most likely due to lack of user permissions): ' + nsLine)
             else:
@@ -210,7 +513,7 @@ def getProcToPortDictOnLinux(localClient, USE_SUDO, USE_LSOF):
 def getProcToPortDictOnSolaris(localClient, USE_SUDO, USE_LSOF):
     try:
         dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris]')
-        procToPortDict = {}
+        procToPortDict = dbconnect_utils.ProcPortIndex()
 
         ## Get process OSHs
         ############################################
@@ -219,17 +522,15 @@ def getProcToPortDictOnSolaris(localClient, USE_SUDO, USE_LSOF):
             if USE_SUDO == 'true':
                 psCmd = 'sudo ' + psCmd
             psOut = localClient.executeCmd(psCmd)
-            psLines = dbconnect_utils.splitCommandOutput(psOut.strip())
-            if psLines == None:
+            if psOut == None:
                 logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] Unable to get list of processes!')
                 return None
-            for line in psLines:
-                line = line.strip()
+            for line in dbconnect_utils.iterCommandOutput(psOut):
                 token=line.split(None,4)
                 # Some checks to make sure line is valid
                 if (len(token) != 5):
                     continue
-                if (not re.search('^\d+$',token[0])):
+                if (not dbconnect_utils.PATTERNS['allDigits'].search(token[0])):
                     continue
                 if (len(token[4]) < 2):
                     continue
@@ -253,14 +554,14 @@ def getProcToPortDictOnSolaris(localClient, USE_SUDO, USE_LSOF):
                     cleanCommand = commandPath
                     cleanPath = ''
                 else:
-                    res2 = re.search('(.*/)([^/]+)', commandPath)
+                    res2 = dbconnect_utils.PATTERNS['unixPathAndName'].search(commandPath)
                     if (res2):
                         cleanPath = res2.group(1)
                         cleanCommand = res2.group(2)
                     else:
                         continue
                 commandLine = cleanCommand + ' ' + cleanArgs
-                dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>' % (pid, cleanCommand, commandPath, userName, commandLine))
+                dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>', pid, cleanCommand, commandPath, userName, commandLine)
                 ## {PID:[cleanCommand, listeningPort, ipAddress, path, version, status, processCommandline]}
 #                        procToPortDict[pid] = [cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine]
                 if dbconnect_utils.populateProcToPortDict(procToPortDict, pid, cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine, userName) == 0:
@@ -273,33 +574,27 @@ def getProcToPortDictOnSolaris(localClient, USE_SUDO, USE_LSOF):
         ## Use PFILES to map each process to a port and create a dictionary
         ############################################
         try:
-            for pID in procToPortDict.keys():
+            for pID in procToPortDict.getPids():
                 pFilesCmd = 'pfiles ' + pID + ' 2>/dev/null | grep "sockname: AF_INET"'
                 if USE_SUDO == 'true':
                     pFilesCmd = 'sudo ' + pFilesCmd
                 pFilesStr = localClient.executeCmd(pFilesCmd)
-                if len(pFilesStr) <1:
-                    continue
-                pFilesLines = dbconnect_utils.splitCommandOutput(pFilesStr.strip())
-                if pFilesLines == None:
-                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] Error: Invalid output from pfiles: ' + pFilesStr)
+                if pFilesStr == None or len(pFilesStr) <1:
                     continue
-                for pFilesLine in pFilesLines:
-                    pFilesLine = pFilesLine.strip()
-                    m = re.search('.+AF_INET\s+(\d+\.\d+\.\d+\.\d+)\s+port:\s*(\d+)', pFilesLine)
-                    if re.search('AFINET6', pFilesLine):
-                        m = re.search('.+AF_INET6.*:(\d+\.\d+\.\d+\.\d+)\s+port:\s*(\d+)', pFilesLine)
+                for pFilesLine in dbconnect_utils.iterCommandOutput(pFilesStr):
+                    m = dbconnect_utils.PATTERNS['pfilesInet'].search(pFilesLine)
+                    if dbconnect_utils.PATTERNS['pfilesInet6Marker'].search(pFilesLine):
+                        m = dbconnect_utils.PATTERNS['pfilesInet6'].search(pFilesLine)
                     if (m) and m.group(2) != '0':
                         ipAddress = m.group(1).strip()
                         ## Skip loopback IPs
-                        if re.search('127.0.0', ipAddress):
+                        if dbconnect_utils.PATTERNS['loopbackIp'].search(ipAddress):
                             continue
                         ## Set the IP address to that of the destination if it is "*", "::", or "0.0.0.0"
                         ipAddress = dbconnect_utils.fixIP(ipAddress, localClient.getIpAddress())
                         serverPort = m.group(2).strip()
-                        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] Adding port <%s:%s> for process <%s>' % (ipAddress, serverPort, (procToPortDict[pID])[dbconnect_utils.PROCESSNAME_INDEX]))
-                        (procToPortDict[pID])[dbconnect_utils.IP_INDEX] = ipAddress
-                        (procToPortDict[pID])[dbconnect_utils.PORT_INDEX] = serverPort
+                        dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] Adding port <%s:%s> for process <%s>', ipAddress, serverPort, (procToPortDict[pID])[dbconnect_utils.PROCESSNAME_INDEX])
+                        procToPortDict.addPort(pID, ipAddress, serverPort)
                     else:
                         dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnSolaris] No TCP port associated with PID [' + pID + ']: ' + pFilesLine)
         except:
@@ -327,24 +622,23 @@ def getProcToPortDictOnSolaris(localClient, USE_SUDO, USE_LSOF):
 def getProcToPortDictOnHPUX(localClient, USE_SUDO, USE_LSOF):
     try:
         dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX]')
-        procToPortDict = {}
+        procToPortDict = dbconnect_utils.ProcPortIndex()
 
         ## Get process OSHs
         ############################################
         try:
             psOut = localClient.executeCmd('ps -ef')
-            psLines = dbconnect_utils.splitCommandOutput(psOut.strip())
-            if psLines == None:
+            if psOut == None:
                 logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX] Unable to get list of processes!')
                 return None
-            for psLine in psLines:
+            for psLine in dbconnect_utils.iterCommandOutput(psOut):
                 ## Reg for processes with args
-                res = re.search('(\w+)\s+?(\d+).*\s\d+\:\d\d\s([0-9a-zA-Z_.\[\]\-+:/]+)\s(.*)', psLine)
+                res = dbconnect_utils.PATTERNS['psHpuxWithArgs'].search(psLine)
                 if(res):
                     cleanArgs = res.group(4)
                 else:
                     ## Reg for processes with no args
-                    res = re.search('(\w+)\s+?(\d+).*\s\d+\:\d\d\s([0-9a-zA-Z_.\-+:/]+)', psLine)
+                    res = dbconnect_utils.PATTERNS['psHpux'].search(psLine)
                     if(res):
                         cleanArgs = ''
                 if(res):
@@ -355,13 +649,13 @@ def getProcToPortDictOnHPUX(localClient, USE_SUDO, USE_LSOF):
                     if commandPath.find('/') == -1:
                         cleanCommand = commandPath
                     else:
-                        res2 = re.search('(.*/)([^/]+)', commandPath)
+                        res2 = dbconnect_utils.PATTERNS['unixPathAndName'].search(commandPath)
                         if (res2):
                             cleanCommand = res2.group(2)
                         else:
                             continue
                     commandLine = cleanCommand + ' ' + cleanArgs
-                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>' % (pid, cleanCommand, commandPath, userName, commandLine))
+                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>', pid, cleanCommand, commandPath, userName, commandLine)
                     ## {PID:[cleanCommand, listeningPort, ipAddress, path, version, status, processCommandline]}
 #                        procToPortDict[pid] = [cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine]
                     if dbconnect_utils.populateProcToPortDict(procToPortDict, pid, cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine, userName) == 0:
@@ -374,41 +668,12 @@ def getProcToPortDictOnHPUX(localClient, USE_SUDO, USE_LSOF):
         ## Use LSOF to map each process to a port and create a dictionary
         ############################################
         try:
-            pidToPortMap = {} ## We need a local pid to port map
             # lsofCmd = 'lsof -n -P -i | grep -i listen 2>/dev/null'
             lsofCmd = '/usr/local/bin/lsof -n -P -i | grep -i listen 2>/dev/null' # need to specify fullpath - Daniel La
             if USE_SUDO == 'true':
                 lsofCmd = 'sudo ' + lsofCmd
             lsofStr = localClient.executeCmd(lsofCmd)
-            lsofLines = dbconnect_utils.splitCommandOutput(lsofStr.strip())
-            if lsofLines != None:
-                for lsofLine in lsofLines:
-                    if len(lsofLine) <1:
-                        continue
-                    lsofLine = lsofLine.strip()
-                    m = re.search('\w+\s+(\d+)\s+\w+\s+\w+\s+IPv[4|6].+TCP\s+(\S+):(\d+)\s+\(\w+\)', lsofLine)
-                    if (m):
-                        pid = m.group(1).strip()
-                        ipAddress = m.group(2).strip()
-                        ## Set the IP address to that of the destination if it is "*", "::", or "0.0.0.0"
-                        ipAddress = dbconnect_utils.fixIP(ipAddress, localClient.getIpAddress())
-                        serverPort = m.group(3).strip()
-                        pidToPortMap[pid] = [ipAddress, serverPort]
-
-                if pidToPortMap != None and len(pidToPortMap) > 0:
-                    for pid in pidToPortMap.keys():
-                        if pid in procToPortDict.keys():
-                            ipAddress = (pidToPortMap[pid])[0]
-                            ## Skip loopback IPs
-                            if re.search('127.0.0', ipAddress):
-                                continue
-                            serverPort = (pidToPortMap[pid])[1]
-                            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX] Found port <%s:%s> for pid <%s>' % (ipAddress, serverPort, pid))
-                            (procToPortDict[pid])[dbconnect_utils.IP_INDEX] = ipAddress
-                            (procToPortDict[pid])[dbconnect_utils.PORT_INDEX] = serverPort
-                else:
-                    dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX] No TCP port associated with PID [' + pID + ']: ' + lsofLine)
-            else:
+            if addLsofListeners(localClient, procToPortDict, lsofStr) < 1:
                 dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictOnHPUX] Unable to make a process to port map using LSOF: ' + lsofStr)
         except:
             excInfo = logger.prepareJythonStackTrace('')
@@ -437,26 +702,25 @@ def getProcToPortDictOnHPUX(localClient, USE_SUDO, USE_LSOF):
 def getProcToPortDictOnAIX(localClient, USE_SUDO, USE_LSOF):
     try:
         dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX]')
-        procToPortDict = {}
+        procToPortDict = dbconnect_utils.ProcPortIndex()
 
         ## Get process OSHs
         ############################################
         try:
             psOut = localClient.executeCmd("ps -e -o 'user,pid,time,args'")
-            psLines = dbconnect_utils.splitCommandOutput(psOut.strip())
-            if psLines == None:
+            if psOut == None:
                 logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Unable to get list of processes!')
                 return None
-            for psLine in psLines:
-                if(re.search('TIME COMMAND', psLine)):
+            for psLine in dbconnect_utils.iterCommandOutput(psOut):
+                if(dbconnect_utils.PATTERNS['psAixHeader'].search(psLine)):
                     continue
                 ## Reg for processes with args
-                res = re.search('(\w+)\s+?(\d+).*:\d\d\s([0-9a-zA-Z_.\[\]\-+:/]+)\s(.*)', psLine)
+                res = dbconnect_utils.PATTERNS['psAixWithArgs'].search(psLine)
                 if(res):
                     cleanArgs = res.group(4)
                 else:
                 ## Reg for processes with no args
-                    res = re.search('(\w+)\s+?(\d+).*:\d\d\s([0-9a-zA-Z_.\[\]\-+:/]+)', psLine)
+                    res = dbconnect_utils.PATTERNS['psAix'].search(psLine)
                     if(res):
                         cleanArgs = ''
                 if(res):
@@ -467,13 +731,13 @@ def getProcToPortDictOnAIX(localClient, USE_SUDO, USE_LSOF):
                     if commandPath.find('/') == -1:
                         cleanCommand = commandPath
                     else:
-                        res2 = re.search('(.*/)([^/]+)', commandPath)
+                        res2 = dbconnect_utils.PATTERNS['unixPathAndName'].search(commandPath)
                         if (res2):
                             cleanCommand = res2.group(2)
                         else:
                             continue
                     commandLine = cleanCommand + ' ' + cleanArgs
-                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>' % (pid, cleanCommand, commandPath, userName, commandLine))
+                    dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Got PROCESS <%s:%s> with path <%s>, owner <%s>, and command line <%s>', pid, cleanCommand, commandPath, userName, commandLine)
                     if dbconnect_utils.populateProcToPortDict(procToPortDict, pid, cleanCommand, dbconnect_utils.UNKNOWN, dbconnect_utils.UNKNOWN, commandPath, dbconnect_utils.UNKNOWN, 'Running', commandLine, userName) == 0:
                         logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnWindows] Unable to add PROCESS <%s:%s> (%s) with path <%s>, owner <%s>, and command line <%s> to the procToPort dictionary' % (pid, cleanCommand, 'Running', commandPath, userName, commandLine))
         except:
@@ -485,71 +749,13 @@ def getProcToPortDictOnAIX(localClient, USE_SUDO, USE_LSOF):
             ## Use LSOF to map each process to a port and create a dictionary
             ############################################
             try:
-                keydeletion = [] # keys to delete - Daniel La
-                pidToPortMap = {} ## We need a local pid to port map
                 # lsofCmd = 'lsof -n -P -i | grep -i listen 2>/dev/null'
                 lsofCmd = '/usr/local/bin/lsof -n -P -i | grep -i listen 2>/dev/null' # Daniel La need to specify full path to lsof. 22/11/10
                 if USE_SUDO == 'true':
                     lsofCmd = 'sudo ' + lsofCmd
                 lsofStr = localClient.executeCmd(lsofCmd)
-                lsofLines = dbconnect_utils.splitCommandOutput(lsofStr.strip())
-                if lsofLines != None:
-                    for lsofLine in lsofLines:
-                        if len(lsofLine) <1:
-                            continue
-                        lsofLine = lsofLine.strip()
-                        m = re.search('\w+\s+(\d+)\s+\w+\s+\w+\s+IPv[4|6].+TCP\s+(\S+):(\d+)\s+\(\w+\)', lsofLine)
-                        if (m):
-                            pid = m.group(1).strip()
-                            ipAddress = m.group(2).strip()
-                            ## Set the IP address to that of the destination if it is "*", "::", or "0.0.0.0"
-                            ipAddress = dbconnect_utils.fixIP(ipAddress, localClient.getIpAddress())
-                            serverPort = m.group(3).strip()
-                            # pidToPortMap[pid] = [ipAddress, serverPort]
-                            # below lines were added - Daniel La
-                            logger.debug('serverport is: ', serverPort, ',pid is: ', pid, ',ip is: ', ipAddress)
-                            pidnport = str(pid) + '.' + str(serverPort)
-                            pidToPortMap[pidnport] = [ipAddress, serverPort]
-                            # end of add.
-                    if pidToPortMap != None and len(pidToPortMap) > 0:
-                        for pid in pidToPortMap.keys():
-                            logger.debug('before pid is: ', pid)
-                            m = re.search('(\w+)\.\w+', pid)
-                            pidsplit = m.group(1).strip()
-                            logger.debug('after found pid is: ', pidsplit)
-                            # if pid in procToPortDict.keys():
-                            if pidsplit in procToPortDict.keys():
-                                ipAddress = (pidToPortMap[pid])[0]
-                                ## Skip loopback IPs
-                                if re.search('127.0.0', ipAddress):
-                                    continue
-                                serverPort = (pidToPortMap[pid])[1]
-                                #dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Found port <%s:%s> for pid <%s>' % (ipAddress, serverPort, pid))
-                                #(procToPortDict[pid])[dbconnect_utils.IP_INDEX] = ipAddress
-                                #(procToPortDict[pid])[dbconnect_utils.PORT_INDEX] = serverPort
-                                dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Found port <%s:%s> for pid <%s>' % (ipAddress, serverPort, pidsplit))
-                                (procToPortDict[pidsplit])[dbconnect_utils.IP_INDEX] = ipAddress
-                                (procToPortDict[pidsplit])[dbconnect_utils.PORT_INDEX] = serverPort
-
-                                # create new key and add new entry - Daniel La
-                                logger.debug('creating new entry for: ', (procToPortDict[pidsplit])[dbconnect_utils.PROCESSNAME_INDEX], ' pid: ', pidsplit, ' port: ', serverPort)
-                                pidnport = str(pidsplit) + '.' + str(serverPort)
-                                if dbconnect_utils.populateProcToPortDict(procToPortDict, pidnport, (procToPortDict[pidsplit])[dbconnect_utils.PROCESSNAME_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.PORT_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.IP_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.PATH_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.VERSION_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.STATUS_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.COMMANDLINE_INDEX], (procToPortDict[pidsplit])[dbconnect_utils.USER_INDEX]) == 0:
-                                    logger.debug('Unable to add ', (procToPortDict[pidsplit])[dbconnect_utils.PROCESSNAME_INDEX])
-                                else:
-                                    # add key to list of keys to delete later as we've updated them with new entries.
-                                    keydeletion.append(pidsplit)
-                    else:
-                        dbconnect_utils.debugPrint(3, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] No TCP port associated with PID [' + pID + ']: ' + lsofLine)
-                else:
+                if addLsofListeners(localClient, procToPortDict, lsofStr) < 1:
                     dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Unable to make a process to port map using LSOF: ' + lsofStr)
-
-                # delete keys which are of no value anymore - Daniel La
-                for key in keydeletion:
-                    logger.debug('key is: ', key)
-                    if procToPortDict.has_key(key):
-                        logger.debug('deleted key: ', key, ' process: ', (procToPortDict[key])[dbconnect_utils.PROCESSNAME_INDEX])
-                        del procToPortDict[key]
             except:
                 excInfo = logger.prepareJythonStackTrace('')
                 logger.debug('[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Unable to make a process to port map using LSOF: <%s>' % excInfo)
@@ -557,36 +763,37 @@ def getProcToPortDictOnAIX(localClient, USE_SUDO, USE_LSOF):
         else:
             ## Try using netstat and KDB
             try:
-                pidToPortMap = {} ## We need a local pid to port map
                 netstatLisCmd = 'netstat -Aanf inet | grep "LISTEN"'
                 if USE_SUDO == 'true':
                     netstatLisCmd = 'sudo ' + netstatLisCmd
                 netstatLisStr = localClient.executeCmd(netstatLisCmd)
-                nsLisLines = dbconnect_utils.splitCommandOutput(netstatLisStr.strip())
-                if nsLisLines != None:
-                    for nsLine in nsLisLines:
-                        nsLine = nsLine.strip()
+                if netstatLisStr != None:
+                    ## Collect all LISTEN sockets first so their owners can be
+                    ## resolved with as few kdb sessions as possible
+                    listenSockets = []
+                    for nsLine in dbconnect_utils.iterCommandOutput(netstatLisStr):
                 #        m = re.search('(\w+)\s+tcp\d?\s+\d+\s+\d+\s+(\*|\d+.\d+.\d+.\d+).(\d+)\s+(\*|\d+.\d+.\d+.\d+).(\*|\d+)\s+\S+', nsLine)
-                        m = re.search('(\w+)\s+tcp\d?\s+\d+\s+\d+\s+(\*|\d+.\d+.\d+.\d+).(\d+)\s+(\*|\d+.\d+.\d+.\d+).(\*|\d+).*', nsLine)
+                        m = dbconnect_utils.PATTERNS['netstatAixListen'].search(nsLine)
                         if (m):
                             ipAddress = m.group(2).strip()
                             ## Set the IP address to that of the destination if it is "*", "::", or "0.0.0.0"
                             ipAddress = dbconnect_utils.fixIP(ipAddress, localClient.getIpAddress())
                             serverPort = m.group(3).strip()
-                            pid = getAIXpIDfromAddress(localClient, m.group(1).strip(), USE_SUDO)
-                            if pid != None:
-                                pidToPortMap[pid] = [ipAddress, serverPort]
-                    if pidToPortMap != None and len(pidToPortMap) > 0:
-                        for pid in pidToPortMap.keys():
-                            if pid in procToPortDict.keys():
-                                ipAddress = (pidToPortMap[pid])[0]
-                                ## Skip loopback IPs
-                                if re.search('127.0.0', ipAddress):
-                                    continue
-                                serverPort = (pidToPortMap[pid])[1]
-                                dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Found port <%s:%s> for pid <%s>' % (ipAddress, serverPort, pid))
-                                (procToPortDict[pid])[dbconnect_utils.IP_INDEX] = ipAddress
-                                (procToPortDict[pid])[dbconnect_utils.PORT_INDEX] = serverPort
+                            ## Skip loopback IPs
+                            if dbconnect_utils.PATTERNS['loopbackIp'].search(ipAddress):
+                                continue
+                            listenSockets.append((m.group(1).strip(), ipAddress, serverPort))
+                    socketAddresses = []
+                    for (socketAddress, ipAddress, serverPort) in listenSockets:
+                        socketAddresses.append(socketAddress)
+                    addressToPid = getAIXpIDsfromAddresses(localClient, socketAddresses, USE_SUDO)
+                    for (socketAddress, ipAddress, serverPort) in listenSockets:
+                        if not addressToPid.has_key(socketAddress):
+                            continue
+                        pid = addressToPid[socketAddress]
+                        if procToPortDict.hasPid(pid):
+                            dbconnect_utils.debugPrint(4, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Found port <%s:%s> for pid <%s>', ipAddress, serverPort, pid)
+                            procToPortDict.addPort(pid, ipAddress, serverPort)
                 else:
                     dbconnect_utils.debugPrint(2, '[' + SCRIPT_NAME + ':getProcToPortDictOnAIX] Unable to make a process to port map using netstat and kdb: <%s>' % netstatLisStr)
             except:
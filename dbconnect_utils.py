@@ -8,7 +8,10 @@
 
 ## Jython imports
 import re
+import os
+import md5
 import string
+import time
 
 ## Local helper scripts on probe
 import logger
@@ -16,6 +19,12 @@ import modeling
 import netutils
 import shellutils
 
+## Java imports
+from java.util.concurrent import Callable
+from java.util.concurrent import Executors
+from java.util.concurrent import TimeUnit
+from java.util.concurrent.locks import ReentrantLock
+
 ## Universal Discovery imports
 from appilog.common.system.types.vectors import ObjectStateHolderVector
 from appilog.common.system.types import ObjectStateHolder
@@ -25,8 +34,10 @@ from com.hp.ucmdb.discovery.library.common import CollectorsParameters
 ## Globals
 ##############################################
 SCRIPT_NAME="dbconnect_utils.py"
-DEBUGLEVEL = 3 ## Set between 0 and 3 (Default should be 0), higher numbers imply more log messages
-UNKNOWN = '(unknown)'
+DEBUGLEVEL = 1 ## Set between 0 and 5, higher numbers imply more log messages. 1 logs exceptions only, 0 nothing. Overridden by the debugLevel job parameter through setDebugLevel
+DEBUG_TO_STDOUT = 0 ## Also print log messages to stdout (for running outside the probe only). Overridden by the debugToStdout job parameter
+UNKNOWN = intern('(unknown)')
+INTERN_MAX_LENGTH = 64 ## Longest process record value worth interning (user names, ports, IPs, status)
 # Process and port dictionary indices
 PROCESSNAME_INDEX = 0
 PORT_INDEX = 1
@@ -44,6 +55,91 @@ DBTYPE_INDEX = 0
 #VERSION_INDEX = 4
 #STATUS_INDEX = 5
 INSTANCE_INDEX = 6 # Daniel La for DB2.
+# Command cache
+COMMAND_CACHE_TTL = 3600 ## Seconds before cached command output is considered stale
+CACHEABLE_COMMANDS = ['hostname', 'cat /etc/passwd', 'cat /etc/services', 'type %WINDIR%\\system32\\drivers\\etc\\services'] ## Idempotent commands safe to cache for the length of a job
+COMMAND_CACHE = {} ## {host IP:{command:(time cached, output)}}
+COMMAND_CACHE_STATS = {'hits':0, 'misses':0}
+COMMAND_CACHE_LOCK = ReentrantLock() ## Guards COMMAND_CACHE_STATS, finders may run in parallel
+FILE_INDEXES = {} ## {(host IP, file):(cached file content, parsed index)}
+# Registry
+REG_SNAPSHOT_ROOTS = ['SOFTWARE\\Microsoft\\Microsoft SQL Server', 'SOFTWARE\\Microsoft\\MSSQLServer'] ## Hives read in one go by getRegSnapshotValues
+REG_SNAPSHOTS = {} ## {(host IP, client type, lower case root key):(time dumped, RegistrySnapshot)}
+REG_SNAPSHOT_TTL = 3600 ## Seconds before a registry snapshot is dumped again
+REG_QUERY_COMMANDS = {} ## {host IP:(query command, query options) that worked last}
+REG_QUERY_64 = ('reg query', ' /s /reg:64') ## Registry query command for the 64 bit view
+# Database OSH templates
+## {lower case database type:(CI type, [(attribute, value)], [(attribute, database dictionary index)])}
+DB_OSH_TEMPLATES = {'microsoftsqlserver':('sqlserver', [('data_name', 'MSSQL DB'), ('vendor', 'microsoft_corp'), ('product_name', 'sql_server_database')], []),
+                    'oracle':('oracle', [('data_name', 'Oracle DB'), ('vendor', 'oracle_corp'), ('product_name', 'oracle_database')], []),
+                    ## data_name should be IBM DB2, otherwise end up with duplicate CIs - Daniel La
+                    'db2':('db2', [('data_name', 'IBM DB2'), ('vendor', 'ibm_corp'), ('product_name', 'db2_database')], [('instance_name', INSTANCE_INDEX)])}
+# Database snapshots
+SNAPSHOT_DIR = None ## Folder for per host snapshots, defaults to dbconnect_snapshots in the probe temp folder
+SNAPSHOT_MAX_AGE = 7*24*3600 ## Seconds before a snapshot is ignored and removed
+SNAPSHOT_MAX_FILES = 5000 ## Most recently written snapshots to keep
+SNAPSHOT_FORMAT = 'v2' ## Written before the fingerprint, snapshots in another format are ignored
+SNAPSHOT_NONE = '\\N' ## Written for None values, e.g. a port missing from the registry
+
+##############################################
+## Precompiled regular expressions
+## Shell output parsers run these once per line, so
+## they are compiled once here and looked up by name:
+##   dbconnect_utils.PATTERNS['netstatLinuxListen'].search(nsLine)
+## Edit a pattern here and every parser picks it up
+##############################################
+PATTERNS = {}
+
+def registerPattern(patternName, patternString, patternFlags=0):
+    PATTERNS[patternName] = re.compile(patternString, patternFlags)
+    return PATTERNS[patternName]
+
+## Generic
+registerPattern('allDigits', '^\d+$')
+registerPattern('loopbackIp', '127.0.0')
+registerPattern('unixPathAndName', '(.*/)([^/]+)')
+registerPattern('windowsExeName', r'.*[\\|/](\w+\.exe)')
+registerPattern('servicesEntry', '^\s*(\S+)\s+(\d+).*$')
+registerPattern('regQueryValue', '^\s*(.*?)\s+(REG_[A-Z_]+)\s*(.*)$')
+registerPattern('commandError', 'Permission denied|No such file or directory|not found|is not recognized as an internal or external command|Access is denied|The system cannot find', re.I)
+## ps
+registerPattern('psHpuxWithArgs', '(\w+)\s+?(\d+).*\s\d+\:\d\d\s([0-9a-zA-Z_.\[\]\-+:/]+)\s(.*)')
+registerPattern('psHpux', '(\w+)\s+?(\d+).*\s\d+\:\d\d\s([0-9a-zA-Z_.\-+:/]+)')
+registerPattern('psAixHeader', 'TIME COMMAND')
+registerPattern('psAixWithArgs', '(\w+)\s+?(\d+).*:\d\d\s([0-9a-zA-Z_.\[\]\-+:/]+)\s(.*)')
+registerPattern('psAix', '(\w+)\s+?(\d+).*:\d\d\s([0-9a-zA-Z_.\[\]\-+:/]+)')
+## netstat, lsof, pfiles and kdb
+registerPattern('netstatLinuxListen', 'tcp.* (\S+):(\d+).*:.*\s+(\d+|-).*')
+registerPattern('netstatAixListen', '(\w+)\s+tcp\d?\s+\d+\s+\d+\s+(\*|\d+.\d+.\d+.\d+).(\d+)\s+(\*|\d+.\d+.\d+.\d+).(\*|\d+).*')
+registerPattern('netstatWinListen', '^\s*TCP\S*\s+\[?([0-9A-Fa-f.:]+)(?:%\d+)?\]?:(\d+)\s+\S+\s+\S+\s+(\d+)') ## TCP and TCPv6 ([address%zone]:port)
+registerPattern('lsofListen', '\w+\s+(\d+)\s+\w+\s+\w+\s+IPv[4|6].+TCP\s+(\S+):(\d+)\s+\(\w+\)')
+registerPattern('pfilesInet', '.+AF_INET\s+(\d+\.\d+\.\d+\.\d+)\s+port:\s*(\d+)')
+registerPattern('pfilesInet6Marker', 'AF_INET6')
+registerPattern('pfilesInet6', '.+AF_INET6.*:(\d+\.\d+\.\d+\.\d+)\s+port:\s*(\d+)')
+registerPattern('kdbActiveLine', 'ACTIVE')
+registerPattern('kdbActivePid', '.*ACTIVE\s+(\w+)\s+.*')
+registerPattern('kdbSockinfoEcho', 'sockinfo\s+(\w+)\s+tcpcb')
+## Oracle process names
+registerPattern('oracleListenerProcess', 'tnslsnr|tnslistener')
+registerPattern('oracleIgnoredProcess', 'dbconsole|jobscheduler|oradb10g|oracleora9ias_|oracle-oracleas_|oradb11g|mtsrecovery|remexec')
+registerPattern('oracleServiceProcess', 'oracleservice')
+registerPattern('oracleServiceSid', 'oracleservice(\w+)')
+registerPattern('oraclePmonProcess', 'ora_pmon')
+registerPattern('oraclePmonSid', 'ora_pmon_(\w+)')
+registerPattern('oracleRelatedProcess', 'tns|dbconsole|jobscheduler|oradb|oracle|ora_')
+registerPattern('tnsProcess', 'tns')
+registerPattern('tnslsnrBinPath', '/bin/tnslsnr')
+registerPattern('lsnrctlTcpEndpoint', '\(PROTOCOL=tcp\)\(HOST=([^)]+)\)\(PORT=(\d+)\)', re.I)
+registerPattern('lsnrctlInstance', 'Instance "([^"]+)", status')
+## DB2 process names and CLP output
+registerPattern('db2Process', 'db2')
+registerPattern('db2DbAlias', 'Database alias\s+=\s*(\S+)')
+registerPattern('db2DbName', 'Database name\s+=\s*(\S+)')
+registerPattern('db2IndirectEntry', 'Directory entry type\s+=\s*Indirect')
+registerPattern('db2Svcename', 'TCP/IP [Ss]ervice [Nn]ame\s+\(([^)]+)\)\s*=\s*(\S+)')
+registerPattern('db2SvcenameLabel', 'TCP/IP [Ss]ervice')
+registerPattern('db2SvcenameWrapped', '[Nn]ame\s+\(([^)]+)\)\s*=\s*(\S+)')
+registerPattern('db2BatchMarker', '^DB2(DBM|DIR|NAME):(\d+)(?::(.*))?$')
 
 ##############################################
 ##############################################
@@ -77,28 +173,28 @@ def populateProcToPortDict(procToPortDict, pid, procName, listenPort, ipAddress,
             procCmdline = UNKNOWN
         if userName == None or userName == '' or len(userName) <1:
             userName = UNKNOWN
+        procName = procName.strip()
+        listenPort = listenPort.strip()
+        ipAddress = ipAddress.strip()
+        procPath = procPath.strip()
+        procVersion = procVersion.strip()
+        procStatus = procStatus.strip()
+        procCmdline = procCmdline.strip()
+        userName = userName.strip()
 
-        if procToPortDict == None or pid not in procToPortDict.keys():
-            procToPortDict[pid] = [procName, listenPort, ipAddress, procPath, procVersion, procStatus, procCmdline, userName]
+        ## Process to port indexes take care of merging and multiple ports themselves
+        if isinstance(procToPortDict, ProcPortIndex):
+            return procToPortDict.addProcess(pid, procName, listenPort, ipAddress, procPath, procVersion, procStatus, procCmdline, userName)
+
+        if procToPortDict == None or not procToPortDict.has_key(pid):
+            procToPortDict[pid] = ProcRecord(procName, listenPort, ipAddress, procPath, procVersion, procStatus, procCmdline, userName)
             returnFlag = 1
         else:
-            if listenPort and pid in procToPortDict.keys() and (procToPortDict[pid])[PORT_INDEX] != UNKNOWN and (procToPortDict[pid])[PORT_INDEX] != listenPort.strip():
-                pid = pid + '.' + listenPort.strip()
-            (procToPortDict[pid])[PROCESSNAME_INDEX] = procName.strip()
-            if (procToPortDict[pid])[PORT_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[PORT_INDEX] = listenPort.strip()
-            if (procToPortDict[pid])[IP_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[IP_INDEX] = ipAddress.strip()
-            if (procToPortDict[pid])[PATH_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[PATH_INDEX] = procPath.strip()
-            if (procToPortDict[pid])[VERSION_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[VERSION_INDEX] = procPath.strip()
-            if (procToPortDict[pid])[STATUS_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[STATUS_INDEX] = procStatus.strip()
-            if (procToPortDict[pid])[COMMANDLINE_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[COMMANDLINE_INDEX] = procCmdline.strip()
-            if (procToPortDict[pid])[USER_INDEX] == UNKNOWN:
-                (procToPortDict[pid])[USER_INDEX] = userName.strip()
+            if listenPort != UNKNOWN and (procToPortDict[pid])[PORT_INDEX] != UNKNOWN and (procToPortDict[pid])[PORT_INDEX] != listenPort:
+                pid = pid + '.' + listenPort
+                if not procToPortDict.has_key(pid):
+                    procToPortDict[pid] = ProcRecord()
+            (procToPortDict[pid]).merge(procName, listenPort, ipAddress, procPath, procVersion, procStatus, procCmdline, userName)
             returnFlag = 1
         return returnFlag
     except:
@@ -107,21 +203,198 @@ def populateProcToPortDict(procToPortDict, pid, procName, listenPort, ipAddress,
         pass
 
 
+##############################################
+## Process record
+## One procToPortDict entry. Fields live in slots rather than
+## an 8 element list, and can still be read and written with
+## the PROCESSNAME_INDEX..USER_INDEX constants
+##############################################
+class ProcRecord(object):
+    __slots__ = ('processName', 'port', 'ip', 'path', 'version', 'status', 'commandLine', 'user')
+
+    def __init__(self, processName=UNKNOWN, port=UNKNOWN, ip=UNKNOWN, path=UNKNOWN, version=UNKNOWN, status=UNKNOWN, commandLine=UNKNOWN, user=UNKNOWN):
+        self.processName = processName
+        self.port = internValue(port)
+        self.ip = internValue(ip)
+        self.path = path
+        self.version = internValue(version)
+        self.status = internValue(status)
+        self.commandLine = commandLine
+        self.user = internValue(user)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [getattr(self, fieldName) for fieldName in ProcRecord.__slots__[index]]
+        return getattr(self, ProcRecord.__slots__[index])
+
+    def __setitem__(self, index, value):
+        setattr(self, ProcRecord.__slots__[index], value)
+
+    def __len__(self):
+        return len(ProcRecord.__slots__)
+
+    def __iter__(self):
+        for fieldName in ProcRecord.__slots__:
+            yield getattr(self, fieldName)
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return 0
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def copy(self):
+        return ProcRecord(*list(self))
+
+    def merge(self, processName, port, ip, path, version, status, commandLine, user):
+        '''Fill in fields that are still unknown. The process name is always replaced'''
+        self.processName = processName
+        if self.port == UNKNOWN:
+            self.port = internValue(port)
+        if self.ip == UNKNOWN:
+            self.ip = internValue(ip)
+        if self.path == UNKNOWN:
+            self.path = path
+        if self.version == UNKNOWN:
+            self.version = internValue(version)
+        if self.status == UNKNOWN:
+            self.status = internValue(status)
+        if self.commandLine == UNKNOWN:
+            self.commandLine = commandLine
+        if self.user == UNKNOWN:
+            self.user = internValue(user)
+
+
+##############################################
+## Intern short values that repeat across process records
+## (user names, ports, IPs, status) so records share one copy
+##############################################
+def internValue(value):
+    if value == UNKNOWN:
+        return UNKNOWN
+    if type(value) == type('') and len(value) <= INTERN_MAX_LENGTH:
+        return intern(value)
+    return value
+
+
+##############################################
+## Process to port index
+## Keeps the {key:ProcRecord(processName, port, ip, path, version, status, cmdline, user)}
+## layout the finders and the Windows mapper share, and adds O(1) lookups
+## by pid. A pid listening on several ports gets one entry per port, because
+## the finders read one port per entry: the first port is stored on the pid
+## entry and every further port gets a <pid>.<port> entry with a copy of the
+## process details. Ports are attached as they are parsed, so no entries
+## have to be deleted afterwards.
+##############################################
+class ProcPortIndex(dict):
+    def __init__(self):
+        dict.__init__(self)
+        self.__pidToKeys = {}   ## pid -> [entry keys], pid entry first
+
+    def addProcess(self, pid, procName, listenPort, ipAddress, procPath, procVersion, procStatus, procCmdline, userName):
+        '''Add a process or merge it into a known one. Returns 1 on success'''
+        if not self.__pidToKeys.has_key(pid):
+            dict.__setitem__(self, pid, ProcRecord(procName, UNKNOWN, UNKNOWN, procPath, procVersion, procStatus, procCmdline, userName))
+            self.__pidToKeys[pid] = [pid]
+        else:
+            ## Keep the <pid>.<port> copies in step with the pid entry
+            for entryKey in self.__pidToKeys[pid]:
+                dict.__getitem__(self, entryKey).merge(procName, UNKNOWN, UNKNOWN, procPath, procVersion, procStatus, procCmdline, userName)
+        if listenPort != UNKNOWN:
+            self.addPort(pid, ipAddress, listenPort)
+        elif ipAddress != UNKNOWN and dict.__getitem__(self, pid)[IP_INDEX] == UNKNOWN:
+            dict.__getitem__(self, pid)[IP_INDEX] = ipAddress
+        return 1
+
+    def addPort(self, pid, ipAddress, listenPort):
+        '''Attach a listening port to a known pid. Returns 0 if the pid is unknown'''
+        entryKeys = self.__pidToKeys.get(pid)
+        if entryKeys == None:
+            return 0
+        for entryKey in entryKeys:
+            if dict.__getitem__(self, entryKey)[PORT_INDEX] == listenPort:
+                return 1
+        record = dict.__getitem__(self, pid)
+        if record[PORT_INDEX] == UNKNOWN:
+            entryKey = pid
+        else:
+            entryKey = pid + '.' + listenPort
+            record = record.copy()
+            dict.__setitem__(self, entryKey, record)
+            entryKeys.append(entryKey)
+        record.port = internValue(listenPort)
+        record.ip = internValue(ipAddress)
+        return 1
+
+    def hasPid(self, pid):
+        return self.__pidToKeys.has_key(pid)
+
+    def getPids(self):
+        return self.__pidToKeys.keys()
+
+
+##############################################
+## Set logging options from job parameters
+## Call once from the job entry point with its Framework
+##############################################
+def setDebugLevel(Framework):
+    global DEBUGLEVEL
+    global DEBUG_TO_STDOUT
+    try:
+        debugLevel = Framework.getParameter('debugLevel')
+        if debugLevel != None and debugLevel.strip().isdigit():
+            DEBUGLEVEL = int(debugLevel.strip())
+        debugToStdout = Framework.getParameter('debugToStdout')
+        if debugToStdout != None:
+            DEBUG_TO_STDOUT = debugToStdout.strip().lower() in ['true', 'yes', 'y', '1']
+        logger.debug('[' + SCRIPT_NAME + ':setDebugLevel] Debug level is <%s>, printing to stdout is <%s>' % (DEBUGLEVEL, DEBUG_TO_STDOUT))
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        logger.warn('[' + SCRIPT_NAME + ':setDebugLevel] Exception: <%s>' % excInfo)
+        pass
+
+
+##############################################
+## Check if messages at a log level will be logged
+## Use this to skip building expensive messages
+##############################################
+def isDebugEnabled(logLevel):
+    return DEBUGLEVEL >= logLevel
+
+
 ##############################################
 ## Logging helper
+## Usage: debugPrint(level, message) or
+##        debugPrint(level, formatString, arg1, arg2...)
+## With the second form the message is only formatted
+## if it will actually be logged
 ##############################################
 def debugPrint(*debugStrings):
     logLevel = 1
-    logMessage = '[DBConnect Logger] '
     if type(debugStrings[0]) == type(DEBUGLEVEL):
         logLevel = debugStrings[0]
-        for index in range(1, len(debugStrings)):
-            logMessage = logMessage + str(debugStrings[index])
+        if DEBUGLEVEL < logLevel:
+            return
+        if len(debugStrings) > 2:
+            try:
+                logMessage = '[DBConnect Logger] ' + (debugStrings[1] % debugStrings[2:])
+            except TypeError:
+                logMessage = '[DBConnect Logger] ' + ''.join(map(str, debugStrings[1:]))
+        else:
+            logMessage = '[DBConnect Logger] ' + ''.join(map(str, debugStrings[1:]))
     else:
-        logMessage = logMessage + ''.join(map(str, debugStrings))
-    if DEBUGLEVEL >= logLevel:
-        logger.debug(logMessage)
-    if DEBUGLEVEL > logLevel:
+        if DEBUGLEVEL < logLevel:
+            return
+        logMessage = '[DBConnect Logger] ' + ''.join(map(str, debugStrings))
+    logger.debug(logMessage)
+    if DEBUG_TO_STDOUT and DEBUGLEVEL > logLevel:
         print logMessage
 
 
@@ -130,16 +403,16 @@ def debugPrint(*debugStrings):
 ##############################################
 def isValidString(theString):
     try:
-        debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] Got string <%s>' % theString)
+        debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] Got string <%s>', theString)
         if theString == None or theString == '' or len(theString) < 1:
-            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is NOT valid!' % theString)
+            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is NOT valid!', theString)
             return 0
         elif re.search('Syntax error detected', theString):
             return 0
         elif theString == UNKNOWN:
             return 0
         else:
-            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is valid!' % theString)
+            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is valid!', theString)
             return 1
     except:
         excInfo = logger.prepareJythonStackTrace('')
@@ -152,7 +425,7 @@ def isValidString(theString):
 ##############################################
 def fixIP(ip, localIp):
     try:
-        debugPrint(4, '[' + SCRIPT_NAME + ':fixIP] Got IP <%s>' % ip)
+        debugPrint(4, '[' + SCRIPT_NAME + ':fixIP] Got IP <%s>', ip)
         if ip == None or ip == '' or len(ip) < 1 or ip.startswith('127.') or ip == '0.0.0.0' or ip == '*' or re.search('::', ip):
             return localIp
         elif not netutils.isValidIp(ip):
@@ -189,24 +462,217 @@ def getAttributeValuesFromOSH(theOSH, attributeNames):
 ##############################################
 def splitCommandOutput(commandOutput):
     try:
-        returnArray = []
         if commandOutput == None:
-            returnArray = None
-        elif (re.search('\r\n', commandOutput)):
-            returnArray = commandOutput.split('\r\n')
-        elif (re.search('\n', commandOutput)):
-            returnArray = commandOutput.split('\n')
-        elif (re.search('\r', commandOutput)):
-            returnArray = commandOutput.split('\r')
-        else:
-            returnArray = [commandOutput]
-        return returnArray
+            return None
+        return list(iterCommandOutput(commandOutput, 0))
     except:
         excInfo = logger.prepareJythonStackTrace('')
         debugPrint('[' + SCRIPT_NAME + ':splitCommandOutput] Exception: <%s>' % excInfo)
         pass
 
 
+##############################################
+## Iterate over lines of command output without
+## building a list of all lines first
+## Handles LF, CRLF, CR and CRCRLF line endings, even
+## mixed in the same output. Empty trailing lines are
+## skipped and lines are stripped unless stripLines is 0
+##############################################
+def iterCommandOutput(commandOutput, stripLines=1):
+    if commandOutput == None:
+        return
+    outputLength = len(commandOutput)
+    lineStart = 0
+    nextLf = -2
+    nextCr = -2
+    while lineStart < outputLength:
+        ## Only look for the next line ending when we've gone past the
+        ## last one found, and stop looking once there are no more
+        if nextLf != -1 and nextLf < lineStart:
+            nextLf = commandOutput.find('\n', lineStart)
+        if nextCr != -1 and nextCr < lineStart:
+            nextCr = commandOutput.find('\r', lineStart)
+        if nextLf == -1 and nextCr == -1:
+            lineEnd = outputLength
+            nextStart = outputLength
+        elif nextCr == -1 or (nextLf != -1 and nextLf < nextCr):
+            lineEnd = nextLf
+            nextStart = nextLf + 1
+        else:
+            lineEnd = nextCr
+            nextStart = nextCr + 1
+            while nextStart < outputLength and commandOutput[nextStart] == '\r':
+                nextStart = nextStart + 1
+            if nextStart < outputLength and commandOutput[nextStart] == '\n':
+                nextStart = nextStart + 1
+            else:
+                nextStart = nextCr + 1
+        if stripLines:
+            yield commandOutput[lineStart:lineEnd].strip()
+        else:
+            yield commandOutput[lineStart:lineEnd]
+        lineStart = nextStart
+
+
+##############################################
+## Per-job cache for output of idempotent commands
+## Only commands in CACHEABLE_COMMANDS are cached, and
+## only for COMMAND_CACHE_TTL seconds. Everything else
+## goes straight to the client. Failed commands aren't
+## cached
+##############################################
+def executeCachedCmd(localClient, theCommand):
+    try:
+        if theCommand not in CACHEABLE_COMMANDS:
+            return localClient.executeCmd(theCommand)
+        hostIp = localClient.getIpAddress()
+        if not COMMAND_CACHE.has_key(hostIp):
+            COMMAND_CACHE[hostIp] = {}
+        hostCache = COMMAND_CACHE[hostIp]
+        if hostCache.has_key(theCommand):
+            (cachedAt, commandOutput) = hostCache[theCommand]
+            if time.time() - cachedAt < COMMAND_CACHE_TTL:
+                countCommandCache('hits')
+                debugPrint(5, '[' + SCRIPT_NAME + ':executeCachedCmd] Cache hit for command <%s> on <%s>', theCommand, hostIp)
+                return commandOutput
+        countCommandCache('misses')
+        commandOutput = localClient.executeCmd(theCommand)
+        ## Don't cache failures so the next caller can try again
+        if isCommandSuccessful(localClient, commandOutput):
+            hostCache[theCommand] = (time.time(), commandOutput)
+        else:
+            debugPrint(3, '[' + SCRIPT_NAME + ':executeCachedCmd] Not caching failed command <%s> on <%s>', theCommand, hostIp)
+        return commandOutput
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':executeCachedCmd] Exception: <%s>' % excInfo)
+        pass
+
+
+##############################################
+## Check if the last command on a client worked
+## Uses the return code when the client has one and
+## looks for an error on the first line of output if not
+##############################################
+def isCommandSuccessful(localClient, commandOutput):
+    if commandOutput == None:
+        return 0
+    try:
+        return localClient.getLastCmdReturnCode() == 0
+    except AttributeError:
+        pass
+    for outputLine in iterCommandOutput(commandOutput):
+        if len(outputLine) > 0:
+            return not PATTERNS['commandError'].search(outputLine)
+    return 1
+
+
+def countCommandCache(counterName):
+    COMMAND_CACHE_LOCK.lock()
+    try:
+        COMMAND_CACHE_STATS[counterName] = COMMAND_CACHE_STATS[counterName] + 1
+    finally:
+        COMMAND_CACHE_LOCK.unlock()
+
+
+##############################################
+## Log and reset command cache counters
+## Returns the counters before the reset
+##############################################
+def logCommandCacheStats():
+    COMMAND_CACHE_LOCK.lock()
+    try:
+        commandCacheStats = COMMAND_CACHE_STATS.copy()
+        for counterName in COMMAND_CACHE_STATS.keys():
+            COMMAND_CACHE_STATS[counterName] = 0
+    finally:
+        COMMAND_CACHE_LOCK.unlock()
+    debugPrint(2, '[' + SCRIPT_NAME + ':logCommandCacheStats] Command cache hits <%s>, misses <%s>', commandCacheStats['hits'], commandCacheStats['misses'])
+    return commandCacheStats
+
+
+##############################################
+## Build an index of /etc/passwd
+## Returns {user name:[password, UID, GID, GECOS, home directory, shell]}
+##############################################
+def getPasswdIndex(localClient):
+    try:
+        passwdIndex = {}
+        passwdContent = executeCachedCmd(localClient, 'cat /etc/passwd')
+        if passwdContent == None:
+            return passwdIndex
+        ## Only parse again if the cached file content changed
+        indexKey = (localClient.getIpAddress(), '/etc/passwd')
+        if FILE_INDEXES.has_key(indexKey) and FILE_INDEXES[indexKey][0] is passwdContent:
+            return FILE_INDEXES[indexKey][1]
+        for passwdLine in iterCommandOutput(passwdContent):
+            if len(passwdLine) < 1 or passwdLine[0] == '#':
+                continue
+            passwdFields = passwdLine.split(':')
+            if len(passwdFields) < 7 or passwdIndex.has_key(passwdFields[0]):
+                continue
+            passwdIndex[passwdFields[0]] = passwdFields[1:]
+        debugPrint(4, '[' + SCRIPT_NAME + ':getPasswdIndex] Got <%s> users from /etc/passwd', len(passwdIndex))
+        FILE_INDEXES[indexKey] = (passwdContent, passwdIndex)
+        return passwdIndex
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':getPasswdIndex] Exception: <%s>' % excInfo)
+        return {}
+
+
+##############################################
+## Get home directory of a user from /etc/passwd
+##############################################
+def getUserHomeDirectory(localClient, userName):
+    if not isValidString(userName):
+        return None
+    passwdIndex = getPasswdIndex(localClient)
+    if passwdIndex.has_key(userName.strip()):
+        return passwdIndex[userName.strip()][4]
+    return None
+
+
+##############################################
+## Build an index of TCP services in the services file
+## Returns {service name or alias (lower case):port}
+##############################################
+def getServicesIndex(localClient, isWindows):
+    try:
+        servicesIndex = {}
+        servicesCommand = 'cat /etc/services'
+        if isWindows == 'true':
+            servicesCommand = 'type %WINDIR%\\system32\\drivers\\etc\\services'
+        servicesContent = executeCachedCmd(localClient, servicesCommand)
+        if servicesContent == None:
+            return servicesIndex
+        ## Only parse again if the cached file content changed
+        indexKey = (localClient.getIpAddress(), servicesCommand)
+        if FILE_INDEXES.has_key(indexKey) and FILE_INDEXES[indexKey][0] is servicesContent:
+            return FILE_INDEXES[indexKey][1]
+        for servicesLine in iterCommandOutput(servicesContent):
+            commentIndex = servicesLine.find('#')
+            if commentIndex > -1:
+                servicesLine = servicesLine[:commentIndex]
+            servicesFields = servicesLine.split()
+            if len(servicesFields) < 2:
+                continue
+            portAndProtocol = servicesFields[1].split('/')
+            if len(portAndProtocol) != 2 or portAndProtocol[1].lower() != 'tcp' or not portAndProtocol[0].isdigit():
+                continue
+            ## The first entry for a name wins, like getservbyname()
+            for serviceName in [servicesFields[0]] + servicesFields[2:]:
+                if not servicesIndex.has_key(serviceName.lower()):
+                    servicesIndex[serviceName.lower()] = portAndProtocol[0]
+        debugPrint(4, '[' + SCRIPT_NAME + ':getServicesIndex] Got <%s> TCP service names from <%s>', len(servicesIndex), servicesCommand)
+        FILE_INDEXES[indexKey] = (servicesContent, servicesIndex)
+        return servicesIndex
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':getServicesIndex] Exception: <%s>' % excInfo)
+        return {}
+
+
 ##############################################
 ## Search for a file in a given location
 ##############################################
@@ -278,14 +744,278 @@ def getFileContent(localClient, theFile, isWindows):
         pass
 
 
+##############################################
+## Worker that runs one vendor's findDatabases into
+## its own partial database dictionary
+##############################################
+class DbFinderTask(Callable):
+    def __init__(self, vendorName, findFunction, localClient, procToPortDict, isWindows, wmiRegistryClient, clientFactory=None):
+        self.vendorName = vendorName
+        self.findFunction = findFunction
+        self.localClient = localClient
+        self.procToPortDict = procToPortDict
+        self.isWindows = isWindows
+        self.wmiRegistryClient = wmiRegistryClient
+        self.clientFactory = clientFactory
+        self.dbInstanceDict = {}
+        self.elapsedTime = 0
+        self.completed = 0
+
+    def call(self):
+        startTime = time.time()
+        workerClient = self.localClient
+        try:
+            try:
+                ## Shell clients can't always be shared between threads
+                if self.clientFactory != None:
+                    workerClient = self.clientFactory()
+                ## Finders catch their own exceptions and return false when they failed
+                if self.findFunction(workerClient, self.procToPortDict, self.dbInstanceDict, self.isWindows, self.wmiRegistryClient):
+                    self.completed = 1
+                else:
+                    debugPrint(2, '[' + SCRIPT_NAME + ':DbFinderTask] <%s> finder reported a failure', self.vendorName)
+            except:
+                excInfo = logger.prepareJythonStackTrace('')
+                debugPrint('[' + SCRIPT_NAME + ':DbFinderTask] Exception in <%s> finder: <%s>' % (self.vendorName, excInfo))
+        finally:
+            if self.clientFactory != None and workerClient != None and workerClient != self.localClient:
+                try:
+                    workerClient.close()
+                except:
+                    pass
+            self.elapsedTime = time.time() - startTime
+        return self.dbInstanceDict
+
+
+##############################################
+## Run per-vendor database finders at the same time
+## finders is a list of (vendor name, findDatabases) tuples.
+## Each finder fills its own partial dictionary and the
+## partials are merged in the order of the list, so the
+## result is the same as running the finders one after
+## the other. Finders only run in parallel when
+## clientFactory gives each worker its own client. A
+## shell session can't run commands from several threads
+## at once, so without it they run one after the other.
+## Finders return true when they completed. Vendors whose
+## finder failed or timed out are added to
+## incompleteFinders if a list is passed
+## Returns {vendor name:seconds taken}
+##############################################
+def findDatabasesInParallel(localClient, procToPortDict, dbInstanceDict, finders, isWindows='true', wmiRegistryClient=None, maxWorkers=3, clientFactory=None, timeout=1800, incompleteFinders=None):
+    stageTimes = {}
+    try:
+        startTime = time.time()
+        finderTasks = []
+        timedOutTasks = []
+        for (vendorName, findFunction) in finders:
+            finderTasks.append(DbFinderTask(vendorName, findFunction, localClient, procToPortDict, isWindows, wmiRegistryClient, clientFactory))
+        if maxWorkers < 2 or len(finderTasks) < 2 or clientFactory == None:
+            for finderTask in finderTasks:
+                finderTask.call()
+        else:
+            workerPool = Executors.newFixedThreadPool(min(maxWorkers, len(finderTasks)))
+            try:
+                finderFutures = []
+                for finderTask in finderTasks:
+                    finderFutures.append(workerPool.submit(finderTask))
+                for finderIndex in range(len(finderFutures)):
+                    try:
+                        ## Timeout is for the whole pipeline, not each finder
+                        timeLeft = max(1, int(timeout - (time.time() - startTime)))
+                        finderFutures[finderIndex].get(timeLeft, TimeUnit.SECONDS)
+                    except:
+                        excInfo = logger.prepareJythonStackTrace('')
+                        logger.warn('[' + SCRIPT_NAME + ':findDatabasesInParallel] <%s> finder did not complete: <%s>' % (finderTasks[finderIndex].vendorName, excInfo))
+                        finderFutures[finderIndex].cancel(1)
+                        ## Partial results of a finder that didn't complete aren't trusted
+                        finderTasks[finderIndex].dbInstanceDict = {}
+                        timedOutTasks.append(finderTasks[finderIndex])
+            finally:
+                workerPool.shutdownNow()
+        ## Merge in a fixed order
+        for finderTask in finderTasks:
+            dbInstanceDict.update(finderTask.dbInstanceDict)
+            stageTimes[finderTask.vendorName] = finderTask.elapsedTime
+            if (not finderTask.completed or finderTask in timedOutTasks) and incompleteFinders != None:
+                incompleteFinders.append(finderTask.vendorName)
+            debugPrint(2, '[' + SCRIPT_NAME + ':findDatabasesInParallel] <%s> finder found <%s> databases in <%.2f> seconds', finderTask.vendorName, len(finderTask.dbInstanceDict), finderTask.elapsedTime)
+        debugPrint(2, '[' + SCRIPT_NAME + ':findDatabasesInParallel] All finders done in <%.2f> seconds', time.time() - startTime)
+        return stageTimes
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':findDatabasesInParallel] Exception: <%s>' % excInfo)
+        return stageTimes
+
+
+##############################################
+## Fingerprint of a process to port map
+## Hash of the sorted, de-duplicated (command, user, port)
+## tuples. PIDs and short lived worker processes of the
+## same command don't change it
+##############################################
+def getProcToPortFingerprint(procToPortDict):
+    procTuples = {}
+    for procRecord in procToPortDict.values():
+        procTuples['%s\t%s\t%s' % (procRecord[PROCESSNAME_INDEX], procRecord[USER_INDEX], procRecord[PORT_INDEX])] = 1
+    procTupleList = procTuples.keys()
+    procTupleList.sort()
+    return md5.new('\n'.join(procTupleList)).hexdigest()
+
+
+##############################################
+## Folder for database snapshots on the probe
+##############################################
+def getSnapshotDir():
+    if SNAPSHOT_DIR != None:
+        return SNAPSHOT_DIR
+    return os.path.join(CollectorsParameters.PROBE_MGR_TEMP_DIR, 'dbconnect_snapshots')
+
+
+##############################################
+## Get the database dictionary saved by the last run
+## on a host. Returns None if there is no snapshot, it
+## is too old, or the process map has changed since
+##############################################
+def loadDbSnapshot(hostIp, fingerprint):
+    try:
+        snapshotFile = os.path.join(getSnapshotDir(), hostIp.replace(':', '_') + '.snapshot')
+        if not os.path.isfile(snapshotFile):
+            debugPrint(3, '[' + SCRIPT_NAME + ':loadDbSnapshot] No snapshot for <%s>' % hostIp)
+            return None
+        if time.time() - os.path.getmtime(snapshotFile) > SNAPSHOT_MAX_AGE:
+            debugPrint(3, '[' + SCRIPT_NAME + ':loadDbSnapshot] Snapshot for <%s> is too old' % hostIp)
+            return None
+        snapshotHandle = open(snapshotFile, 'r')
+        try:
+            snapshotLines = snapshotHandle.read().split('\n')
+        finally:
+            snapshotHandle.close()
+        if snapshotLines[0].strip() != SNAPSHOT_FORMAT + ' ' + fingerprint:
+            debugPrint(3, '[' + SCRIPT_NAME + ':loadDbSnapshot] Processes on <%s> changed since the last snapshot' % hostIp)
+            return None
+        dbDict = {}
+        for snapshotLine in snapshotLines[1:]:
+            snapshotFields = snapshotLine.split('\t')
+            if len(snapshotFields) > 1:
+                dbFields = []
+                for snapshotField in snapshotFields[1:]:
+                    if snapshotField == SNAPSHOT_NONE:
+                        snapshotField = None
+                    elif snapshotField == UNKNOWN:
+                        ## Same interned string as the finders use
+                        snapshotField = UNKNOWN
+                    dbFields.append(snapshotField)
+                dbDict[snapshotFields[0]] = dbFields
+        debugPrint(2, '[' + SCRIPT_NAME + ':loadDbSnapshot] Processes on <%s> unchanged, reusing <%s> databases from the last snapshot' % (hostIp, len(dbDict)))
+        return dbDict
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':loadDbSnapshot] Exception: <%s>' % excInfo)
+        return None
+
+
+##############################################
+## Save the database dictionary of a host
+## One file per host: the fingerprint on the first line
+## and one tab separated line per database
+##############################################
+def saveDbSnapshot(hostIp, fingerprint, dbDict):
+    try:
+        snapshotDir = getSnapshotDir()
+        if not os.path.isdir(snapshotDir):
+            os.makedirs(snapshotDir)
+        snapshotLines = [SNAPSHOT_FORMAT + ' ' + fingerprint]
+        for dbName in dbDict.keys():
+            snapshotFields = []
+            for snapshotField in [dbName] + list(dbDict[dbName]):
+                if snapshotField == None:
+                    snapshotFields.append(SNAPSHOT_NONE)
+                else:
+                    snapshotFields.append(str(snapshotField).replace('\t', ' ').replace('\n', ' '))
+            snapshotLines.append('\t'.join(snapshotFields))
+        snapshotFile = os.path.join(snapshotDir, hostIp.replace(':', '_') + '.snapshot')
+        snapshotHandle = open(snapshotFile + '.tmp', 'w')
+        try:
+            snapshotHandle.write('\n'.join(snapshotLines))
+        finally:
+            snapshotHandle.close()
+        if os.path.exists(snapshotFile):
+            os.remove(snapshotFile)
+        os.rename(snapshotFile + '.tmp', snapshotFile)
+        evictDbSnapshots(snapshotDir)
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':saveDbSnapshot] Exception: <%s>' % excInfo)
+
+
+##############################################
+## Remove snapshots older than SNAPSHOT_MAX_AGE and the
+## least recently written ones beyond SNAPSHOT_MAX_FILES
+##############################################
+def evictDbSnapshots(snapshotDir):
+    try:
+        snapshotFiles = []
+        for fileName in os.listdir(snapshotDir):
+            if fileName.endswith('.snapshot'):
+                snapshotFile = os.path.join(snapshotDir, fileName)
+                snapshotFiles.append((os.path.getmtime(snapshotFile), snapshotFile))
+        snapshotFiles.sort()
+        snapshotFiles.reverse()
+        for fileIndex in range(len(snapshotFiles)):
+            (fileTime, snapshotFile) = snapshotFiles[fileIndex]
+            if fileIndex >= SNAPSHOT_MAX_FILES or time.time() - fileTime > SNAPSHOT_MAX_AGE:
+                debugPrint(4, '[' + SCRIPT_NAME + ':evictDbSnapshots] Removing snapshot <%s>', snapshotFile)
+                os.remove(snapshotFile)
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':evictDbSnapshots] Exception: <%s>' % excInfo)
+
+
+##############################################
+## Run the database finders unless the process map of
+## the host matches the snapshot from the last run, in
+## which case the saved databases are used instead.
+## Pass a true forceFull to always run the finders.
+## No snapshot is saved if any finder failed
+## Returns {vendor name:seconds taken}, empty if skipped
+##############################################
+def findDatabasesIncremental(localClient, procToPortDict, dbInstanceDict, finders, isWindows='true', wmiRegistryClient=None, maxWorkers=3, clientFactory=None, timeout=1800, forceFull=None):
+    try:
+        hostIp = localClient.getIpAddress()
+        fingerprint = getProcToPortFingerprint(procToPortDict)
+        if str(forceFull).strip().lower() not in ['true', 'yes', 'y', '1']:
+            snapshotDict = loadDbSnapshot(hostIp, fingerprint)
+            if snapshotDict != None:
+                dbInstanceDict.update(snapshotDict)
+                return {}
+        incompleteFinders = []
+        stageTimes = findDatabasesInParallel(localClient, procToPortDict, dbInstanceDict, finders, isWindows, wmiRegistryClient, maxWorkers, clientFactory, timeout, incompleteFinders)
+        ## Partial results would hide databases until the process map changes
+        if len(incompleteFinders) < 1 and len(stageTimes) == len(finders):
+            saveDbSnapshot(hostIp, fingerprint, dbInstanceDict)
+        else:
+            debugPrint(2, '[' + SCRIPT_NAME + ':findDatabasesIncremental] Not saving a snapshot for <%s>, finders <%s> did not complete' % (hostIp, incompleteFinders))
+        return stageTimes
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':findDatabasesIncremental] Exception: <%s>' % excInfo)
+        return {}
+
+
 ##############################################
 ## Make database and associated OSHs
 ## Updated: Slightly updated by Daniel La to update an additional attribute for DB2
+## Host, IP and service address OSHs are made once per IP
+## (and port) no matter how many databases share them
 ##############################################
 def makeDbOSHs(dbDict, localClient=None):
     try:
         debugPrint(3, '[' + SCRIPT_NAME + ':makeDbOSHs]')
         oshVector = ObjectStateHolderVector()
+        hostOSHs = {}            ## {IP:host OSH}
+        serviceAddressKeys = {}  ## {(IP, port):1}
+        avoidedOSHs = 0
 
         for dbName in dbDict.keys():
             try:
@@ -296,38 +1026,36 @@ def makeDbOSHs(dbDict, localClient=None):
                 version = (dbDict[dbName])[VERSION_INDEX]
                 serverStatus = (dbDict[dbName])[STATUS_INDEX]
 
+                dbTemplate = DB_OSH_TEMPLATES.get(dbType.lower())
+                if dbTemplate == None:
+                    debugPrint('[' + SCRIPT_NAME + ':makeDbOSHs] Unknown database type <%s>!! Skipping...' % dbType)
+                    continue
+
                 ## Make Host, IP, and serverPort OSHs
-                hostOSH = modeling.createHostOSH(ipAddress, 'host')
-                ipOSH = modeling.createIpOSH(ipAddress)
-                oshVector.add(hostOSH)
-                oshVector.add(ipOSH)
-                oshVector.add(modeling.createLinkOSH('contained', hostOSH, ipOSH))
+                hostOSH = hostOSHs.get(ipAddress)
+                if hostOSH == None:
+                    hostOSH = modeling.createHostOSH(ipAddress, 'host')
+                    ipOSH = modeling.createIpOSH(ipAddress)
+                    oshVector.add(hostOSH)
+                    oshVector.add(ipOSH)
+                    oshVector.add(modeling.createLinkOSH('contained', hostOSH, ipOSH))
+                    hostOSHs[ipAddress] = hostOSH
+                else:
+                    avoidedOSHs = avoidedOSHs + 3
                 if serverPort != None and serverPort != UNKNOWN:
-                    oshVector.add(modeling.createServiceAddressOsh(hostOSH, ipAddress, int(serverPort), modeling.SERVICEADDRESS_TYPE_TCP, dbType))
+                    if not serviceAddressKeys.has_key((ipAddress, serverPort)):
+                        oshVector.add(modeling.createServiceAddressOsh(hostOSH, ipAddress, int(serverPort), modeling.SERVICEADDRESS_TYPE_TCP, dbType))
+                        serviceAddressKeys[(ipAddress, serverPort)] = 1
+                    else:
+                        avoidedOSHs = avoidedOSHs + 1
 
                 ## Make DB osh
-                dbServerOSH = None
-
-                if dbType.lower() == 'microsoftsqlserver':
-                    dbServerOSH = ObjectStateHolder('sqlserver')
-                    dbServerOSH.setStringAttribute('data_name', 'MSSQL DB')
-                    dbServerOSH.setStringAttribute('vendor', 'microsoft_corp')
-                    dbServerOSH.setStringAttribute('product_name', 'sql_server_database')
-                elif dbType.lower() == 'oracle':
-                    dbServerOSH = ObjectStateHolder(dbType)
-                    dbServerOSH.setStringAttribute('data_name', 'Oracle DB')
-                    dbServerOSH.setStringAttribute('vendor', 'oracle_corp')
-                    dbServerOSH.setStringAttribute('product_name', 'oracle_database')
-                elif dbType.lower() == 'db2':
-                    dbServerOSH = ObjectStateHolder(dbType)
-                    # dbServerOSH.setStringAttribute('data_name', 'DB2')
-                    dbServerOSH.setStringAttribute('data_name', 'IBM DB2') # modified by Daniel La. It should be IBM DB2, otherwise end up with duplicate CIs.
-                    dbServerOSH.setStringAttribute('vendor', 'ibm_corp')
-                    dbServerOSH.setStringAttribute('product_name', 'db2_database')
-                    dbServerOSH.setStringAttribute('instance_name', (dbDict[dbName])[INSTANCE_INDEX]) # added by Daniel La
-                else:
-                    debugPrint('[' + SCRIPT_NAME + ':makeDbOSHs] Unknown database type <%s>!! Skipping...' % dbType)
-                    continue
+                (dbClass, dbAttributes, dbIndexAttributes) = dbTemplate
+                dbServerOSH = ObjectStateHolder(dbClass)
+                for (attributeName, attributeValue) in dbAttributes:
+                    dbServerOSH.setStringAttribute(attributeName, attributeValue)
+                for (attributeName, attributeIndex) in dbIndexAttributes:
+                    dbServerOSH.setStringAttribute(attributeName, (dbDict[dbName])[attributeIndex])
 
                 if serverPort != None and serverPort != UNKNOWN:
                     dbServerOSH.setIntegerAttribute('application_port', serverPort)
@@ -353,6 +1081,7 @@ def makeDbOSHs(dbDict, localClient=None):
                 excInfo = logger.prepareJythonStackTrace('')
                 debugPrint('[' + SCRIPT_NAME + ':makeDbOSHs] Cannot make OSH for <%s>: <%s>' % (dbDict[dbName], excInfo))
                 pass
+        debugPrint(2, '[' + SCRIPT_NAME + ':makeDbOSHs] Made <%s> OSHs for <%s> databases on <%s> IPs, <%s> duplicate host/IP/service address OSHs avoided' % (oshVector.size(), len(dbDict), len(hostOSHs), avoidedOSHs))
         return oshVector
     except:
         #excInfo = str(sys.exc_info()[1])
@@ -370,7 +1099,7 @@ def getServerName(localClient):
         localClientType = localClient.getClientType()
         ## Try getting the servername from the OS
         if localClientType == 'telnet' or localClientType == 'ssh' or localClientType == 'ntadmin' or localClientType == 'uda':
-            osHostName = localClient.executeCmd('hostname')
+            osHostName = executeCachedCmd(localClient, 'hostname')
             if osHostName and len(osHostName) > 0:
                 debugPrint(3, '[' + SCRIPT_NAME + ':getServerName] Got OS hostname <%s> for SQL Server using SHELL client' % osHostName)
                 returnHostName = osHostName.strip()
@@ -428,39 +1157,13 @@ def getRegValues(localClient, wmiClient, keyPath, keyFilter):
                 debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Got value <%s> for key <%s>' % (regValues.get(i), regKey))
         ## If not, it must be NTCMD or SSH
         elif localClient != None and localClient.getClientType() != 'snmp' and localClient.getClientType() != 'wmi':
-            errorCode = 'Remote command returned 1(0x1)'
-            remoteCommand = 'reg_mam'
-            shell = shellutils.ShellUtils(localClient)
-            ## Copy reg_mam.exe over to remote box
-            localFile = CollectorsParameters.BASE_PROBE_MGR_DIR + CollectorsParameters.getDiscoveryResourceFolder() + '\\reg_mam.exe'
-            remoteFile = shell.copyFileIfNeeded(localFile)
-            if not remoteFile:
-                debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Error copying <%s> to remote machine' % remoteCommand)
-                remoteFile = 'reg'
             ## Run the registry query
-            theQuery = remoteFile + ' query "HKEY_LOCAL_MACHINE\\' + keyPath + '" /s | find "' + keyFilter + '"'
-            returnBuffer = shell.execCmd(theQuery)
-            returnCode = shell.getLastCmdReturnCode()
-            ## If query didn't run, try reg.exe on remote server
-            if returnCode != 0 or returnBuffer.find(errorCode) != -1:
-                if remoteFile == 'reg': # or returnBuffer.find('unable to find the specified registry key'):
-                    debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Error executing <%s>: <%s>' % (theQuery, returnBuffer))
-                    return None
-                debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Error executing <%s>. Will try reg.exe on server: <%s>' % (theQuery, returnBuffer))
-                theQuery = 'reg query "HKEY_LOCAL_MACHINE\\' + keyPath + '" /s | find "' + keyFilter + '"'
-
-                returnBuffer = shell.execCmd(theQuery)
-                returnCode = shell.getLastCmdReturnCode()
-                if returnCode != 0 or returnBuffer.find(errorCode) != -1:
-                    debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Error executing <%s> too: <%s>. Will try with 64bit switch' % (theQuery, returnBuffer))
-                    theQuery = 'reg query "HKEY_LOCAL_MACHINE\\' + keyPath + '" /s /reg:64 | find "' + keyFilter + '"'
-                    returnBuffer = shell.execCmd(theQuery)
-                    returnCode = shell.getLastCmdReturnCode()
-                    if returnCode != 0 or returnBuffer.find(errorCode) != -1:
-                        return None
+            returnBuffer = executeRegQuery(localClient, keyPath, keyFilter)
+            if returnBuffer == None:
+                return None
 
             ## If we're here, we have query output
-            debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Got output: <%s> for registry query <%s>' % (returnBuffer, theQuery))
+            debugPrint(3, '[' + SCRIPT_NAME + ':getRegValues] Got output: <%s> for registry query on <%s>' % (returnBuffer, keyPath))
             regKeys = returnBuffer.split('\n')
             for regKey in regKeys:
                 regvalMatch = re.search(keyFilter + '\s+REG_.*?\s+(.+)$', regKey)
@@ -481,6 +1184,214 @@ def getRegValues(localClient, wmiClient, keyPath, keyFilter):
         debugPrint('[' + SCRIPT_NAME + ':getRegValues] Exception: <%s>' % excInfo)
         pass
 
+##############################################
+## Run "reg query <key> /s" on a shell client
+## Tries reg_mam.exe, reg.exe and reg.exe /reg:64 in that
+## order. The one that worked last on a host is tried
+## first, the others are still tried when it fails.
+## Without a filter the first command that runs wins,
+## see getRegSnapshot for the 64 bit view
+##############################################
+def executeRegQuery(localClient, keyPath, keyFilter=None):
+    try:
+        hostIp = localClient.getIpAddress()
+        shell = shellutils.ShellUtils(localClient)
+        lastQueryCommand = REG_QUERY_COMMANDS.get(hostIp)
+        if lastQueryCommand != None:
+            returnBuffer = runRegQuery(shell, lastQueryCommand, keyPath, keyFilter)
+            if returnBuffer != None:
+                return returnBuffer
+        ## The remembered command failed or there is none, try the others
+        for queryCommand in getRegQueryCommands(shell):
+            if queryCommand == lastQueryCommand:
+                continue
+            returnBuffer = runRegQuery(shell, queryCommand, keyPath, keyFilter)
+            if returnBuffer != None:
+                REG_QUERY_COMMANDS[hostIp] = queryCommand
+                return returnBuffer
+        return None
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':executeRegQuery] Exception: <%s>' % excInfo)
+        return None
+
+
+##############################################
+## Registry query commands in the order they are tried
+## Returns [(query command, query options)]
+##############################################
+def getRegQueryCommands(shell):
+    queryCommands = []
+    ## Copy reg_mam.exe over to remote box
+    localFile = CollectorsParameters.BASE_PROBE_MGR_DIR + CollectorsParameters.getDiscoveryResourceFolder() + '\\reg_mam.exe'
+    remoteFile = shell.copyFileIfNeeded(localFile)
+    if remoteFile:
+        queryCommands.append((remoteFile + ' query', ' /s'))
+    else:
+        debugPrint(3, '[' + SCRIPT_NAME + ':getRegQueryCommands] Error copying <reg_mam> to remote machine')
+    queryCommands.append(('reg query', ' /s'))
+    queryCommands.append(REG_QUERY_64)
+    return queryCommands
+
+
+##############################################
+## Run one registry query command
+## Returns its output or None if it failed
+##############################################
+def runRegQuery(shell, queryCommand, keyPath, keyFilter):
+    errorCode = 'Remote command returned 1(0x1)'
+    (queryPrefix, querySuffix) = queryCommand
+    theQuery = queryPrefix + ' "HKEY_LOCAL_MACHINE\\' + keyPath + '"' + querySuffix
+    if keyFilter != None:
+        theQuery = theQuery + ' | find "' + keyFilter + '"'
+    returnBuffer = shell.execCmd(theQuery)
+    returnCode = shell.getLastCmdReturnCode()
+    if returnCode == 0 and returnBuffer != None and returnBuffer.find(errorCode) == -1:
+        return returnBuffer
+    debugPrint(3, '[' + SCRIPT_NAME + ':runRegQuery] Error executing <%s>: <%s>' % (theQuery, returnBuffer))
+    return None
+
+
+##############################################
+## In-memory copy of a registry hive
+## Shell clients fill it from a single "reg query /s"
+## dump. WMI clients fill it one value name at a time
+## because the WMI client can only filter on value names
+##############################################
+class RegistrySnapshot:
+    def __init__(self, rootKeyPath):
+        self.rootKeyPath = rootKeyPath
+        self.keyPaths = [] ## Key paths in the order the registry returned them
+        self.keyValues = {} ## {lower case key path:[(value name, value)]}
+        self.wmiFilters = [] ## Value names already loaded through WMI
+
+    def addValue(self, keyPath, valueName, value):
+        if not self.keyValues.has_key(keyPath.lower()):
+            self.keyPaths.append(keyPath)
+            self.keyValues[keyPath.lower()] = []
+        ## Keys that are not redirected show up in both registry views
+        if (valueName, value) not in self.keyValues[keyPath.lower()]:
+            self.keyValues[keyPath.lower()].append((valueName, value))
+
+    def parseRegQueryOutput(self, regQueryOutput):
+        keyPath = None
+        valueCount = 0
+        for regLine in iterCommandOutput(regQueryOutput, 0):
+            if len(regLine.strip()) < 1:
+                continue
+            if regLine.startswith('HKEY_'):
+                keyPath = regLine.strip()
+                if keyPath.find('\\') > 0:
+                    keyPath = keyPath[keyPath.find('\\')+1:]
+                continue
+            m = PATTERNS['regQueryValue'].match(regLine)
+            if keyPath and m:
+                self.addValue(keyPath, m.group(1), m.group(3))
+                valueCount = valueCount + 1
+        debugPrint(3, '[' + SCRIPT_NAME + ':RegistrySnapshot] Got <%s> keys and <%s> values under <%s>', len(self.keyPaths), valueCount, self.rootKeyPath)
+
+    def loadWmiFilter(self, wmiClient, keyFilter):
+        if keyFilter in self.wmiFilters:
+            return
+        self.wmiFilters.append(keyFilter)
+        wmiTable = wmiClient.getRegistryKeyValues(self.rootKeyPath, 1, keyFilter)
+        regKeys = wmiTable.get(0)
+        regValues = wmiTable.get(1)
+        for i in range(regKeys.size()):
+            regKey = regKeys.get(i)
+            keyEnd = regKey.rfind('\\' + keyFilter)
+            self.addValue(regKey[0:keyEnd], keyFilter, regValues.get(i))
+
+    def getValues(self, keyPath, keyFilter, wmiClient=None):
+        '''Returns the same table getRegValues would for this key and filter'''
+        returnTable = {}
+        if wmiClient != None:
+            self.loadWmiFilter(wmiClient, keyFilter)
+        keyPrefix = keyPath.lower() + '\\'
+        for snapshotKeyPath in self.keyPaths:
+            if snapshotKeyPath.lower() != keyPath.lower() and not snapshotKeyPath.lower().startswith(keyPrefix):
+                continue
+            for (valueName, value) in self.keyValues[snapshotKeyPath.lower()]:
+                if wmiClient != None:
+                    ## WMI results are keyed on the key they were found in
+                    if valueName == keyFilter:
+                        returnTable[snapshotKeyPath] = value
+                elif valueName.endswith(keyFilter) and len(value.strip()) > 0:
+                    ## reg query results are keyed on the key that was asked for
+                    returnTable[keyPath] = string.replace(value, r'\0', '\n').strip()
+        return returnTable
+
+
+##############################################
+## Get a snapshot of a registry hive, dumping it from
+## the remote host the first time it's asked for and
+## again once it is older than REG_SNAPSHOT_TTL
+## Shell clients merge the dump of the view the reg
+## command runs in with the 64 bit view, because an
+## unfiltered 32 bit dump succeeds without the keys of
+## 64 bit instances
+##############################################
+def getRegSnapshot(localClient, wmiClient, rootKeyPath):
+    try:
+        if wmiClient != None and wmiClient.getClientType() == 'wmi':
+            snapshotKey = (wmiClient.getIpAddress(), 'wmi', rootKeyPath.lower())
+        elif localClient != None and localClient.getClientType() != 'snmp' and localClient.getClientType() != 'wmi':
+            snapshotKey = (localClient.getIpAddress(), 'shell', rootKeyPath.lower())
+        else:
+            return None
+        if REG_SNAPSHOTS.has_key(snapshotKey):
+            (dumpedAt, snapshot) = REG_SNAPSHOTS[snapshotKey]
+            if time.time() - dumpedAt < REG_SNAPSHOT_TTL:
+                return snapshot
+        snapshot = RegistrySnapshot(rootKeyPath)
+        if snapshotKey[1] == 'shell':
+            regQueryOutput = executeRegQuery(localClient, rootKeyPath)
+            ## Failures aren't cached so the next lookup dumps the hive again
+            if regQueryOutput == None:
+                return None
+            snapshot.parseRegQueryOutput(regQueryOutput)
+            if REG_QUERY_COMMANDS.get(snapshotKey[0]) != REG_QUERY_64:
+                ## Fails on 32 bit hosts and older reg.exe, the dump above is all there is then
+                regQueryOutput = runRegQuery(shellutils.ShellUtils(localClient), REG_QUERY_64, rootKeyPath, None)
+                if regQueryOutput != None:
+                    snapshot.parseRegQueryOutput(regQueryOutput)
+        REG_SNAPSHOTS[snapshotKey] = (time.time(), snapshot)
+        return snapshot
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':getRegSnapshot] Exception: <%s>' % excInfo)
+        return None
+
+
+##############################################
+## Drop-in replacement for getRegValues that answers
+## lookups under REG_SNAPSHOT_ROOTS from a snapshot of
+## the whole hive instead of one query per lookup
+##############################################
+def getRegSnapshotValues(localClient, wmiClient, keyPath, keyFilter):
+    try:
+        rootKeyPath = None
+        for snapshotRoot in REG_SNAPSHOT_ROOTS:
+            if keyPath.lower() == snapshotRoot.lower() or keyPath.lower().startswith(snapshotRoot.lower() + '\\'):
+                rootKeyPath = snapshotRoot
+                break
+        snapshot = None
+        if rootKeyPath != None:
+            snapshot = getRegSnapshot(localClient, wmiClient, rootKeyPath)
+        if snapshot == None:
+            return getRegValues(localClient, wmiClient, keyPath, keyFilter)
+        if wmiClient != None and wmiClient.getClientType() == 'wmi':
+            returnTable = snapshot.getValues(keyPath, keyFilter, wmiClient)
+        else:
+            returnTable = snapshot.getValues(keyPath, keyFilter)
+        debugPrint(3, '[' + SCRIPT_NAME + ':getRegSnapshotValues] Got <%s> for key <%s> and filter <%s> from snapshot', returnTable, keyPath, keyFilter)
+        return returnTable
+    except:
+        excInfo = logger.prepareJythonStackTrace('')
+        debugPrint('[' + SCRIPT_NAME + ':getRegSnapshotValues] Exception: <%s>' % excInfo)
+        return None
+
+
 # original getRegValues()
 def getRegValues_Orig(localClient, wmiClient, keyPath, keyFilter):
     try:
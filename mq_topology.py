@@ -35,7 +35,8 @@ from netutils import IpResolver
 ## Globals
 ##############################################
 SCRIPT_NAME="mq_topology.py"
-DEBUGLEVEL = 0 ## Set between 0 and 5 (Default should be 0), higher numbers imply more log messages
+DEBUGLEVEL = 0 ## Set between 0 and 5 (Default should be 0), higher numbers imply more log messages. Overridden by the debugLevel job parameter
+DEBUG_TO_STDOUT = 0 ## Also print log messages to stdout (for running outside the probe only). Overridden by the debugToStdout job parameter
 MQ_CMD_TIMEOUT = 2000
 SUDO = ''
 MQVER_PATH = ''
@@ -47,6 +48,7 @@ qTypeMap = {'QALIAS':'Alias Queue', 'QLOCAL':'Local Queue', 'QREMOTE':'Remote Qu
 qOshTypeMap = {'QALIAS':'mqaliasqueue', 'QLOCAL':'mqlocalqueue', 'QREMOTE':'mqremotequeue', 'XMITQ':'mqtransmitqueue', 'SYSTEM':'mqqueue', 'OTHER':'mqqueue', 'QMODEL':'mqqueue'}
 receiverChlTypeMap = {'CLUSRCVR':'Cluster Receiver Channel', 'RCVR':'Receiver Channel', 'CLNTCONN':'Client Connection Channel', 'RQSTR':'Requestor Channel'}
 senderChlTypeMap = {'CLUSSDR':'Cluster Sender Channel', 'SDR':'Sender Channel', 'SVRCONN':'Server Connection Channel', 'SVR':'Server Channel'}
+bufferParameterPatterns = {} ## Dictionary of compiled patterns for MQSC parameters - Built on demand by getBufferParameter
 
 ##############################################
 ##############################################
@@ -54,25 +56,42 @@ senderChlTypeMap = {'CLUSSDR':'Cluster Sender Channel', 'SDR':'Sender Channel',
 ##############################################
 ##############################################
 
+##############################################
+## Check if messages at a log level will be logged
+## Use this to skip building expensive messages
+##############################################
+def isDebugEnabled(logLevel):
+    return DEBUGLEVEL >= logLevel
+
 ##############################################
 ## Logging helper
+## Usage: debugPrint(level, message) or
+##        debugPrint(level, formatString, arg1, arg2...)
+## With the second form the message is only formatted
+## if it will actually be logged
 ##############################################
 def debugPrint(*debugStrings):
     try:
         logLevel = 1
-        logMessage = '[MQ logger] '
         if type(debugStrings[0]) == type(DEBUGLEVEL):
             logLevel = debugStrings[0]
-            for index in range(1, len(debugStrings)):
-                logMessage = logMessage + str(debugStrings[index])
+            if DEBUGLEVEL < logLevel:
+                return
+            if len(debugStrings) > 2:
+                try:
+                    logMessage = '[MQ logger] ' + (debugStrings[1] % debugStrings[2:])
+                except TypeError:
+                    logMessage = '[MQ logger] ' + ''.join(map(str, debugStrings[1:]))
+            else:
+                logMessage = '[MQ logger] ' + ''.join(map(str, debugStrings[1:]))
         else:
-            logMessage = logMessage + ''.join(map(str, debugStrings))
-        for spacer in range(logLevel):
-            logMessage = '  ' + logMessage
-        if DEBUGLEVEL >= logLevel:
-            logger.debug(logMessage)
-        # if DEBUGLEVEL > logLevel:
-            # print logMessage
+            if DEBUGLEVEL < logLevel:
+                return
+            logMessage = '[MQ logger] ' + ''.join(map(str, debugStrings))
+        logMessage = '  '*logLevel + logMessage
+        logger.debug(logMessage)
+        if DEBUG_TO_STDOUT and DEBUGLEVEL > logLevel:
+            print logMessage
     except:
         excInfo = logger.prepareJythonStackTrace('')
         logger.warn('[' + SCRIPT_NAME + ':debugPrint] Exception: <%s>' % excInfo)
@@ -83,7 +102,7 @@ def debugPrint(*debugStrings):
 ##############################################
 def fixIP(ip, localIp):
     try:
-        debugPrint(5, '[' + SCRIPT_NAME + ':fixIP] Got IP <%s>' % ip)
+        debugPrint(5, '[' + SCRIPT_NAME + ':fixIP] Got IP <%s>', ip)
         if ip == None or ip == '' or len(ip) < 1 or ip == '127.0.0.1' or ip == '0.0.0.0' or ip == '*' or re.search('::', ip):
             return localIp
         elif not netutils.isValidIp(ip):
@@ -102,12 +121,12 @@ def isValidString(theString):
     try:
         debugPrint(5, '['  + SCRIPT_NAME + ':isValidString] Got string <%s>' % theString)
         if theString == None or theString == '' or len(theString) < 1:
-            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is NOT valid!' % theString)
+            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is NOT valid!', theString)
             return 0
         elif re.search('Syntax error detected',theString):
             return 0
         else:
-            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is valid!' % theString)
+            debugPrint(5, '[' + SCRIPT_NAME + ':isValidString] String <%s> is valid!', theString)
             return 1
     except:
         excInfo = logger.prepareJythonStackTrace('')
@@ -119,25 +138,49 @@ def isValidString(theString):
 ##############################################
 def splitLines(multiLineString):
     try:
-        returnArray = []
         if multiLineString == None:
-            returnArray = None
-        elif (re.search('\r\r\n', multiLineString)):
-            returnArray = multiLineString.split('\r\r\n')
-        elif (re.search('\r\n', multiLineString)):
-            returnArray = multiLineString.split('\r\n')
-        elif (re.search('\n', multiLineString)):
-            returnArray = multiLineString.split('\n')
-        elif (re.search('\r', multiLineString)):
-            returnArray = multiLineString.split('\r')
-        else:
-            returnArray.append(multiLineString)
-        return returnArray
+            return None
+        return list(iterLines(multiLineString))
     except:
         excInfo = logger.prepareJythonStackTrace('')
         logger.warn('[' + SCRIPT_NAME + ':splitLines] Exception: <%s>' % excInfo)
         pass
 
+##############################################
+## Iterate over lines of command output without
+## building a list of all lines first
+## Handles LF, CRLF, CR and CRCRLF line endings
+##############################################
+def iterLines(multiLineString):
+    if multiLineString == None:
+        return
+    stringLength = len(multiLineString)
+    lineStart = 0
+    nextLf = -2
+    nextCr = -2
+    while lineStart < stringLength:
+        if nextLf != -1 and nextLf < lineStart:
+            nextLf = multiLineString.find('\n', lineStart)
+        if nextCr != -1 and nextCr < lineStart:
+            nextCr = multiLineString.find('\r', lineStart)
+        if nextLf == -1 and nextCr == -1:
+            lineEnd = stringLength
+            nextStart = stringLength
+        elif nextCr == -1 or (nextLf != -1 and nextLf < nextCr):
+            lineEnd = nextLf
+            nextStart = nextLf + 1
+        else:
+            lineEnd = nextCr
+            nextStart = nextCr + 1
+            while nextStart < stringLength and multiLineString[nextStart] == '\r':
+                nextStart = nextStart + 1
+            if nextStart < stringLength and multiLineString[nextStart] == '\n':
+                nextStart = nextStart + 1
+            else:
+                nextStart = nextCr + 1
+        yield multiLineString[lineStart:lineEnd]
+        lineStart = nextStart
+
 
 ##############################################
 ##############################################
@@ -152,11 +195,13 @@ def getBufferParameter(theBuffer, theParameter):
     try:
         if isValidString(theParameter) and isValidString(theBuffer):
             returnString = ''
-            pattern = Pattern('.*\s' + theParameter + '\((.*?)\)[\s\r\n].*', REFlags.DOTALL)
-            match = pattern.matcher(theBuffer)
+            ## Compile the pattern for each parameter only once
+            if not bufferParameterPatterns.has_key(theParameter):
+                bufferParameterPatterns[theParameter] = Pattern('.*\s' + theParameter + '\((.*?)\)[\s\r\n].*', REFlags.DOTALL)
+            match = bufferParameterPatterns[theParameter].matcher(theBuffer)
             if match.find() == 1:
                 returnString = match.group(1)
-                debugPrint(4, '[' + SCRIPT_NAME + ':getBufferParameter] Got value <%s> for parameter <%s>' % (returnString, theParameter))
+                debugPrint(4, '[' + SCRIPT_NAME + ':getBufferParameter] Got value <%s> for parameter <%s>', returnString, theParameter)
             if isValidString(returnString):
                 return returnString.strip()
     except:
@@ -178,7 +223,7 @@ def getHostFromConnName(shell, connName):
             ip = hostName
         else:
             ip = _resolveHostName(shell, hostName)
-        debugPrint(4, '[' + SCRIPT_NAME + ':getHostFromConnName] Got hostname/IP <%s> from connection name <%s>' % (ip, connName))
+        debugPrint(4, '[' + SCRIPT_NAME + ':getHostFromConnName] Got hostname/IP <%s> from connection name <%s>', ip, connName)
         return ip
     except:
         excInfo = logger.prepareJythonStackTrace('')
@@ -212,7 +257,7 @@ def getPortFromConnName(connName):
         matcher = re.search('\((\d+)\)', connName)
         if matcher:
             port = matcher.group(1)
-        debugPrint(4, '[' + SCRIPT_NAME + ':getPortFromConnName] Got remote port <%s> from connection name <%s>' % (port, connName))
+        debugPrint(4, '[' + SCRIPT_NAME + ':getPortFromConnName] Got remote port <%s> from connection name <%s>', port, connName)
         return port
     except:
         excInfo = logger.prepareJythonStackTrace('')
@@ -230,7 +275,7 @@ def getMqPortAndIp(mqOSH, hostOSH):
         if mqListenerPort and mqListenerIP:
             ipServiceEndpoint = modeling.createServiceAddressOsh(hostOSH, mqListenerIP, mqListenerPort, 1, 'ibmmqseries')
             #returnOSHV.add(modeling.createServiceAddressOsh(hostOSH, mqListenerIP, mqListenerPort, 1, 'ibmmqseries'))
-            debugPrint(4, '[' + SCRIPT_NAME + ':getMqPortAndIp] Got MQ listener port <%s> and IP <%s>' % (mqListenerPort, mqListenerIP))
+            debugPrint(4, '[' + SCRIPT_NAME + ':getMqPortAndIp] Got MQ listener port <%s> and IP <%s>', mqListenerPort, mqListenerIP)
             returnOSHV.add(ipServiceEndpoint)
             returnOSHV.add(modeling.createLinkOSH('usage', mqOSH , ipServiceEndpoint))
         else:
@@ -277,7 +322,7 @@ def runMqscCommand(shell, mqCommand, qManagerName=''):
                             shell.execCmd('END', MQ_CMD_TIMEOUT, Boolean.TRUE)
                         return
                     elif string.find(commandOutput.strip().lower(), 'not recognized') != -1 or  string.find(commandOutput.strip().lower(), 'not found') != -1 or  string.find(commandOutput.strip().lower(), 'permission denied') != -1 or  string.find(commandOutput.strip().lower(), 'unknown command') != -1 :
-                        debugPrint(4, '[' + SCRIPT_NAME + ':runMqscCommand] Command <%s> resulted in an error! Will try the next one...: <%s>' % (mqscProgram, commandOutput))
+                        debugPrint(4, '[' + SCRIPT_NAME + ':runMqscCommand] Command <%s> resulted in an error! Will try the next one...: <%s>', mqscProgram, commandOutput)
                         ## Issue an END command even if the command fails because
                         ## the runmqadm program will not exit automatically
                         if echoPipe == 0:
@@ -288,7 +333,7 @@ def runMqscCommand(shell, mqCommand, qManagerName=''):
                             commandOutput = shell.execCmd(mqCommand, MQ_CMD_TIMEOUT, Boolean.TRUE)
                             shell.execCmd('END', MQ_CMD_TIMEOUT, Boolean.TRUE)
                         if isValidString(commandOutput):
-                            debugPrint(5, '[' + SCRIPT_NAME + ':runMqscCommand] Command <%s> ran successfully!!: <%s>' % (mqscProgram, commandOutput))
+                            debugPrint(5, '[' + SCRIPT_NAME + ':runMqscCommand] Command <%s> ran successfully!!: <%s>', mqscProgram, commandOutput)
                             return commandOutput
                 else:
                     debugPrint(3, '[' + SCRIPT_NAME + ':runMqscCommand] Command <%s> returned empty output! Will try the next one...' % mqscProgram)
@@ -319,7 +364,7 @@ def getMqVersion(localShell):
         for mqVerPath in mqVerPaths:
             mqver = localShell.execAlternateCmds(SUDO + mqVerPath + 'dspmqver', SUDO + mqVerPath + 'mqver', SUDO + 'dspmqver', SUDO + 'mqver', 'dspmqver', 'mqver', mqVerPath + 'dspmqver', mqVerPath + 'mqver')
             if isValidString(mqver):
-                debugPrint(4, '[' + SCRIPT_NAME + ':getMqVersion] Got mqver/dspmqver output: <%s>' % mqver)
+                debugPrint(4, '[' + SCRIPT_NAME + ':getMqVersion] Got mqver/dspmqver output: <%s>', mqver)
                 returnString = ''
                 match = Pattern('Name:\s+(.*)\n.*Version:\s+(.*)\n.*CMVC\slevel:\s+(.*)\n.*BuildType:\s+(.*)', REFlags.DOTALL).matcher(mqver)
                 match.find()
@@ -331,7 +376,7 @@ def getMqVersion(localShell):
                     returnString = versionNumber.strip() + ' ' + cmvcLevel.strip() + ' ' + buildType.strip()
                 else:
                     returnString = ' '
-                debugPrint(4, '[' + SCRIPT_NAME + ':getMqVersion] Returning MQ version details: <%s>' % returnString)
+                debugPrint(4, '[' + SCRIPT_NAME + ':getMqVersion] Returning MQ version details: <%s>', returnString)
                 return returnString
             else:
                 return ' '
@@ -425,7 +470,8 @@ def getQManagers(shell, ipAddress, containerHostOSH, localFramework):
                         mqOSH.setAttribute('application_port', qMgrPort)
                         mqListenerPort = qMgrPort
                         qManagerOSH.setAttribute('mqqueuemanager_listenerport', str(qMgrPort))
-                debugPrint(5, '[' + SCRIPT_NAME + ':getQManagers] Got Q manager: <%s>' % qManagerOSH.toXmlString())
+                if isDebugEnabled(5):
+                    debugPrint(5, '[' + SCRIPT_NAME + ':getQManagers] Got Q manager: <%s>', qManagerOSH.toXmlString())
                 qManagerOSH.setContainer(mqOSH)
                 returnDict[qManagerName] = qManagerOSH
                 if mqListenerPort:
@@ -455,10 +501,10 @@ def getQueues(shell, qManagerOSH):
                 qName = getBufferParameter(queue, 'QUEUE')
                 ## Make sure we have a good Q name
                 if not isValidString(qName):
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Invalid Q name on qManager <%s>! Skipping...' % qManagerName)
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Invalid Q name on qManager <%s>! Skipping...', qManagerName)
                     continue
                 if qName.strip() == '*':
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Skipping Q <%s> on qManager <%s>' % (qName, qManagerName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Skipping Q <%s> on qManager <%s>', qName, qManagerName)
                     continue
                 qType = getBufferParameter(queue, 'TYPE')
                 debugPrint(2, '[' + SCRIPT_NAME + ':getQueues] Got Q <%s> with type <%s>' % (qName, qType))
@@ -466,12 +512,12 @@ def getQueues(shell, qManagerOSH):
                 qDefinitionType = getBufferParameter(queue, 'DEFTYPE')
                 if qType.strip() == 'QLOCAL' and isValidString(DISCOVER_DYNAMIC_QUEUES) and isValidString(qDefinitionType) and DISCOVER_DYNAMIC_QUEUES.strip().lower() not in ['true', 'yes', 'y', '1']:
                     if qDefinitionType.strip() != 'PREDEFINED':
-                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Non-static Local Q <%s> found on qManager <%s>! Skipping...' % (qName, qManagerName))
+                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Non-static Local Q <%s> found on qManager <%s>! Skipping...', qName, qManagerName)
                         continue
                 ## Make OSH and add to OSHV
                 qOSH = buildQueueOSH(queue)
                 if qOSH == None:
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Error building an OSH for Q <%s> on qManager <%s>' % (qName, qManagerName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Error building an OSH for Q <%s> on qManager <%s>', qName, qManagerName)
                     continue
                 qOSH.setContainer(qManagerOSH)
                 returnOSHV.add(qOSH)
@@ -501,7 +547,7 @@ def getQueues(shell, qManagerOSH):
                 if qType == 'QALIAS':
                     targetQ = getBufferParameter(queue, 'TARGQ') or getBufferParameter(queue, 'TARGET')
                     if isValidString(targetQ):
-                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Got Q <%s> for alias Q <%s>' % (targetQ, qName))
+                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Got Q <%s> for alias Q <%s>', targetQ, qName)
                         if (targetQ+qManagerName) in qOshDict.keys():
                             debugPrint(3, '[' + SCRIPT_NAME + ':getQueues] Got Q <%s> already in dictionary for alias Q <%s>' % (targetQ, qName))
                             returnOSHV.add(modeling.createLinkOSH('realization', qOSH, qOshDict[targetQ+qManagerName]))
@@ -523,7 +569,7 @@ def getQueues(shell, qManagerOSH):
                         ## Using default transmit Q
                         xmitQ = qManagerOSH.getAttribute('mqqueuemanager_defaultxmitqname').getStringValue()
                     if isValidString(xmitQ):
-                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Got xmit Q <%s> for remote Q <%s>' % (xmitQ, qName))
+                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Got xmit Q <%s> for remote Q <%s>', xmitQ, qName)
                         if (xmitQ+qManagerName) in qOshDict.keys():
                             debugPrint(3, '[' + SCRIPT_NAME + ':getQueues] Got xmit Q <%s> already in dictionary for remote Q <%s>' % (xmitQ, qName))
                             returnOSHV.add(modeling.createLinkOSH('use', qOSH, qOshDict[xmitQ+qManagerName]))
@@ -551,7 +597,7 @@ def getQueues(shell, qManagerOSH):
                         ipserverOSH = None
                         remoteMqOSH = None
                         remoteHostDetails = runMqscCommand(shell, 'DISPLAY CHANNEL(*) WHERE(xmitq EQ ' + xmitQ + ') TYPE(SDR) CONNAME', qManagerName)
-                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Got remote host details <%s> for remote Q <%s>' % (remoteHostDetails, qName))
+                        debugPrint(4, '[' + SCRIPT_NAME + ':getQueues] Got remote host details <%s> for remote Q <%s>', remoteHostDetails, qName)
                         channelConnName = getBufferParameter(remoteHostDetails, 'CONNAME') or ''
                         if isValidString(channelConnName):
                             remoteHost = getHostFromConnName(shell, channelConnName)
@@ -618,7 +664,7 @@ def buildQueueOSH(qBuffer):
             qOSH = ObjectStateHolder(qOshTypeMap[qType])
         ## Q name
         qName = getBufferParameter(qBuffer, 'QUEUE')
-        debugPrint(4, '[' + SCRIPT_NAME + ':buildQueueOSH] Got Q name <%s>' % qName)
+        debugPrint(4, '[' + SCRIPT_NAME + ':buildQueueOSH] Got Q name <%s>', qName)
         if isValidString(qName):
             qOSH.setAttribute('data_name', qName)
         else:
@@ -632,7 +678,7 @@ def buildQueueOSH(qBuffer):
         if isValidString(qUsage) and qUsage == 'XMITQ':
             qType =  qUsage
         ## Set Q Type
-        debugPrint(4, '[' + SCRIPT_NAME + ':buildQueueOSH] Got Q type <%s>' % qType)
+        debugPrint(4, '[' + SCRIPT_NAME + ':buildQueueOSH] Got Q type <%s>', qType)
         if isValidString(qType):
             qOSH.setStringAttribute('queue_type', qTypeMap[qType])
         ## Q description
@@ -663,10 +709,10 @@ def getChannels(shell, qManagerOSH):
                 channelType = getBufferParameter(channel, 'CHLTYPE')
                 ## Make sure we have a good channel name and channel type
                 if not isValidString(channelName) or not isValidString(channelType):
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getChannels] Invalid channel name or type on Q manager <%s>! Skipping...' % qManagerName)
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getChannels] Invalid channel name or type on Q manager <%s>! Skipping...', qManagerName)
                     continue
                 if channelName.strip() == '*':
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getChannels] Skipping channel <%s> on qManager <%s>' % (channelName, qManagerName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getChannels] Skipping channel <%s> on qManager <%s>', channelName, qManagerName)
                     continue
                 debugPrint(2, '[' + SCRIPT_NAME + ':getChannels] Got channel <%s> of type <%s>' % (channelName, channelType))
                 channelDescription = getBufferParameter(channel, 'DESCR') or ''
@@ -692,7 +738,7 @@ def getChannels(shell, qManagerOSH):
                     ## Using default transmit Q
                     xmitQ = qManagerOSH.getAttribute('mqqueuemanager_defaultxmitqname').getStringValue()
                 if isValidString(xmitQ):
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getChannels] Got xmit Q <%s> for channel <%s>' % (xmitQ, channelName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getChannels] Got xmit Q <%s> for channel <%s>', xmitQ, channelName)
                     if (xmitQ+qManagerName) in qOshDict.keys():
                         debugPrint(3, '[' + SCRIPT_NAME + ':getChannels] Got xmit Q <%s> already in dictionary for remote Q <%s>' % (xmitQ, channelName))
                         returnOSHV.add(modeling.createLinkOSH('use', channelOSH, qOshDict[xmitQ+qManagerName]))
@@ -724,7 +770,8 @@ def getChannels(shell, qManagerOSH):
                     returnOSHV.add(clusterOSH)
                     returnOSHV.add(modeling.createLinkOSH('member', clusterOSH, channelOSH))
                     returnOSHV.add(modeling.createLinkOSH('member', clusterOSH, qManagerOSH))
-                debugPrint(5, '[' + SCRIPT_NAME + ':getChannels] Got Channel <%s>' % channelOSH.toXmlString())
+                if isDebugEnabled(5):
+                    debugPrint(5, '[' + SCRIPT_NAME + ':getChannels] Got Channel <%s>', channelOSH.toXmlString())
                 returnOSHV.add(channelOSH)
                 if channelType not in ['CLNTCONN', 'CLUSRCVR', 'RCVR', 'RQSTR']:
                     senderChannelOshDict[channelName+qManagerName] = channelOSH
@@ -763,10 +810,10 @@ def getClusters(shell, qManagerOSH, hostOSH):
                 clusterName = getBufferParameter(cluster, 'CLUSTER')
                 ## Make sure we have a good cluster name
                 if not isValidString(clusterName):
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Invalid cluster name on Q manager <%s>! Skipping...' % qManagerName)
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Invalid cluster name on Q manager <%s>! Skipping...', qManagerName)
                     continue
                 if clusterName.strip() == '*':
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Skipping cluster <%s> on Q manager <%s>' % (clusterName, qManagerName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Skipping cluster <%s> on Q manager <%s>', clusterName, qManagerName)
                     continue
                 debugPrint(2, '[' + SCRIPT_NAME + ':getClusters] Got cluster <%s> on Q manager <%s>' % (clusterName, qManagerName))
                 clusterOSH = ObjectStateHolder('mqcluster')
@@ -787,7 +834,7 @@ def getClusters(shell, qManagerOSH, hostOSH):
                     remoteHost = getHostFromConnName(shell, clusterConnName)
                     if remoteHost is not None:
                         remotePort = getPortFromConnName(clusterConnName)
-                        debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Got host <%s> and port <%s> for cluster <%s>' % (remoteHost, remotePort, clusterName))
+                        debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Got host <%s> and port <%s> for cluster <%s>', remoteHost, remotePort, clusterName)
                         if clusterQMgr.lower().strip() != qManagerName.lower().strip() and isValidString(DISCOVER_REMOTE_HOSTS) and DISCOVER_REMOTE_HOSTS.strip().lower() in ['true', 'yes', 'y', '1']:
                             debugPrint(3, '[' + SCRIPT_NAME + ':getClusters] Got remote host <%s> and port <%s> for cluster <%s>' % (remoteHost, remotePort, clusterName))
                             remoteHostOSH = modeling.createHostOSH(remoteHost)
@@ -832,7 +879,7 @@ def getClusters(shell, qManagerOSH, hostOSH):
                     returnOSHV.add(memberLinkOsh)
                 ## Add USE link between the cluster and its sender channel
                 if isValidString(clusterChannel):
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Got channel <%s> for cluster <%s>' % (clusterChannel, clusterName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getClusters] Got channel <%s> for cluster <%s>', clusterChannel, clusterName)
                     if (clusterChannel+qManagerName) in senderChannelOshDict.keys():
                         channelOSH = senderChannelOshDict[clusterChannel+qManagerName]
                         channelType = channelOSH.getAttribute('mqsenderchannel_channeltype').getStringValue()
@@ -879,10 +926,10 @@ def getNamelists(shell, qManagerOSH, hostOSH):
                 namelistName = getBufferParameter(namelist, 'NAMELIST')
                 ## Make sure we have a good namelist name
                 if not isValidString(namelistName):
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getNamelists] Invalid namelist name on Q manager <%s>! Skipping...' % qManagerName)
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getNamelists] Invalid namelist name on Q manager <%s>! Skipping...', qManagerName)
                     continue
                 if namelistName.strip() == '*':
-                    debugPrint(4, '[' + SCRIPT_NAME + ':getNamelists] Skipping namelist <%s> on Q manager <%s>' % (namelistName, qManagerName))
+                    debugPrint(4, '[' + SCRIPT_NAME + ':getNamelists] Skipping namelist <%s> on Q manager <%s>', namelistName, qManagerName)
                     continue
                 namelistNames = getBufferParameter(namelist, 'NAMES') or ''
                 namelistNameCount = getBufferParameter(namelist, 'NAMCOUNT') or ''
@@ -934,7 +981,7 @@ def getIpResolver():
 ##############################################
 def DiscoveryMain(Framework):
     # General variables
-    global MQ_CMD_TIMEOUT, SUDO, MQVER_PATH, DISCOVER_DYNAMIC_QUEUES, DISCOVER_REMOTE_HOSTS
+    global MQ_CMD_TIMEOUT, SUDO, MQVER_PATH, DISCOVER_DYNAMIC_QUEUES, DISCOVER_REMOTE_HOSTS, DEBUGLEVEL, DEBUG_TO_STDOUT
     OSHVResult = ObjectStateHolderVector()
     client = None
     osName = None
@@ -952,20 +999,25 @@ def DiscoveryMain(Framework):
     mqver_path = Framework.getParameter('mqver_path') or None
     DISCOVER_DYNAMIC_QUEUES = Framework.getParameter('discover_dynamic_queues') or 'false'
     DISCOVER_REMOTE_HOSTS = Framework.getParameter('discover_remote_hosts') or 'true'
+    debug_level = Framework.getParameter('debugLevel') or None
+    debug_to_stdout = Framework.getParameter('debugToStdout') or 'false'
 
-
+    ## Set logging options first so everything below honors them
+    if isValidString(debug_level) and debug_level.strip().isdigit():
+        DEBUGLEVEL = int(debug_level.strip())
+    DEBUG_TO_STDOUT = debug_to_stdout.strip().lower() in ['true', 'yes', 'y', '1']
 
     ## Container HOST OSH
     if isValidString(hostId):
         hostOSH = modeling.createOshByCmdbIdString('host', hostId.strip())
-        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] Got HOSTID <%s>' % hostId)
+        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] Got HOSTID <%s>', hostId)
     ## Set mq command timeout
     if isValidString(mq_cmd_timeout) and mq_cmd_timeout.isnumeric():
-        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] Setting MQ command timeout <%s>' % mq_cmd_timeout)
+        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] Setting MQ command timeout <%s>', mq_cmd_timeout)
         MQ_CMD_TIMEOUT = int(mq_cmd_timeout)
     ## Set sudo as appropriate
     if isValidString(use_sudo) and use_sudo.strip().lower() in ['true', 'yes', 'y', '1'] and isValidString(sudo_command):
-        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] Setting SUDO command <%s>' % sudo_command)
+        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] Setting SUDO command <%s>', sudo_command)
         SUDO = sudo_command.strip().lower() + ' '
     ## Set MQ paths if provided
     if isValidString(mqver_path):
@@ -979,7 +1031,7 @@ def DiscoveryMain(Framework):
         global getIpResolver
         getIpResolver = lambda ipResolver = IpResolver('', Framework) : ipResolver
 
-        debugPrint(5, '[' + SCRIPT_NAME + ':DiscoveryMain] Client OS is <%s>' % shell.getOsType())
+        debugPrint(5, '[' + SCRIPT_NAME + ':DiscoveryMain] Client OS is <%s>', shell.getOsType())
 
 
         qManagerOshDict = getQManagers(shell, client.getIpAddress(), hostOSH, Framework)
@@ -1027,7 +1079,7 @@ def DiscoveryMain(Framework):
                     if clusterOSHV and clusterOSHV.size() > 0:
                         OSHVResult.addAll(clusterOSHV)
                     else:
-                        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] No CLUSTERs found for Q Manager <%s>!' % qManagerName)
+                        debugPrint(4, '[' + SCRIPT_NAME + ':DiscoveryMain] No CLUSTERs found for Q Manager <%s>!', qManagerName)
                     ################################
                     ## Get namelists
                     # namelistOSHV = getNamelists(shell, qManagerOshDict[qManagerName], hostOSH)